@@ -1,27 +1,31 @@
 #!/bin/bash
+set -e
 
-# Ожидание готовности базы данных
-echo "Waiting for database..."
-while ! pg_isready -h $DB_HOST -p $DB_PORT -U $DB_USER; do
-    echo "Database is unavailable - sleeping"
-    sleep 1
-done
-echo "Database is up - executing command"
-
-# Переход в директорию проекта Django
-cd /app/library_project
+# Режим запуска (первый аргумент):
+#   web     — gunicorn (рабочий режим, по умолчанию), см. gunicorn.conf.py
+#   migrate — применение миграций и создание суперпользователя, затем выход
+#   dev     — миграции и сервер разработки runserver
+#   worker  — отправка писем из очереди (manage.py send_outbox)
+# Любая другая команда выполняется как есть.
+MODE="${1:-web}"
 
-# Создание миграций
-echo "Making migrations..."
-python manage.py makemigrations
+# Ожидание готовности базы данных
+wait_for_db() {
+    echo "Waiting for database..."
+    while ! pg_isready -h $DB_HOST -p $DB_PORT -U $DB_USER; do
+        echo "Database is unavailable - sleeping"
+        sleep 1
+    done
+    echo "Database is up - executing command"
+}
 
-# Применение миграций
-echo "Applying migrations..."
-python manage.py migrate
+# Применение миграций и создание суперпользователя (если не существует)
+migrate() {
+    echo "Applying migrations..."
+    python manage.py migrate --noinput
 
-# Создание суперпользователя (если не существует)
-echo "Creating superuser..."
-python manage.py shell -c "
+    echo "Creating superuser..."
+    python manage.py shell -c "
 from django.contrib.auth import get_user_model
 User = get_user_model()
 if not User.objects.filter(username='admin').exists():
@@ -30,7 +34,33 @@ if not User.objects.filter(username='admin').exists():
 else:
     print('Superuser already exists')
 "
+}
+
+# Переход в директорию проекта Django
+cd /app/library_project
 
-# Запуск сервера
-echo "Starting Django server..."
-exec python manage.py runserver 0.0.0.0:8000
+case "$MODE" in
+    web)
+        wait_for_db
+        echo "Starting gunicorn..."
+        exec gunicorn -c gunicorn.conf.py
+        ;;
+    migrate)
+        wait_for_db
+        migrate
+        ;;
+    worker)
+        wait_for_db
+        echo "Starting outbox worker..."
+        exec python manage.py send_outbox
+        ;;
+    dev)
+        wait_for_db
+        migrate
+        echo "Starting Django server..."
+        exec python manage.py runserver 0.0.0.0:8000
+        ;;
+    *)
+        exec "$@"
+        ;;
+esac
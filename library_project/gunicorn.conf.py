@@ -0,0 +1,63 @@
+# Конфигурация gunicorn для рабочего режима (entrypoint.sh web).
+#
+# SERVER_MODE=wsgi (по умолчанию) — синхронные воркеры и library_project.wsgi,
+# SERVER_MODE=asgi — воркеры uvicorn и library_project.asgi.
+#
+# Приложение загружается в мастере до форка (preload_app): воркеры
+# стартуют быстрее и делят память. Плавная перезагрузка:
+#   kill -HUP <мастер>  — новые воркеры с новой конфигурацией, текущие
+#                         запросы дорабатываются старыми;
+#   kill -USR2 <мастер>, затем -QUIT старому мастеру — новый код без
+#                         простоя (при preload_app HUP код не перечитывает).
+import multiprocessing
+import os
+import time
+
+BOOT_STARTED = time.monotonic()
+
+SERVER_MODE = os.getenv("SERVER_MODE", "wsgi")
+
+if SERVER_MODE == "asgi":
+    wsgi_app = "library_project.asgi:application"
+    worker_class = "uvicorn.workers.UvicornWorker"
+else:
+    wsgi_app = "library_project.wsgi:application"
+    worker_class = os.getenv("GUNICORN_WORKER_CLASS", "sync")
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(
+    os.getenv("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv("GUNICORN_THREADS", "1"))
+preload_app = True
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+# Перезапуск воркера после N запросов ограничивает рост памяти; разброс не
+# даёт всем воркерам перезапуститься одновременно.
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "1000"))
+max_requests_jitter = max_requests // 10
+pidfile = os.getenv("GUNICORN_PIDFILE", "/tmp/gunicorn.pid")
+accesslog = "-"
+errorlog = "-"
+loglevel = os.getenv("GUNICORN_LOG_LEVEL", "info")
+
+
+def when_ready(server):
+    server.log.info(
+        "Ready in %.2f s (%s, %d workers)",
+        time.monotonic() - BOOT_STARTED,
+        SERVER_MODE,
+        server.cfg.workers,
+    )
+
+
+def post_fork(server, worker):
+    # Соединения с БД, открытые в мастере при загрузке, нельзя делить
+    # между процессами.
+    from django.conf import settings
+    from django.db import connections
+
+    connections.close_all()
+    if settings.DB_POOL_MODE == "pool":
+        # Потоки пула не переживают fork: воркер создаёт свой пул.
+        connections["default"].close_pool()
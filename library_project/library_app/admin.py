@@ -1,6 +1,11 @@
+from datetime import timedelta
+
+from django.conf import settings
 from django.contrib import admin
+from django.utils import timezone
 
-from .models import Author, Book, BookIssue
+from .models import (Author, Book, BookHold, BookIssue, ImageTask,
+                     ImportCheckpoint, OutboxEmail, Reminder)
 
 
 @admin.register(Author)
@@ -15,9 +20,47 @@ class AuthorAdmin(admin.ModelAdmin):
 class BookAdmin(admin.ModelAdmin):
     """Админ-класс для модели Book."""
 
-    list_display = ("title", "genre", "published_date")
+    list_display = ("title", "genre", "published_date",
+                    "rating_count", "active_issue_count", "copies",
+                    "available_copies")
     search_fields = ("title", "genre")
     filter_horizontal = ("authors",)
+    readonly_fields = Book.COUNTER_FIELDS + ("available_copies",)
+
+
+class IssueStateFilter(admin.SimpleListFilter):
+    """
+    Фильтр выдач по состоянию. Невозвращённые выдачи выбираются по
+    частичному индексу ``issue_active_due_date_idx``.
+    """
+
+    title = "состояние"
+    parameter_name = "state"
+
+    def lookups(self, request, model_admin):
+        return (
+            ("active", "На руках"),
+            ("due_soon", "Скоро срок возврата"),
+            ("overdue", "Просрочены"),
+            ("returned", "Возвращены"),
+        )
+
+    def queryset(self, request, queryset):
+        today = timezone.localdate()
+        if self.value() == "returned":
+            return queryset.filter(return_date__isnull=False)
+        if self.value() not in ("active", "due_soon", "overdue"):
+            return queryset
+        queryset = queryset.filter(return_date__isnull=True)
+        if self.value() == "overdue":
+            return queryset.filter(due_date__lt=today)
+        if self.value() == "due_soon":
+            return queryset.filter(
+                due_date__gte=today,
+                due_date__lte=today + timedelta(
+                    days=settings.REMINDER_DUE_SOON_DAYS),
+            )
+        return queryset
 
 
 @admin.register(BookIssue)
@@ -32,4 +75,54 @@ class BookIssueAdmin(admin.ModelAdmin):
         "return_date",
         "is_returned",
     )
-    list_filter = ("issue_date", "due_date", "return_date")
+    list_filter = (IssueStateFilter, "issue_date", "due_date", "return_date")
+    list_select_related = ("book", "user")
+    raw_id_fields = ("book", "user")
+
+
+@admin.register(Reminder)
+class ReminderAdmin(admin.ModelAdmin):
+    """Админ-класс для отправленных напоминаний о возврате."""
+
+    list_display = ("issue", "kind", "email", "created_at")
+    list_filter = ("kind",)
+    list_select_related = ("issue__book", "issue__user", "email")
+    raw_id_fields = ("issue", "email")
+
+
+@admin.register(BookHold)
+class BookHoldAdmin(admin.ModelAdmin):
+    """Админ-класс для очереди на выданные книги."""
+
+    list_display = ("book", "user", "status", "created_at", "fulfilled_at")
+    list_filter = ("status",)
+    list_select_related = ("book", "user")
+    raw_id_fields = ("book", "user", "issue")
+    readonly_fields = ("created_at", "fulfilled_at")
+
+
+@admin.register(OutboxEmail)
+class OutboxEmailAdmin(admin.ModelAdmin):
+    """Админ-класс для очереди писем."""
+
+    list_display = ("subject", "status", "attempts", "available_at", "sent_at")
+    list_filter = ("status",)
+    readonly_fields = ("created_at", "sent_at", "last_error")
+
+
+@admin.register(ImportCheckpoint)
+class ImportCheckpointAdmin(admin.ModelAdmin):
+    """Админ-класс для позиций импорта каталога."""
+
+    list_display = ("source", "rows", "imported", "errors", "updated_at",
+                    "finished_at")
+    readonly_fields = ("started_at", "updated_at")
+
+
+@admin.register(ImageTask)
+class ImageTaskAdmin(admin.ModelAdmin):
+    """Админ-класс для очереди обработки изображений."""
+
+    list_display = ("model", "object_id", "status", "attempts", "available_at")
+    list_filter = ("status", "model")
+    readonly_fields = ("created_at", "last_error")
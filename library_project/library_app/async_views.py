@@ -0,0 +1,196 @@
+# library_app/async_views.py
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.shortcuts import aget_object_or_404, render
+from django.views.decorators.http import require_safe
+from rest_framework.exceptions import APIException, NotFound
+from rest_framework.request import Request
+from rest_framework.utils.encoders import JSONEncoder
+
+from .caching import cache_anonymous_page
+from .conditional import (add_validators, aget_list_version, aget_version,
+                          check_preconditions, conditional_page)
+from .eager_loading import eager_load
+from .models import Author, Book
+from .pagination import KeysetPagination
+from .search import search_authors, search_books
+from .views import (author_detail_sources, author_list_sources,
+                    book_detail_sources, book_list_sources, comment_page)
+
+# Асинхронные варианты страниц каталога и API чтения. Запросы к БД идут
+# через асинхронный ORM, поэтому под ASGI ожидание базы не занимает поток:
+# один процесс обслуживает много одновременных соединений. Шаблоны и
+# сериализаторы получают уже выбранные данные — ленивый queryset из
+# асинхронного кода выполнить нельзя.
+
+
+async def render_page(request, template_name, context):
+    """``render`` с заранее загруженным пользователем (его выводит base.html)."""
+    context["user"] = await request.auser()
+    return render(request, template_name, context)
+
+
+@conditional_page(book_list_sources, lambda: ["books"])
+@cache_anonymous_page("book_list", lambda: ["books"])
+async def book_list(request):
+    """Асинхронный вариант ``views.book_list``."""
+    query = request.GET.get("search", "").strip()
+    books = Book.objects.prefetch_related("authors")
+    if query:
+        books = search_books(books, query)
+    return await render_page(
+        request, "library_app/book_list.html", {
+            "books": [book async for book in books], "search": query}
+    )
+
+
+@conditional_page(author_list_sources, lambda: ["authors"])
+@cache_anonymous_page("author_list", lambda: ["authors"])
+async def author_list(request):
+    """Асинхронный вариант ``views.author_list``."""
+    query = request.GET.get("search", "").strip()
+    authors = Author.objects.select_related("stats")
+    if query:
+        authors = search_authors(authors, query)
+    return await render_page(
+        request, "library_app/author_list.html", {
+            "authors": [author async for author in authors], "search": query}
+    )
+
+
+@conditional_page(book_detail_sources)
+@cache_anonymous_page("book_detail", lambda pk: [f"book:{pk}"])
+async def book_detail(request, pk):
+    """Асинхронный вариант ``views.book_detail``."""
+    book = await aget_object_or_404(
+        Book.objects.prefetch_related("authors"), pk=pk)
+    average_rating = book.average_rating if book.rating_count else None
+    paginator, comments = comment_page(book.pk)
+    comments = paginator.set_page([comment async for comment in comments])
+    return await render_page(
+        request,
+        "library_app/book_detail.html",
+        {
+            "book": book,
+            "average_rating": average_rating,
+            "comments": comments,
+            "comments_next": paginator.get_next_link(),
+        },
+    )
+
+
+@conditional_page(author_detail_sources)
+@cache_anonymous_page("author_detail", lambda pk: [f"author:{pk}"])
+async def author_detail(request, pk):
+    """Асинхронный вариант ``views.author_detail``."""
+    author = await aget_object_or_404(
+        Author.objects.select_related("stats").prefetch_related("books"),
+        pk=pk,
+    )
+    return await render_page(
+        request, "library_app/author_detail.html", {"author": author})
+
+
+@login_required
+async def profile(request):
+    """Асинхронный вариант ``views.profile``."""
+    user = await request.auser()
+    active_issues = user.issued_books.filter(
+        return_date__isnull=True).select_related("book")
+    return await render_page(
+        request, "library_app/profile.html", {
+            "active_issues": [issue async for issue in active_issues]}
+    )
+
+
+def api_error(exc):
+    detail = exc.detail if isinstance(exc.detail, (dict, list)) else {
+        "detail": exc.detail}
+    return JsonResponse(
+        detail, status=exc.status_code, encoder=JSONEncoder, safe=False)
+
+
+def read_queryset(request, viewset):
+    """
+    Queryset чтения по настройкам вьюсета DRF.
+
+    Применяются фильтры и поиск вьюсета, связи загружаются по дереву полей
+    его сериализатора, как в ``EagerLoadingMixin``.
+    """
+    queryset = viewset.queryset.all()
+    for backend in viewset.filter_backends:
+        queryset = backend().filter_queryset(request, queryset, viewset)
+    serializer = viewset.serializer_class(context={"request": request})
+    return eager_load(
+        queryset, serializer, extra_sources=viewset.ordering_fields)
+
+
+async def conditional_json(request, queryset, viewset, respond, many=False):
+    """
+    Условный GET, как в ``ConditionalGetMixin``; ``many`` — ответ списком.
+    """
+    dependencies = [
+        dependency.all() for dependency in viewset.version_dependencies]
+    if many:
+        version = await aget_list_version(
+            request, getattr(viewset, "cache_namespaces", ()), queryset,
+            dependencies)
+    else:
+        version = await aget_version(queryset, dependencies)
+    if not version[1]:
+        return await respond()
+    etag, timestamp, response = check_preconditions(request, version, "json")
+    if response is None:
+        response = await respond()
+    return add_validators(response, etag, timestamp)
+
+
+@require_safe
+async def api_list(request, viewset):
+    """
+    Асинхронное чтение списка API: те же фильтры, поиск, курсорная
+    пагинация и формат ответа, что у ``list()`` вьюсета.
+    """
+    request = Request(request)
+    try:
+        queryset = read_queryset(request, viewset)
+
+        async def respond():
+            paginator = KeysetPagination()
+            page = await paginator.apaginate_queryset(
+                queryset, request, viewset)
+            serializer = viewset.serializer_class(
+                page, many=True, context={"request": request})
+            return JsonResponse(
+                {
+                    "next": paginator.get_next_link(),
+                    "previous": paginator.get_previous_link(),
+                    "results": serializer.data,
+                },
+                encoder=JSONEncoder,
+            )
+
+        return await conditional_json(
+            request, queryset, viewset, respond, many=True)
+    except APIException as exc:
+        return api_error(exc)
+
+
+@require_safe
+async def api_detail(request, pk, viewset):
+    """Асинхронное чтение записи API, как ``retrieve()`` вьюсета."""
+    request = Request(request)
+    try:
+        queryset = read_queryset(request, viewset).filter(pk=pk)
+
+        async def respond():
+            obj = await queryset.afirst()
+            if obj is None:
+                raise NotFound()
+            serializer = viewset.serializer_class(
+                obj, context={"request": request})
+            return JsonResponse(serializer.data, encoder=JSONEncoder)
+
+        return await conditional_json(request, queryset, viewset, respond)
+    except APIException as exc:
+        return api_error(exc)
@@ -0,0 +1,171 @@
+# library_app/authentication.py
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.functional import cached_property
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.serializers import (TokenObtainPairSerializer,
+                                                  TokenRefreshSerializer)
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import RevokedToken
+from .roles import get_roles, roles_changed_at
+
+# Данные пользователя, которые access-токен несёт для режима без запроса
+# пользователя из базы.
+USER_CLAIMS = ("username", "is_staff", "is_superuser", "roles")
+
+
+def _revoked_key(jti):
+    return f"jwt:revoked:{jti}"
+
+
+def _ttl(token):
+    return int(token["exp"] - time.time())
+
+
+def revoke_token(token):
+    """
+    Вносит токен в список отозванных до истечения его срока: в таблицу
+    ``RevokedToken`` и в кэш (без общего кэша — кэш этого воркера).
+    """
+    ttl = _ttl(token)
+    if ttl <= 0:
+        return
+    now = timezone.now()
+    jti = token[jwt_settings.JTI_CLAIM]
+    RevokedToken.objects.filter(expires_at__lt=now).delete()
+    RevokedToken.objects.update_or_create(
+        jti=jti, defaults={"expires_at": now + timedelta(seconds=ttl)})
+    cache.set(_revoked_key(jti), True, ttl)
+
+
+def is_revoked(token, use_cache=True):
+    """
+    Отозван ли токен. Ответ берётся из кэша, а при промахе читается из
+    таблицы и кэшируется; ``add`` не затирает отметку отзыва, записанную
+    параллельно. При общем кэше ответ хранится до истечения токена. Кэш
+    воркера не знает об отзывах в других воркерах: в нём ответ «не
+    отозван» живёт ``JWT_REVOCATION_CHECK_INTERVAL`` секунд (0 — таблица
+    читается при каждом запросе). ``use_cache=False`` всегда читает
+    таблицу.
+    """
+    jti = token[jwt_settings.JTI_CLAIM]
+    if not use_cache:
+        return RevokedToken.objects.filter(jti=jti).exists()
+    revoked = cache.get(_revoked_key(jti))
+    if revoked is None:
+        revoked = RevokedToken.objects.filter(jti=jti).exists()
+        timeout = max(_ttl(token), 1)
+        if not revoked and not settings.CACHE_SHARED:
+            timeout = min(timeout, settings.JWT_REVOCATION_CHECK_INTERVAL)
+        if timeout > 0:
+            cache.add(_revoked_key(jti), revoked, timeout)
+    return revoked
+
+
+class LibraryRefreshToken(RefreshToken):
+    """
+    Refresh-токен, выпускающий access-токены с именем, ``is_staff`` и
+    группами пользователя (см. ``TokenUserAuthentication``). Данные
+    берутся при каждом выпуске access-токена, а не копируются из
+    refresh-токена, поэтому после обновления они актуальны.
+    """
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token.user = user
+        return token
+
+    @property
+    def access_token(self):
+        access = super().access_token
+        user = getattr(self, "user", None)
+        if user is None:
+            lookup = {
+                jwt_settings.USER_ID_FIELD: self[jwt_settings.USER_ID_CLAIM]}
+            user = get_user_model().objects.filter(**lookup).first()
+        if user is not None:
+            access["username"] = user.get_username()
+            access["is_staff"] = user.is_staff
+            access["is_superuser"] = user.is_superuser
+            access["roles"] = sorted(get_roles(user)["groups"])
+        return access
+
+
+class LibraryTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = LibraryRefreshToken
+
+
+class LibraryTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = LibraryRefreshToken
+
+    def validate(self, attrs):
+        # Обновление редкое: отзыв refresh-токена проверяется по таблице.
+        if is_revoked(self.token_class(attrs["refresh"]), use_cache=False):
+            raise InvalidToken("Токен отозван.")
+        return super().validate(attrs)
+
+
+class LibraryTokenUser(TokenUser):
+    """Пользователь из access-токена; группы берутся из утверждения roles."""
+
+    def __init__(self, token):
+        super().__init__(token)
+        # Права в токен не входят: для их проверки нужен пользователь из базы.
+        self._roles = {
+            "groups": frozenset(token["roles"]),
+            "permissions": frozenset(),
+        }
+
+    @cached_property
+    def id(self):
+        # В токене id хранится строкой; приводим его к типу первичного
+        # ключа, чтобы сравнения с ``obj.user_id`` работали как обычно.
+        return get_user_model()._meta.pk.to_python(super().id)
+
+
+class TokenUserAuthentication(JWTAuthentication):
+    """
+    JWT-аутентификация со списком отозванных токенов в кэше.
+
+    При ``JWT_STATELESS_READS`` безопасные запросы доверяют данным
+    пользователя из access-токена до истечения его срока и не читают
+    пользователя из базы. Пользователь всё же загружается для изменяющих
+    запросов, токенов без этих данных, токенов персонала (права
+    администратора всегда проверяются по базе) и токенов, выпущенных до
+    изменения групп или флагов пользователя (см. ``roles.invalidate_roles``).
+    Режим требует общего кэша (см. checks.py).
+    """
+
+    def authenticate(self, request):
+        self.trust_claims = (
+            settings.JWT_STATELESS_READS and request.method in SAFE_METHODS)
+        return super().authenticate(request)
+
+    def get_validated_token(self, raw_token):
+        token = super().get_validated_token(raw_token)
+        if is_revoked(token):
+            raise InvalidToken("Токен отозван.")
+        return token
+
+    def get_user(self, validated_token):
+        if (
+            getattr(self, "trust_claims", False)
+            and all(claim in validated_token for claim in USER_CLAIMS)
+            and not validated_token["is_staff"]
+            and not validated_token["is_superuser"]
+            and validated_token["iat"] > roles_changed_at(
+                validated_token[jwt_settings.USER_ID_CLAIM])
+        ):
+            return LibraryTokenUser(validated_token)
+        return super().get_user(validated_token)
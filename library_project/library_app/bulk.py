@@ -0,0 +1,193 @@
+# library_app/bulk.py
+from collections import Counter, defaultdict
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import IntegrityError, transaction
+from rest_framework import serializers, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from .caching import invalidate, page_namespaces
+from .links import book_author_ids
+from .models import Book, BookCounterMixin
+from .search import refresh_book_search_vectors
+from .serializers import PreloadedPrimaryKeyRelatedField
+from .stats import add_author_book_counts, apply_book_deltas, counter_deltas
+
+
+def preloaded_fields(serializer):
+    """Поля сериализатора, связанные объекты которых можно загрузить заранее."""
+    for field in serializer.fields.values():
+        if field.read_only:
+            continue
+        relation = getattr(field, "child_relation", field)
+        if isinstance(relation, PreloadedPrimaryKeyRelatedField):
+            yield field.field_name, relation, relation is not field
+
+
+def preload_related(serializer, items):
+    """
+    Загружает связанные объекты всех элементов пакета: один запрос на поле.
+
+    Возвращает ``{имя поля: {pk: объект}}`` для ``context["preloaded"]``.
+    """
+    preloaded = {}
+    for name, relation, many in preloaded_fields(serializer):
+        pk_field = relation.get_queryset().model._meta.pk
+        pks = set()
+        for item in items:
+            if not isinstance(item, dict) or item.get(name) is None:
+                continue
+            values = item[name] if many else [item[name]]
+            if not isinstance(values, list):
+                continue
+            for value in values:
+                try:
+                    if not isinstance(value, bool):
+                        pks.add(pk_field.to_python(value))
+                except (TypeError, ValueError, DjangoValidationError):
+                    # Поле само сообщит о некорректном значении.
+                    pass
+        preloaded[name] = relation.get_queryset().in_bulk(pks) if pks else {}
+    return preloaded
+
+
+def sync_after_bulk_create(model, objects, links=(), namespaces=()):
+    """
+    Делает за bulk_create то, что при обычном save() делают сигналы:
+    счётчики книг и авторов, поисковые векторы и инвалидация кэша.
+
+    ``links`` — созданные строки связи книг с авторами, ``namespaces`` —
+    пространства имён кэша списков самого ресурса.
+    """
+    namespaces = {"books", "authors", *namespaces}
+    if issubclass(model, BookCounterMixin):
+        deltas = defaultdict(Counter)
+        for obj in objects:
+            for book_id, values in counter_deltas(
+                    new=obj.counter_contribution()).items():
+                deltas[book_id].update(values)
+        apply_book_deltas(deltas)
+        book_ids = set(deltas)
+        namespaces |= page_namespaces(book_ids, book_author_ids(book_ids))
+    if model is Book:
+        add_author_book_counts(Counter(link.author_id for link in links))
+        refresh_book_search_vectors(
+            Book.objects.filter(pk__in=[obj.pk for obj in objects]))
+        namespaces |= page_namespaces(
+            author_ids={link.author_id for link in links})
+    invalidate(namespaces)
+
+
+class BulkCreateMixin:
+    """
+    Пакетное создание объектов: ``POST <ресурс>/bulk/`` со списком.
+
+    Каждый элемент проверяется сериализатором отдельно, связанные объекты
+    загружаются заранее одним запросом на поле. Корректные элементы
+    создаются через ``bulk_create`` в одной транзакции, по некорректным
+    возвращаются ошибки с их индексами.
+    """
+
+    bulk_max_items = 1000
+
+    def get_bulk_context(self, items, preloaded):
+        """Дополнительный контекст сериализатора для всего пакета."""
+        return {}
+
+    def get_bulk_save_kwargs(self):
+        """Значения полей, которые вьюсет задаёт сам (как в perform_create)."""
+        return {}
+
+    def get_bulk_extra(self, indexes):
+        """
+        Дополнительные поля ответа после ``perform_bulk_create``;
+        ``indexes`` — индексы корректных элементов в пакете по порядку.
+        """
+        return {}
+
+    @action(detail=False, methods=["post"], url_path="bulk")
+    def bulk(self, request, *args, **kwargs):
+        items = request.data
+        if not isinstance(items, list) or not items:
+            raise serializers.ValidationError(
+                {"detail": "Ожидается непустой список объектов."})
+        if len(items) > self.bulk_max_items:
+            raise serializers.ValidationError(
+                {"detail": f"Не более {self.bulk_max_items} объектов за раз."})
+
+        preloaded = preload_related(self.get_serializer(), items)
+        context = {
+            **self.get_serializer_context(),
+            "preloaded": preloaded,
+            **self.get_bulk_context(items, preloaded),
+        }
+        serializer = self.get_serializer(data=items, many=True, context=context)
+
+        valid = []
+        indexes = []
+        errors = []
+        for index, item in enumerate(items):
+            try:
+                valid.append(serializer.run_child_validation(item))
+                indexes.append(index)
+            except serializers.ValidationError as error:
+                errors.append({"index": index, "errors": error.detail})
+        if not valid:
+            return Response(
+                {"created": [], "errors": errors},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            created = self.perform_bulk_create(serializer.child.Meta.model, valid)
+        except IntegrityError:
+            # Параллельная запись нарушила ограничение: пакет откатывается
+            # целиком, клиент может повторить его.
+            return Response(
+                {"detail": "Конфликт с параллельной записью, повторите запрос.",
+                 "errors": errors},
+                status=status.HTTP_409_CONFLICT,
+            )
+        instances = self.get_queryset().filter(
+            pk__in=[obj.pk for obj in created]).order_by("pk")
+        return Response(
+            {
+                "created": self.get_serializer(instances, many=True).data,
+                "errors": errors,
+                **self.get_bulk_extra(indexes),
+            },
+            status=status.HTTP_201_CREATED,
+        )
+
+    def perform_bulk_create(self, model, validated):
+        save_kwargs = self.get_bulk_save_kwargs()
+        many_to_many = {
+            field.name: field for field in model._meta.many_to_many}
+        objects = []
+        related = []
+        for attrs in validated:
+            values = {
+                name: attrs.pop(name) for name in list(attrs)
+                if name in many_to_many
+            }
+            # Поля, которые задаёт вьюсет, важнее переданных клиентом.
+            objects.append(model(**{**attrs, **save_kwargs}))
+            related.append(values)
+
+        with transaction.atomic():
+            model.objects.bulk_create(objects)
+            links = []
+            for name, field in many_to_many.items():
+                through = field.remote_field.through
+                source = field.m2m_field_name()
+                target = field.m2m_reverse_field_name()
+                rows = [
+                    through(**{f"{source}_id": obj.pk, f"{target}_id": other.pk})
+                    for obj, values in zip(objects, related)
+                    for other in dict.fromkeys(values.get(name, ()))
+                ]
+                links.extend(through.objects.bulk_create(rows))
+            sync_after_bulk_create(
+                model, objects, links, getattr(self, "cache_namespaces", ()))
+        return objects
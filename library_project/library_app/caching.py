@@ -0,0 +1,237 @@
+# library_app/caching.py
+import hashlib
+import json
+import time
+from functools import wraps
+from inspect import iscoroutinefunction
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from rest_framework.response import Response
+
+# Разделы кэша, для которых ведутся счётчики попаданий и промахов.
+CACHE_SECTIONS = (
+    "book_list",
+    "book_detail",
+    "author_list",
+    "author_detail",
+    "api_books",
+    "api_authors",
+    "api_comments",
+    "api_ratings",
+)
+
+
+# Общее пространство имён всех страниц каталога: сбрасывает кэш целиком,
+# например после массовой загрузки данных в обход сигналов.
+CATALOG_NAMESPACE = "catalog"
+
+
+def _version_key(namespace):
+    return f"catalog:ns:{namespace}"
+
+
+def _initial_version():
+    # Версия, созданная заново после вытеснения из кэша, должна быть больше
+    # любой прежней, иначе снова станут видны старые страницы.
+    return int(time.time() * 1000)
+
+
+def get_versions(namespaces):
+    """Текущие версии пространств имён кэша."""
+    keys = [_version_key(namespace) for namespace in namespaces]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _initial_version())
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump(namespaces):
+    """Сдвигает версии пространств имён: их страницы перестают находиться."""
+    for namespace in namespaces:
+        key = _version_key(namespace)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, _initial_version())
+
+
+def invalidate(namespaces):
+    """
+    Инвалидирует пространства имён сразу и повторно после коммита.
+
+    Повтор после коммита не даёт параллельному запросу, прочитавшему ещё
+    не изменённые данные, сохранить их под новой версией.
+    """
+    namespaces = set(namespaces)
+    if not namespaces:
+        return
+    bump(namespaces)
+    transaction.on_commit(lambda: bump(namespaces))
+
+
+def page_namespaces(book_ids=(), author_ids=()):
+    """Пространства имён кэша страниц отдельных книг и авторов."""
+    return {f"book:{pk}" for pk in book_ids} | {
+        f"author:{pk}" for pk in author_ids}
+
+
+def invalidate_catalog():
+    """Инвалидирует все страницы и списки каталога."""
+    invalidate([CATALOG_NAMESPACE])
+
+
+def record(section, hit):
+    key = f"catalog:stats:{section}:{'hits' if hit else 'misses'}"
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1):
+            cache.incr(key)
+
+
+def get_stats():
+    """Счётчики попаданий и промахов по разделам и в целом."""
+    keys = [
+        f"catalog:stats:{section}:{kind}"
+        for section in CACHE_SECTIONS
+        for kind in ("hits", "misses")
+    ]
+    values = cache.get_many(keys)
+    sections = {}
+    for section in CACHE_SECTIONS:
+        hits = values.get(f"catalog:stats:{section}:hits", 0)
+        misses = values.get(f"catalog:stats:{section}:misses", 0)
+        sections[section] = {"hits": hits, "misses": misses}
+    hits = sum(item["hits"] for item in sections.values())
+    misses = sum(item["misses"] for item in sections.values())
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": hits / (hits + misses) if hits + misses else None,
+        "sections": sections,
+    }
+
+
+def build_key(section, request, namespaces):
+    """Ключ страницы: раздел, хост, нормализованные параметры и версии."""
+    namespaces = [CATALOG_NAMESPACE, *namespaces]
+    params = sorted(
+        (name, value)
+        for name in request.GET
+        for value in request.GET.getlist(name)
+        if value != ""
+    )
+    raw = json.dumps(
+        [request.get_host(), request.is_secure(), request.path, params,
+         get_versions(namespaces)],
+        default=str,
+    )
+    return f"catalog:page:{section}:{hashlib.sha1(raw.encode()).hexdigest()}"
+
+
+def cached_page(section, request, namespaces):
+    """Ключ страницы и сохранённый под ним ответ (``None`` при промахе)."""
+    key = build_key(section, request, namespaces)
+    cached = cache.get(key)
+    record(section, hit=cached is not None)
+    if cached is None:
+        return key, None
+    return key, HttpResponse(
+        cached["content"], content_type=cached["content_type"])
+
+
+def store_page(key, response):
+    if response.status_code == 200 and not response.streaming:
+        cache.set(
+            key,
+            {
+                "content": response.content,
+                "content_type": response["Content-Type"],
+            },
+            settings.CATALOG_CACHE_TIMEOUT,
+        )
+
+
+def cache_anonymous_page(section, namespaces):
+    """
+    Кэширует отрендеренную страницу для анонимных посетителей.
+
+    ``namespaces`` — функция, которая по аргументам вью возвращает
+    пространства имён, от которых зависит страница. Страницы
+    авторизованных пользователей содержат личные данные и не кэшируются.
+    Подходит и для асинхронных вью.
+    """
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                user = await request.auser()
+                if (
+                    not settings.CATALOG_CACHE_ENABLED
+                    or request.method != "GET"
+                    or user.is_authenticated
+                ):
+                    return await view(request, *args, **kwargs)
+                key, cached = await sync_to_async(cached_page)(
+                    section, request, namespaces(*args, **kwargs))
+                if cached is not None:
+                    return cached
+                response = await view(request, *args, **kwargs)
+                await sync_to_async(store_page)(key, response)
+                return response
+
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (
+                not settings.CATALOG_CACHE_ENABLED
+                or request.method != "GET"
+                or request.user.is_authenticated
+            ):
+                return view(request, *args, **kwargs)
+            key, cached = cached_page(
+                section, request, namespaces(*args, **kwargs))
+            if cached is not None:
+                return cached
+            response = view(request, *args, **kwargs)
+            store_page(key, response)
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+class CachedListMixin:
+    """
+    Кэширует данные ответа ``list()`` вьюсета.
+
+    Вьюсет задаёт ``cache_section`` и ``cache_namespaces``; содержимое
+    списков общедоступно, поэтому кэш общий для всех пользователей.
+    """
+
+    cache_section = None
+    cache_namespaces = ()
+
+    def list(self, request, *args, **kwargs):
+        if not settings.CATALOG_CACHE_ENABLED or not self.cache_section:
+            return super().list(request, *args, **kwargs)
+        key = build_key(self.cache_section, request, self.cache_namespaces)
+        data = cache.get(key)
+        if data is not None:
+            record(self.cache_section, hit=True)
+            return Response(data)
+        record(self.cache_section, hit=False)
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, settings.CATALOG_CACHE_TIMEOUT)
+        return response
@@ -0,0 +1,48 @@
+# library_app/checks.py
+from django.conf import settings
+from django.core.checks import Error, Warning, register
+
+
+@register()
+def check_stateless_jwt(app_configs, **kwargs):
+    """
+    JWT_STATELESS_READS доверяет данным токена, пока в кэше нет отметки
+    об изменении ролей пользователя. С кэшем в памяти процесса отметка
+    видна только воркеру, где роли изменились, и теряется при перезапуске.
+    """
+    if settings.JWT_STATELESS_READS and not settings.CACHE_SHARED:
+        return [
+            Error(
+                "JWT_STATELESS_READS требует общего для воркеров кэша.",
+                hint=(
+                    "Задайте CACHE_BACKEND=redis или memcached (или "
+                    "CACHE_SHARED=True для другого общего бэкенда) либо "
+                    "JWT_STATELESS_READS=False."
+                ),
+                id="library_app.E001",
+            )
+        ]
+    return []
+
+
+@register()
+def check_cached_sessions(app_configs, **kwargs):
+    """
+    Сессии ``cached_db`` в кэше воркера: выход или сброс сессии в одном
+    воркере не виден остальным, пока не истечёт их запись в кэше.
+    """
+    cached = settings.SESSION_ENGINE.endswith(".cached_db")
+    if cached and settings.SESSION_CACHE_ALIAS == "sessions":
+        return [
+            Warning(
+                "Сессии cached_db хранятся в кэше памяти процесса: "
+                "завершённая сессия действует в других воркерах до "
+                "SESSION_CACHE_TIMEOUT секунд.",
+                hint=(
+                    "Задайте общий кэш (CACHE_BACKEND=redis или memcached, "
+                    "CACHE_SHARED=True) либо SESSION_BACKEND=db."
+                ),
+                id="library_app.W001",
+            )
+        ]
+    return []
@@ -0,0 +1,243 @@
+# library_app/conditional.py
+import hashlib
+from functools import wraps
+from inspect import iscoroutinefunction
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max, Subquery
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from .caching import CATALOG_NAMESPACE, build_key, get_versions
+
+
+def latest_update(queryset):
+    """Подзапрос: время последнего изменения записей ``queryset``."""
+    return Subquery(queryset.order_by("-updated_at").values("updated_at")[:1])
+
+
+def version_aggregates(dependencies):
+    aggregates = {"updated_at": Max("updated_at"), "count": Count("pk")}
+    for index, dependency in enumerate(dependencies):
+        # Подзапрос не зависит от строк и вычисляется один раз.
+        aggregates[f"dependency_{index}"] = Max(latest_update(dependency))
+    return aggregates
+
+
+def version_from(values):
+    count = values.pop("count")
+    timestamps = [value for value in values.values() if value is not None]
+    return (max(timestamps) if timestamps else None), count
+
+
+def get_version(queryset, dependencies=()):
+    """
+    Версия набора записей: время последнего изменения и число записей.
+
+    Число меняется при удалении, которое не сдвигает время. ``dependencies``
+    — querysets данных, выводимых вместе с записями (статистика авторов,
+    комментарии книги): учитывается и их последнее изменение. Всё
+    считается одним запросом.
+    """
+    return version_from(
+        queryset.order_by().aggregate(**version_aggregates(dependencies)))
+
+
+async def aget_version(queryset, dependencies=()):
+    """Асинхронный вариант ``get_version``."""
+    return version_from(
+        await queryset.order_by().aaggregate(
+            **version_aggregates(dependencies)))
+
+
+def cached_version(request, namespaces):
+    """
+    Версия списка без агрегата по всей таблице: ключ её записи в кэше и
+    сама версия (``None``, если её надо посчитать и сохранить по ключу).
+
+    С общим кэшем (``CACHE_SHARED``) версия — версии пространств имён,
+    которые сдвигает ``caching.invalidate``. Кэш в памяти процесса не
+    видит сдвигов в других воркерах, поэтому в нём хранится посчитанная
+    по базе версия с тем же сроком и ключом, что у страниц (см.
+    ``caching.build_key``): она устаревает не дольше кэшированного
+    списка. Без пространств имён или с выключенным кэшем — ``(None,
+    None)``.
+    """
+    if not namespaces:
+        return None, None
+    if settings.CACHE_SHARED:
+        versions = get_versions([CATALOG_NAMESPACE, *namespaces])
+        return None, (None, "ns:" + ".".join(map(str, versions)))
+    if not settings.CATALOG_CACHE_ENABLED:
+        return None, None
+    key = build_key("version", request, namespaces)
+    return key, cache.get(key)
+
+
+def get_list_version(request, namespaces, queryset, dependencies=()):
+    """Версия списка: из ``cached_version`` или ``get_version``."""
+    key, version = cached_version(request, namespaces)
+    if version is None:
+        version = get_version(queryset, dependencies)
+        if key is not None:
+            cache.set(key, version, settings.CATALOG_CACHE_TIMEOUT)
+    return version
+
+
+async def aget_list_version(request, namespaces, queryset, dependencies=()):
+    """Асинхронный вариант ``get_list_version``."""
+    key, version = await sync_to_async(cached_version)(request, namespaces)
+    if version is None:
+        version = await aget_version(queryset, dependencies)
+        if key is not None:
+            await cache.aset(key, version, settings.CATALOG_CACHE_TIMEOUT)
+    return version
+
+
+def make_etag(request, version, *extra):
+    """ETag ответа: версия данных, адрес и то, от чего ещё зависит ответ."""
+    last_modified, count = version
+    raw = "|".join(
+        str(value)
+        for value in (
+            request.get_full_path(),
+            request.user.pk,
+            last_modified.isoformat() if last_modified else "",
+            count,
+            *extra,
+        )
+    )
+    return f'"{hashlib.sha1(raw.encode()).hexdigest()}"'
+
+
+def check_preconditions(request, version, *extra):
+    """ETag, время изменения и ответ 304, если копия клиента актуальна."""
+    last_modified, _ = version
+    etag = make_etag(request, version, *extra)
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(
+        request, etag=etag, last_modified=timestamp)
+    return etag, timestamp, response
+
+
+def add_validators(response, etag, timestamp):
+    if response.status_code in (200, 304):
+        response.headers.setdefault("ETag", etag)
+        if timestamp is not None:
+            response.headers.setdefault("Last-Modified", http_date(timestamp))
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def conditional_response(request, version, respond, *extra):
+    """
+    Ответ 304, если копия клиента актуальна, иначе ``respond()``.
+
+    ``respond`` вызывается только при изменившихся данных: при 304 ничего
+    не сериализуется и не рендерится. ``no-cache`` заставляет клиента
+    проверять копию при каждом запросе.
+    """
+    etag, timestamp, response = check_preconditions(request, version, *extra)
+    if response is None:
+        response = respond()
+    return add_validators(response, etag, timestamp)
+
+
+def conditional_page(sources, namespaces=None):
+    """
+    Условный GET для HTML-вью, синхронных и асинхронных.
+
+    ``sources`` по запросу и аргументам вью возвращает queryset записей
+    страницы и querysets зависимостей, по которым считается версия (см.
+    ``get_version``). ``namespaces`` — функция аргументов вью, пространства
+    имён кэша страницы-списка: по ним версия берётся без агрегата (см.
+    ``get_list_version``). В ETag входит CSRF-cookie: формы страницы
+    содержат токен, который должен оставаться действительным.
+    """
+
+    def page_namespaces(*args, **kwargs):
+        return namespaces(*args, **kwargs) if namespaces else ()
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                if request.method not in ("GET", "HEAD"):
+                    return await view(request, *args, **kwargs)
+                # В ETag входит пользователь; ленивый request.user нельзя
+                # загружать из асинхронного кода.
+                request.user = await request.auser()
+                version = await aget_list_version(
+                    request, page_namespaces(*args, **kwargs),
+                    *sources(request, *args, **kwargs))
+                etag, timestamp, response = check_preconditions(
+                    request, version,
+                    request.COOKIES.get(settings.CSRF_COOKIE_NAME, ""))
+                if response is None:
+                    response = await view(request, *args, **kwargs)
+                return add_validators(response, etag, timestamp)
+
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return view(request, *args, **kwargs)
+            return conditional_response(
+                request,
+                get_list_version(
+                    request, page_namespaces(*args, **kwargs),
+                    *sources(request, *args, **kwargs)),
+                lambda: view(request, *args, **kwargs),
+                request.COOKIES.get(settings.CSRF_COOKIE_NAME, ""),
+            )
+
+        return wrapper
+
+    return decorator
+
+
+class ConditionalGetMixin:
+    """
+    ETag и Last-Modified для ``list()`` и ``retrieve()`` вьюсета.
+
+    Версия считается по отфильтрованному queryset ответа и
+    ``version_dependencies`` — данным, которые сериализатор выводит из
+    других таблиц. Версия списка с ``cache_namespaces`` (см.
+    ``CachedListMixin``) берётся из кэша (см. ``get_list_version``).
+    """
+
+    version_dependencies = ()
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        version = get_list_version(
+            request, getattr(self, "cache_namespaces", ()), queryset,
+            self.get_version_dependencies())
+        return self.conditional(
+            version, super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.filter_queryset(self.get_queryset()).filter(
+            **{self.lookup_field: kwargs[lookup_url_kwarg]})
+        version = get_version(queryset, self.get_version_dependencies())
+        return self.conditional(
+            version, super().retrieve, request, *args, **kwargs)
+
+    def get_version_dependencies(self):
+        return [dependency.all() for dependency in self.version_dependencies]
+
+    def conditional(self, version, respond, request, *args, **kwargs):
+        if not version[1]:
+            # Пустой список или 404: проверять нечего.
+            return respond(request, *args, **kwargs)
+        return conditional_response(
+            request,
+            version,
+            lambda: respond(request, *args, **kwargs),
+            request.accepted_renderer.format,
+        )
@@ -0,0 +1,82 @@
+# library_app/db_metrics.py
+import os
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+# Счётчики процесса: у каждого воркера свои соединения и свой пул.
+_connects = Counter()
+_lock = threading.Lock()
+
+SERVER_STATS_SQL = """
+    SELECT
+        current_setting('max_connections')::int,
+        count(*) FILTER (WHERE backend_type = 'client backend'),
+        count(*) FILTER (WHERE datname = current_database() AND state = 'active'),
+        count(*) FILTER (WHERE datname = current_database() AND state = 'idle'),
+        count(*) FILTER (
+            WHERE datname = current_database()
+            AND state = 'idle in transaction'
+        )
+    FROM pg_stat_activity
+"""
+
+
+@receiver(connection_created)
+def count_connect(sender, connection, **kwargs):
+    """Считает открытия соединений (в режиме pool — выдачи из пула)."""
+    with _lock:
+        _connects[connection.alias] += 1
+
+
+def pool_settings(alias="default"):
+    settings_dict = connections[alias].settings_dict
+    pool = settings_dict["OPTIONS"].get("pool")
+    return {
+        "conn_max_age": settings_dict["CONN_MAX_AGE"],
+        "health_checks": settings_dict["CONN_HEALTH_CHECKS"],
+        "server_side_cursors": not settings_dict.get(
+            "DISABLE_SERVER_SIDE_CURSORS", False),
+        "pool": pool if isinstance(pool, dict) else bool(pool),
+    }
+
+
+def server_stats(alias="default"):
+    """Занятость слотов соединений PostgreSQL всеми процессами."""
+    with connections[alias].cursor() as cursor:
+        cursor.execute(SERVER_STATS_SQL)
+        max_connections, used, active, idle, idle_in_transaction = (
+            cursor.fetchone())
+    return {
+        "max_connections": max_connections,
+        "used": used,
+        "database": {
+            "active": active,
+            "idle": idle,
+            "idle_in_transaction": idle_in_transaction,
+        },
+    }
+
+
+def get_stats(alias="default"):
+    """
+    Метрики соединений: настройки, счётчик процесса, пул и сервер.
+
+    ``pool`` — статистика пула psycopg (``requests_wait_ms`` — суммарное
+    ожидание свободного соединения, ``requests_waiting`` — ждущие сейчас,
+    ``requests_errors`` — отказы по ``DB_POOL_TIMEOUT``); в других режимах
+    ``None``.
+    """
+    connection = connections[alias]
+    pool = connection.pool if settings.DB_POOL_MODE == "pool" else None
+    return {
+        "mode": settings.DB_POOL_MODE,
+        "settings": pool_settings(alias),
+        "process": {"pid": os.getpid(), "connects": _connects[alias]},
+        "pool": pool.get_stats() if pool is not None else None,
+        "server": server_stats(alias),
+    }
@@ -0,0 +1,171 @@
+# library_app/eager_loading.py
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import permissions
+from rest_framework.relations import ManyRelatedField, RelatedField
+from rest_framework.serializers import BaseSerializer, ListSerializer
+
+
+class LoadPlan:
+    """
+    План загрузки связей и полей для queryset одного сериализатора:
+    пути для ``select_related``, объекты ``Prefetch`` и поля для ``only()``.
+    """
+
+    def __init__(self):
+        self.select = set()
+        self.prefetch = {}
+        self.only = set()
+
+
+def get_relation(model, name):
+    """Поле модели по имени или имени обратного аксессора."""
+    try:
+        return model._meta.get_field(name)
+    except FieldDoesNotExist:
+        pass
+    for field in model._meta.get_fields():
+        if field.auto_created and not field.concrete:
+            if field.get_accessor_name() == name:
+                return field
+    return None
+
+
+def readable_fields(serializer):
+    if isinstance(serializer, ListSerializer):
+        serializer = serializer.child
+    return [field for field in serializer.fields.values() if not field.write_only]
+
+
+def load_level(plan, model, prefix):
+    """Выбирает все поля уровня: его значения читает код вне схемы."""
+    plan.only.update(prefix + field.name for field in model._meta.concrete_fields)
+
+
+def collect_serializer(plan, model, serializer, prefix="", annotations=()):
+    plan.only.add(prefix + model._meta.pk.name)
+    for field in readable_fields(serializer):
+        if field.source == "*":
+            if isinstance(field, BaseSerializer):
+                collect_serializer(plan, model, field, prefix, annotations)
+            else:
+                # SerializerMethodField и подобные получают объект целиком.
+                load_level(plan, model, prefix)
+            continue
+        collect_source(plan, model, field.source.split("."), field, prefix,
+                       annotations)
+
+
+def collect_source(plan, model, bits, field=None, prefix="", annotations=()):
+    """
+    Добавляет в план путь ``source`` поля сериализатора.
+
+    ``field`` — само поле (вложенный сериализатор, связь) или ``None`` для
+    простого значения.
+    """
+    name, rest = bits[0], bits[1:]
+    if name in annotations:
+        return
+    model_field = get_relation(model, name)
+    if model_field is None:
+        dependencies = getattr(model, "PROPERTY_FIELDS", {}).get(name)
+        if dependencies is None:
+            load_level(plan, model, prefix)
+            return
+        for source in dependencies:
+            collect_source(plan, model, source.split("."), None, prefix)
+        return
+    if not model_field.is_relation:
+        plan.only.add(prefix + model_field.name)
+        return
+
+    related_model = model_field.related_model
+    path = prefix + model_field.name
+    if model_field.many_to_many or model_field.one_to_many:
+        accessor = name if prefix == "" else prefix + name
+        plan.prefetch[accessor] = Prefetch(
+            accessor, queryset=related_queryset(model_field, rest, field))
+        return
+
+    if model_field.concrete:
+        plan.only.add(prefix + model_field.name)
+        if not rest and isinstance(field, RelatedField):
+            if field.use_pk_only_optimization():
+                return
+    plan.select.add(path)
+    nested_prefix = path + "__"
+    plan.only.add(nested_prefix + related_model._meta.pk.name)
+    if rest:
+        collect_source(plan, related_model, rest, field, nested_prefix)
+    elif isinstance(field, BaseSerializer):
+        collect_serializer(plan, related_model, field, nested_prefix)
+    else:
+        load_level(plan, related_model, nested_prefix)
+
+
+def related_queryset(model_field, rest, field):
+    """Queryset для Prefetch связи «многие» с собственным планом загрузки."""
+    related_model = model_field.related_model
+    plan = LoadPlan()
+    plan.only.add(related_model._meta.pk.name)
+    if model_field.one_to_many:
+        # Внешний ключ нужен, чтобы разложить объекты по родителям.
+        plan.only.add(model_field.field.name)
+    if rest:
+        collect_source(plan, related_model, rest, field)
+    elif isinstance(field, BaseSerializer):
+        collect_serializer(plan, related_model, field)
+    elif isinstance(field, ManyRelatedField):
+        if not field.child_relation.use_pk_only_optimization():
+            load_level(plan, related_model, "")
+    else:
+        load_level(plan, related_model, "")
+    return apply_plan(related_model._default_manager.all(), plan)
+
+
+def apply_plan(queryset, plan, restrict=True):
+    if plan.select:
+        queryset = queryset.select_related(*sorted(plan.select))
+    if plan.prefetch:
+        queryset = queryset.prefetch_related(
+            *(plan.prefetch[path] for path in sorted(plan.prefetch)))
+    if restrict:
+        queryset = queryset.only(*sorted(plan.only))
+    return queryset
+
+
+def eager_load(queryset, serializer, extra_sources=(), restrict=True):
+    """
+    Подгружает связи, которые прочитает ``serializer``, и только нужные поля.
+
+    Одиночные связи загружаются через ``select_related``, связи «многие» —
+    через ``Prefetch`` с queryset, собранным по вложенному сериализатору.
+    ``extra_sources`` — дополнительные пути (например, поля сортировки).
+    При ``restrict=False`` ``only()`` не применяется.
+    """
+    plan = LoadPlan()
+    annotations = set(queryset.query.annotations)
+    collect_serializer(plan, queryset.model, serializer, annotations=annotations)
+    for source in extra_sources:
+        collect_source(plan, queryset.model, source.split("__"),
+                       annotations=annotations)
+    return apply_plan(queryset, plan, restrict)
+
+
+class EagerLoadingMixin:
+    """
+    Примесь вьюсета: queryset загружается по дереву полей сериализатора.
+
+    Новые вложенные поля сериализатора подхватываются автоматически, поэтому
+    не порождают запросов на каждую строку. ``only()`` применяется только
+    к чтению: изменяемые объекты загружаются целиком.
+    """
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        return eager_load(
+            queryset,
+            self.get_serializer(),
+            extra_sources=getattr(self, "ordering_fields", None) or (),
+            restrict=self.request.method in permissions.SAFE_METHODS,
+        )
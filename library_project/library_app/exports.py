@@ -0,0 +1,153 @@
+# library_app/exports.py
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+
+from .models import Author, Book, BookIssue, Rating
+
+
+def author_names(book):
+    return [f"{author.first_name} {author.last_name}" for author in book.authors.all()]
+
+
+class Export:
+    """
+    Описание выгрузки ресурса: queryset и колонки.
+
+    ``columns`` — пары (имя колонки, атрибут объекта или функция).
+    """
+
+    def __init__(self, queryset, columns, staff_only=False):
+        self.queryset = queryset
+        self.columns = columns
+        self.staff_only = staff_only
+
+    def get_queryset(self, updated_since=None):
+        queryset = self.queryset.all()
+        if updated_since is not None:
+            queryset = queryset.filter(updated_at__gte=updated_since)
+        # Выборке нужны только поля колонок: читаем их через only().
+        fields = [value for _, value in self.columns if isinstance(value, str)]
+        return queryset.only(*fields).order_by("pk")
+
+    @property
+    def headers(self):
+        return [name for name, _ in self.columns]
+
+    def values(self, obj):
+        return [
+            value(obj) if callable(value) else getattr(obj, value)
+            for _, value in self.columns
+        ]
+
+
+EXPORTS = {
+    "books": Export(
+        Book.objects.prefetch_related(
+            Prefetch(
+                "authors",
+                queryset=Author.objects.only("first_name", "last_name"),
+            )
+        ),
+        [
+            ("id", "id"),
+            ("title", "title"),
+            ("authors", author_names),
+            ("genre", "genre"),
+            ("published_date", "published_date"),
+            ("description", "description"),
+            ("rating_count", "rating_count"),
+            ("rating_sum", "rating_sum"),
+            ("comment_count", "comment_count"),
+            ("issue_count", "issue_count"),
+            ("active_issue_count", "active_issue_count"),
+            ("copies", "copies"),
+            ("available_copies", "available_copies"),
+            ("updated_at", "updated_at"),
+        ],
+    ),
+    "authors": Export(
+        Author.objects.all(),
+        [
+            ("id", "id"),
+            ("first_name", "first_name"),
+            ("last_name", "last_name"),
+            ("birth_date", "birth_date"),
+            ("updated_at", "updated_at"),
+        ],
+    ),
+    "issues": Export(
+        BookIssue.objects.all(),
+        [
+            ("id", "id"),
+            ("book_id", "book_id"),
+            ("user_id", "user_id"),
+            ("issue_date", "issue_date"),
+            ("due_date", "due_date"),
+            ("return_date", "return_date"),
+            ("updated_at", "updated_at"),
+        ],
+        staff_only=True,
+    ),
+    "ratings": Export(
+        Rating.objects.all(),
+        [
+            ("id", "id"),
+            ("book_id", "book_id"),
+            ("user_id", "user_id"),
+            ("score", "score"),
+            ("review", "review"),
+            ("created_at", "created_at"),
+            ("updated_at", "updated_at"),
+        ],
+    ),
+}
+
+
+class Echo:
+    """Псевдофайл для csv.writer: возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+def csv_rows(export, objects):
+    writer = csv.writer(Echo())
+    yield writer.writerow(export.headers)
+    for obj in objects:
+        values = export.values(obj)
+        yield writer.writerow(
+            ["; ".join(value) if isinstance(value, list) else value
+             for value in values]
+        )
+
+
+def ndjson_rows(export, objects):
+    headers = export.headers
+    for obj in objects:
+        yield json.dumps(
+            dict(zip(headers, export.values(obj))),
+            cls=DjangoJSONEncoder,
+            ensure_ascii=False,
+        ) + "\n"
+
+
+FORMATS = {
+    "csv": (csv_rows, "text/csv; charset=utf-8"),
+    "ndjson": (ndjson_rows, "application/x-ndjson; charset=utf-8"),
+}
+
+
+def stream_export(export, export_format, updated_since=None, chunk_size=2000):
+    """
+    Строки выгрузки по мере чтения из БД.
+
+    ``iterator(chunk_size)`` читает записи серверным курсором пачками,
+    связи «многие» подгружаются отдельным запросом на каждую пачку, поэтому
+    память не зависит от размера каталога.
+    """
+    rows, _ = FORMATS[export_format]
+    objects = export.get_queryset(updated_since).iterator(chunk_size=chunk_size)
+    return rows(export, objects)
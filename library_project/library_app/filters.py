@@ -0,0 +1,19 @@
+# library_app/filters.py
+from rest_framework import filters
+
+
+class RankedSearchFilter(filters.SearchFilter):
+    """
+    Поиск DRF через поисковый движок вьюсета.
+
+    Вместо OR-цепочки ``icontains`` по ``search_fields`` вызывает функцию
+    ``view.search_function(queryset, query)`` из ``search.py``, которая
+    использует индексы PostgreSQL и сортирует результат по релевантности.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, "").strip()
+        search_function = getattr(view, "search_function", None)
+        if not query or search_function is None:
+            return queryset
+        return search_function(queryset, query)
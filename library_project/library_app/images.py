@@ -0,0 +1,292 @@
+# library_app/images.py
+import logging
+import posixpath
+from datetime import timedelta
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .caching import invalidate, page_namespaces
+from .links import author_book_ids, book_author_ids
+from .models import Author, Book, ImageTask
+
+logger = logging.getLogger(__name__)
+
+# (модель, поле изображения, поле описания копий, ширины копий в пикселях).
+IMAGE_FIELDS = {
+    "book": (Book, "cover", "cover_variants", (160, 320, 640)),
+    "author": (Author, "photo", "photo_variants", (100, 200, 400)),
+}
+# Форматы копий: (имя в описании, формат Pillow, расширение, параметры).
+VARIANT_FORMATS = (
+    ("jpeg", "JPEG", "jpg", {"quality": 85, "optimize": True, "progressive": True}),
+    ("webp", "WEBP", "webp", {"quality": 80, "method": 6}),
+)
+
+
+def is_stale(name, variants, widths):
+    """Копии построены не для текущего файла или не для текущих ширин."""
+    if not name:
+        return bool(variants)
+    return variants.get("source") != name or variants.get("widths") != list(widths)
+
+
+def queue_image_task(model, object_id):
+    """Ставит задачу, если для объекта ещё нет ожидающей."""
+    return ImageTask.objects.get_or_create(
+        model=model, object_id=object_id, status=ImageTask.Status.PENDING
+    )[0]
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_save, sender=Author)
+def queue_if_stale(sender, instance, raw=False, **kwargs):
+    """Ставит задачу, если изображение объекта изменилось."""
+    if raw:
+        return
+    model = instance._meta.model_name
+    _, field_name, variants_name, widths = IMAGE_FIELDS[model]
+    name = getattr(instance, field_name).name or ""
+    if is_stale(name, getattr(instance, variants_name) or {}, widths):
+        queue_image_task(model, instance.pk)
+
+
+@receiver(pre_save, sender=Book)
+@receiver(pre_save, sender=Author)
+def delete_replaced_image(sender, instance, raw=False, **kwargs):
+    """Удаляет прежний файл, когда изображение заменено или очищено."""
+    if raw or instance._state.adding:
+        return
+    _, field_name, _, _ = IMAGE_FIELDS[instance._meta.model_name]
+    field_file = getattr(instance, field_name)
+    if field_file.name and field_file._committed:
+        return
+    old = sender.objects.filter(pk=instance.pk).values_list(
+        field_name, flat=True).first()
+    if old and old != field_file.name:
+        transaction.on_commit(lambda: delete_files(field_file.storage, [old]))
+
+
+@receiver(post_delete, sender=Book)
+@receiver(post_delete, sender=Author)
+def delete_images(sender, instance, **kwargs):
+    """Удаляет изображение и его копии вместе с объектом."""
+    _, field_name, variants_name, _ = IMAGE_FIELDS[instance._meta.model_name]
+    field_file = getattr(instance, field_name)
+    names = variant_files(getattr(instance, variants_name))
+    if field_file.name:
+        names.append(field_file.name)
+    if names:
+        transaction.on_commit(
+            lambda: delete_files(field_file.storage, names))
+
+
+def queue_stale(model, batch_size=1000):
+    """
+    Ставит задачи для всех объектов ``model`` с устаревшими копиями.
+
+    Возвращает число поставленных задач.
+    """
+    model_class, field_name, variants_name, widths = IMAGE_FIELDS[model]
+    pending = set(
+        ImageTask.objects.filter(
+            model=model, status=ImageTask.Status.PENDING
+        ).values_list("object_id", flat=True)
+    )
+    objects = (
+        model_class.objects.exclude(**{field_name: ""}, **{variants_name: {}})
+        .exclude(**{f"{field_name}__isnull": True, variants_name: {}})
+        .values_list("pk", field_name, variants_name)
+        .order_by("pk")
+    )
+    tasks = [
+        ImageTask(model=model, object_id=pk)
+        for pk, name, variants in objects.iterator(chunk_size=batch_size)
+        if pk not in pending and is_stale(name or "", variants or {}, widths)
+    ]
+    ImageTask.objects.bulk_create(tasks, batch_size=batch_size)
+    return len(tasks)
+
+
+def flatten_image(image):
+    """Приводит изображение к RGB; прозрачные области заливаются белым."""
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ("RGBA", "LA") or "transparency" in image.info:
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, "white")
+        background.paste(image, mask=image.getchannel("A"))
+        return background
+    return image.convert("RGB")
+
+
+def build_variants(field_file, widths):
+    """
+    Строит копии ``field_file`` указанных ширин в JPEG и WebP.
+
+    Копии не бывают шире оригинала и сохраняются в подкаталоге ``derived``
+    каталога загрузок поля. Возвращает описание копий для поля ``*_variants``.
+    """
+    with field_file.open("rb"):
+        with Image.open(field_file) as source:
+            image = flatten_image(source)
+    directory = posixpath.join(field_file.field.upload_to, "derived")
+    stem = posixpath.splitext(posixpath.basename(field_file.name))[0]
+    storage = field_file.storage
+
+    images = []
+    for width in sorted({min(width, image.width) for width in widths}):
+        height = max(round(image.height * width / image.width), 1)
+        resized = (
+            image if width == image.width
+            else image.resize((width, height), Image.LANCZOS)
+        )
+        entry = {"width": width, "height": height}
+        for key, image_format, extension, options in VARIANT_FORMATS:
+            buffer = BytesIO()
+            resized.save(buffer, image_format, **options)
+            entry[key] = storage.save(
+                posixpath.join(directory, f"{stem}-{width}.{extension}"),
+                ContentFile(buffer.getvalue()),
+            )
+        images.append(entry)
+    return {
+        "source": field_file.name,
+        "widths": list(widths),
+        "width": image.width,
+        "height": image.height,
+        "images": images,
+    }
+
+
+def variant_files(variants):
+    return [
+        entry[key]
+        for entry in (variants or {}).get("images", [])
+        for key, *_ in VARIANT_FORMATS
+        if entry.get(key)
+    ]
+
+
+def delete_files(storage, names):
+    for name in names:
+        try:
+            storage.delete(name)
+        except OSError as exc:
+            logger.warning("Could not delete image variant %s: %s", name, exc)
+
+
+def srcset(variants, key, url):
+    """Значение атрибута ``srcset`` для копий формата ``key``."""
+    return ", ".join(
+        f"{url(entry[key])} {entry['width']}w"
+        for entry in (variants or {}).get("images", [])
+        if entry.get(key)
+    )
+
+
+def image_namespaces(model, pk):
+    """Пространства имён кэша, где выводится изображение объекта."""
+    if model == "book":
+        return {"books"} | page_namespaces([pk], book_author_ids([pk]))
+    return {"authors", "books"} | page_namespaces(author_book_ids([pk]), [pk])
+
+
+def process_task(task):
+    """
+    Строит копии изображения объекта задачи.
+
+    Описание копий записывается, только если изображение не сменилось за
+    время обработки; иначе новые файлы удаляются, а задача остаётся в
+    очереди для свежего изображения. Возвращает ``True``, если задача
+    выполнена.
+    """
+    model, field_name, variants_name, widths = IMAGE_FIELDS[task.model]
+    obj = model.objects.filter(pk=task.object_id).only(
+        field_name, variants_name).first()
+    if obj is None:
+        return True
+    field_file = getattr(obj, field_name)
+    old = getattr(obj, variants_name) or {}
+    name = field_file.name or ""
+    if not is_stale(name, old, widths):
+        return True
+
+    new = build_variants(field_file, widths) if name else {}
+    updated = model.objects.filter(pk=obj.pk, **{field_name: name}).update(
+        **{variants_name: new, "updated_at": timezone.now()}
+    )
+    storage = field_file.storage
+    if not updated:
+        delete_files(storage, variant_files(new))
+        return False
+    # Хранилище считает ссылки на файлы (см. storage.py): прежние копии
+    # удаляются все, даже совпавшие по содержимому с новыми.
+    delete_files(storage, variant_files(old))
+    invalidate(image_namespaces(task.model, obj.pk))
+    return True
+
+
+def claim_tasks(batch_size):
+    """
+    Забирает пачку задач так же, как очередь писем (см. outbox.py):
+    ``SKIP LOCKED`` и аренда на время обработки.
+    """
+    now = timezone.now()
+    lease = timedelta(seconds=settings.IMAGE_TASK_LEASE_SECONDS)
+    with transaction.atomic():
+        batch = list(
+            ImageTask.objects.select_for_update(skip_locked=True)
+            .filter(status=ImageTask.Status.PENDING, available_at__lte=now)
+            .order_by("available_at", "id")[:batch_size]
+        )
+        if batch:
+            ImageTask.objects.filter(pk__in=[task.pk for task in batch]).update(
+                attempts=F("attempts") + 1, available_at=now + lease
+            )
+    for task in batch:
+        task.attempts += 1
+    return batch
+
+
+def process_batch(batch_size=20):
+    """
+    Обрабатывает одну пачку задач.
+
+    Возвращает пару (выполнено, с ошибкой); ``(0, 0)`` — очередь пуста.
+    """
+    done = []
+    failed = 0
+    for task in claim_tasks(batch_size):
+        try:
+            finished = process_task(task)
+        except Exception as exc:
+            failed += 1
+            record_failure(task, exc)
+            continue
+        if finished:
+            done.append(task.pk)
+        else:
+            ImageTask.objects.filter(pk=task.pk).update(
+                attempts=0, available_at=timezone.now())
+    if done:
+        ImageTask.objects.filter(pk__in=done).delete()
+    return len(done), failed
+
+
+def record_failure(task, exc):
+    """Планирует повтор или помечает задачу ошибочной."""
+    logger.warning("Image task %s failed: %s", task, exc)
+    updates = {"last_error": f"{type(exc).__name__}: {exc}"}
+    if task.attempts >= settings.IMAGE_TASK_MAX_ATTEMPTS:
+        updates["status"] = ImageTask.Status.FAILED
+    else:
+        updates["available_at"] = timezone.now() + timedelta(
+            minutes=task.attempts)
+    ImageTask.objects.filter(pk=task.pk).update(**updates)
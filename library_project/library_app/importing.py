@@ -0,0 +1,256 @@
+# library_app/importing.py
+import csv
+import json
+import time
+from collections import Counter, OrderedDict
+from datetime import date
+from itertools import islice
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Author, AuthorStats, Book, ImportCheckpoint
+from .search import refresh_book_search_vectors
+from .stats import add_author_book_counts
+
+BOOK_FIELDS = ("title", "genre", "published_date", "description")
+
+
+class ImportRowError(ValueError):
+    """Строка файла импорта не может быть загружена."""
+
+
+def read_csv(stream):
+    """
+    Строки CSV с заголовком ``title,authors,genre,published_date,description``.
+
+    Авторы перечисляются через ``;`` в виде «Имя Фамилия».
+    """
+    for row in csv.DictReader(stream):
+        row["authors"] = [
+            name for name in (row.get("authors") or "").split(";") if name.strip()
+        ]
+        yield row
+
+
+def read_jsonl(stream):
+    """
+    Объекты JSON по одному на строку с теми же полями, что и в CSV.
+
+    ``authors`` — список строк «Имя Фамилия» или объектов
+    ``{"first_name": ..., "last_name": ...}``.
+    """
+    for line in stream:
+        if line.strip():
+            yield line
+
+
+READERS = {"csv": read_csv, "jsonl": read_jsonl}
+
+
+def parse_author(value):
+    """Ключ автора ``(first_name, last_name)``."""
+    if isinstance(value, dict):
+        first_name = str(value.get("first_name") or "")
+        last_name = str(value.get("last_name") or "")
+    else:
+        first_name, _, last_name = str(value).strip().rpartition(" ")
+    first_name, last_name = first_name.strip(), last_name.strip()
+    if not last_name:
+        raise ImportRowError(f"Не указана фамилия автора: {value!r}.")
+    if len(first_name) > 100 or len(last_name) > 100:
+        raise ImportRowError(f"Слишком длинное имя автора: {value!r}.")
+    return first_name, last_name
+
+
+def parse_record(record):
+    """Поля книги и ключи её авторов из записи файла."""
+    if isinstance(record, str):
+        try:
+            record = json.loads(record)
+        except ValueError as error:
+            raise ImportRowError(f"Некорректный JSON: {error}.") from None
+        if not isinstance(record, dict):
+            raise ImportRowError("Ожидался объект JSON.")
+    fields = {name: str(record.get(name) or "").strip() for name in BOOK_FIELDS}
+    if not fields["title"]:
+        raise ImportRowError("Не указано название книги.")
+    if len(fields["title"]) > 255 or len(fields["genre"]) > 100:
+        raise ImportRowError("Слишком длинное название или жанр.")
+    if fields["published_date"]:
+        try:
+            fields["published_date"] = date.fromisoformat(
+                fields["published_date"])
+        except ValueError:
+            raise ImportRowError(
+                f"Некорректная дата: {fields['published_date']!r}.") from None
+    else:
+        fields["published_date"] = None
+    authors = record.get("authors") or []
+    if isinstance(authors, (str, dict)):
+        authors = [authors]
+    keys = list(dict.fromkeys(parse_author(value) for value in authors))
+    return fields, keys
+
+
+class AuthorLookup:
+    """
+    Сопоставление «имя, фамилия» → id автора с вытеснением давно не
+    использованных записей.
+
+    Размер ограничен, поэтому память не растёт с объёмом файла; промахи
+    разрешаются одним запросом на пачку, недостающие авторы создаются
+    через ``bulk_create``.
+    """
+
+    def __init__(self, max_size=100000):
+        self.max_size = max_size
+        self.pks = OrderedDict()
+        self.created = 0
+
+    def resolve(self, keys):
+        found = {}
+        missing = set()
+        for key in keys:
+            if key in self.pks:
+                self.pks.move_to_end(key)
+                found[key] = self.pks[key]
+            else:
+                missing.add(key)
+        if missing:
+            found.update(self.load(missing))
+        for key in missing:
+            self.pks[key] = found[key]
+        while len(self.pks) > self.max_size:
+            self.pks.popitem(last=False)
+        return found
+
+    def load(self, keys):
+        found = {}
+        existing = (
+            Author.objects.filter(
+                first_name__in={first for first, _ in keys},
+                last_name__in={last for _, last in keys},
+            )
+            .order_by("-pk")
+            .values_list("pk", "first_name", "last_name")
+        )
+        # Среди однофамильцев-тёзок выбирается самый ранний автор.
+        for pk, first_name, last_name in existing:
+            if (first_name, last_name) in keys:
+                found[(first_name, last_name)] = pk
+        new = sorted(key for key in keys if key not in found)
+        authors = Author.objects.bulk_create(
+            [Author(first_name=first, last_name=last) for first, last in new]
+        )
+        AuthorStats.objects.bulk_create(
+            [AuthorStats(author_id=author.pk) for author in authors])
+        self.created += len(authors)
+        found.update(zip(new, (author.pk for author in authors)))
+        return found
+
+
+class CatalogImporter:
+    """
+    Потоковый импорт книг и авторов пачками по ``chunk_size`` строк.
+
+    Каждая пачка загружается одной транзакцией вместе с обновлением
+    ``ImportCheckpoint``. В памяти держится только текущая пачка и
+    ограниченный кэш авторов. Сигналы при ``bulk_create`` не отправляются,
+    поэтому статистика авторов и поисковые векторы обновляются здесь же.
+    """
+
+    def __init__(self, checkpoint, chunk_size=2000, author_cache_size=100000,
+                 on_error=None, on_progress=None):
+        self.checkpoint = checkpoint
+        self.chunk_size = chunk_size
+        self.authors = AuthorLookup(author_cache_size)
+        self.on_error = on_error
+        self.on_progress = on_progress
+        self.imported = 0
+        self.errors = 0
+        self.elapsed = 0.0
+
+    @property
+    def rate(self):
+        return self.imported / self.elapsed if self.elapsed else 0.0
+
+    def run(self, records):
+        """Загружает записи, пропуская уже загруженные по checkpoint."""
+        started = time.monotonic()
+        records = islice(records, self.checkpoint.rows, None)
+        while True:
+            batch = list(islice(records, self.chunk_size))
+            if not batch:
+                break
+            self.import_chunk(batch)
+            self.elapsed = time.monotonic() - started
+            if self.on_progress:
+                self.on_progress(self)
+        self.checkpoint.finished_at = timezone.now()
+        self.checkpoint.save(update_fields=["finished_at", "updated_at"])
+        self.elapsed = time.monotonic() - started
+
+    def import_chunk(self, batch):
+        first_row = self.checkpoint.rows + 1
+        rows = []
+        errors = 0
+        for number, record in enumerate(batch, first_row):
+            try:
+                rows.append(parse_record(record))
+            except ImportRowError as error:
+                errors += 1
+                if self.on_error:
+                    self.on_error(number, error)
+
+        with transaction.atomic():
+            if rows:
+                self.write_rows(rows)
+            self.checkpoint.rows += len(batch)
+            self.checkpoint.imported += len(rows)
+            self.checkpoint.errors += errors
+            self.checkpoint.save(
+                update_fields=["rows", "imported", "errors", "updated_at"])
+        self.imported += len(rows)
+        self.errors += errors
+
+    def write_rows(self, rows):
+        author_pks = self.authors.resolve(
+            {key for _, keys in rows for key in keys})
+        books = Book.objects.bulk_create([Book(**fields) for fields, _ in rows])
+
+        through = Book.authors.through
+        links = []
+        book_counts = Counter()
+        for book, (_, keys) in zip(books, rows):
+            for author_pk in dict.fromkeys(author_pks[key] for key in keys):
+                links.append(through(book_id=book.pk, author_id=author_pk))
+                book_counts[author_pk] += 1
+        through.objects.bulk_create(links)
+
+        add_author_book_counts(book_counts)
+
+        refresh_book_search_vectors(
+            Book.objects.filter(pk__in=[book.pk for book in books]))
+
+
+def get_checkpoint(source, resume=False, restart=False):
+    """
+    Позиция импорта ``source``.
+
+    Незавершённый импорт нельзя начать заново без явного ``restart``:
+    иначе уже загруженные строки будут загружены повторно.
+    """
+    checkpoint, created = ImportCheckpoint.objects.get_or_create(source=source)
+    if created:
+        return checkpoint
+    if resume:
+        return checkpoint
+    if checkpoint.finished_at is None and checkpoint.rows and not restart:
+        raise ValueError(
+            f"Импорт {source} прерван на строке {checkpoint.rows}.")
+    checkpoint.rows = checkpoint.imported = checkpoint.errors = 0
+    checkpoint.started_at = timezone.now()
+    checkpoint.finished_at = None
+    checkpoint.save()
+    return checkpoint
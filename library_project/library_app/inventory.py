@@ -0,0 +1,151 @@
+# library_app/inventory.py
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .caching import invalidate, page_namespaces
+from .models import Book, BookHold, BookIssue
+from .stats import apply_book_deltas, counter_deltas
+from .utils import queue_rental_confirmation_email
+
+
+def new_issue(book, user, rental_period):
+    """Несохранённая выдача ``book`` на ``rental_period`` дней с сегодня."""
+    return BookIssue(
+        book=book,
+        user=user,
+        rental_period=rental_period,
+        due_date=timezone.localdate() + timedelta(days=rental_period),
+    )
+
+
+def reserve_copy(issue):
+    """
+    Занимает под новую выдачу ``issue`` свободный экземпляр книги.
+
+    Проверка и учёт выдачи в счётчиках — один условный UPDATE строки книги
+    (``... WHERE available_copies > 0``). Параллельные выдачи той же книги
+    ждут друг друга только на этой строке до конца транзакции и после
+    ожидания проверяют условие заново, поэтому экземпляров не выдаётся
+    больше, чем есть; другие книги не блокируются. Статистика авторов
+    обновляется после коммита, чтобы выдачи разных книг одного автора не
+    ждали друг друга. Возвращает False, если свободных экземпляров нет.
+    """
+    reserved = apply_book_deltas(
+        counter_deltas(new=issue.counter_contribution()),
+        require_available=True,
+        defer_author_stats=True,
+    )
+    # Вклад уже учтён: сигнал сохранения не применяет его второй раз.
+    issue._counters_applied = bool(reserved)
+    if reserved:
+        # UPDATE мимо Book.save(): страница книги со свободными
+        # экземплярами сбрасывается здесь.
+        invalidate(page_namespaces([issue.book_id]))
+    return bool(reserved)
+
+
+def hold_position(hold):
+    """Номер ожидающей брони в очереди на книгу, начиная с 1."""
+    return BookHold.objects.filter(
+        Q(created_at__lt=hold.created_at)
+        | Q(created_at=hold.created_at, id__lte=hold.pk),
+        book_id=hold.book_id,
+        status=BookHold.Status.WAITING,
+    ).count()
+
+
+def checkout(issue):
+    """
+    Сохраняет новую выдачу ``issue``, если есть свободный экземпляр, иначе
+    ставит пользователя в очередь на книгу.
+
+    Письмо о выдаче ставится в очередь в той же транзакции. Возвращает
+    бронь (уже ожидавшую, если пользователь стоит в очереди) или None,
+    если книга выдана.
+    """
+    with transaction.atomic():
+        if not reserve_copy(issue):
+            # Строка книги блокируется до конца транзакции: возврат,
+            # освобождающий экземпляр, дождётся брони и выдаст книгу по
+            # ней. Экземпляр мог освободиться до блокировки — проверяем
+            # ещё раз.
+            Book.objects.select_for_update().filter(pk=issue.book_id).exists()
+            if not reserve_copy(issue):
+                return hold_book(issue)
+        issue.save()
+        queue_rental_confirmation_email(issue.user, issue.book, issue.due_date)
+    return None
+
+
+def hold_book(issue):
+    """Ставит получателя выдачи ``issue`` в очередь на её книгу."""
+    try:
+        with transaction.atomic():
+            return BookHold.objects.create(
+                book=issue.book,
+                user=issue.user,
+                rental_period=issue.rental_period,
+            )
+    except IntegrityError:
+        return BookHold.objects.get(
+            book=issue.book, user=issue.user, status=BookHold.Status.WAITING)
+
+
+def fulfil_holds(book_id):
+    """
+    Выдаёт свободные экземпляры книги ожидающим в порядке очереди.
+
+    Вызывается в транзакции возврата (см. signals.py), поэтому
+    освободившийся экземпляр достаётся очереди раньше новых запросов:
+    они ждут блокировки строки книги. Возвращает число выдач.
+    """
+    fulfilled = 0
+    with transaction.atomic():
+        holds = (
+            BookHold.objects.filter(
+                book_id=book_id, status=BookHold.Status.WAITING)
+            .select_related("book", "user")
+            .select_for_update(skip_locked=True, of=("self",))
+            .order_by("created_at", "id")
+        )
+        while True:
+            hold = holds.first()
+            if hold is None:
+                break
+            issue = new_issue(hold.book, hold.user, hold.rental_period)
+            if not reserve_copy(issue):
+                break
+            issue.save()
+            hold.status = BookHold.Status.FULFILLED
+            hold.issue = issue
+            hold.fulfilled_at = timezone.now()
+            hold.save(update_fields=["status", "issue", "fulfilled_at"])
+            queue_rental_confirmation_email(
+                hold.user, hold.book, issue.due_date)
+            fulfilled += 1
+    return fulfilled
+
+
+def return_issue(issue, return_date=None):
+    """
+    Отмечает возврат ``issue``.
+
+    Возврат закрепляется условным UPDATE (``... WHERE return_date IS
+    NULL``): из параллельных возвратов одной выдачи экземпляр освобождает
+    только один. Затем выдача сохраняется обычным образом, и сигналы
+    обновляют счётчики и передают экземпляр очереди. Возвращает False, если
+    выдача уже возвращена.
+    """
+    return_date = return_date or timezone.localdate()
+    with transaction.atomic():
+        returned = BookIssue.objects.filter(
+            pk=issue.pk, return_date__isnull=True
+        ).update(return_date=return_date)
+        if not returned:
+            return False
+        issue.return_date = return_date
+        issue.save(update_fields=["return_date", "updated_at"])
+    return True
@@ -0,0 +1,20 @@
+# library_app/links.py
+from .models import Book
+
+
+def book_author_ids(book_ids):
+    """Первичные ключи авторов книг ``book_ids``."""
+    return set(
+        Book.authors.through.objects.filter(book_id__in=book_ids).values_list(
+            "author_id", flat=True
+        )
+    )
+
+
+def author_book_ids(author_ids):
+    """Первичные ключи книг авторов ``author_ids``."""
+    return set(
+        Book.authors.through.objects.filter(author_id__in=author_ids).values_list(
+            "book_id", flat=True
+        )
+    )
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from library_app.images import IMAGE_FIELDS, queue_stale
+
+
+class Command(BaseCommand):
+    """Ставит в очередь изображения без актуальных копий."""
+
+    help = (
+        "Ставит в очередь process_images обложки и фото авторов, для "
+        "которых уменьшенные копии ещё не построены или устарели."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--model",
+            choices=sorted(IMAGE_FIELDS),
+            action="append",
+            help="Обработать только книги или только авторов.",
+        )
+
+    def handle(self, *args, **options):
+        for model in options["model"] or sorted(IMAGE_FIELDS, reverse=True):
+            queued = queue_stale(model)
+            self.stdout.write(f"{model}: поставлено в очередь {queued}.")
+        self.stdout.write(self.style.SUCCESS(
+            "Запустите manage.py process_images, чтобы построить копии."))
@@ -0,0 +1,79 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from library_app.authentication import LibraryRefreshToken
+
+# Адреса API, которые читает обычный пользователь.
+URLS = ("book-list", "author-list", "issues-list", "rating-list",
+        "comment-list")
+
+
+class Command(BaseCommand):
+    """Сравнение JWT-аутентификации с запросом пользователя и без него."""
+
+    help = (
+        "Выполняет GET-запросы к API с access-токеном пользователя в "
+        "режиме с загрузкой пользователя из базы и в режиме "
+        "JWT_STATELESS_READS и сравнивает число запросов к БД и время."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--username",
+            help="Пользователь токена; по умолчанию первый по id.",
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=50,
+            help="Число запросов к каждому адресу в каждом режиме.",
+        )
+
+    def handle(self, *args, **options):
+        users = get_user_model().objects.order_by("pk")
+        if options["username"]:
+            users = users.filter(username=options["username"])
+        user = users.first()
+        if user is None:
+            raise CommandError("Пользователь не найден.")
+        client = APIClient(SERVER_NAME=settings.ALLOWED_HOSTS[0])
+        client.credentials(HTTP_AUTHORIZATION="Bearer {}".format(
+            LibraryRefreshToken.for_user(user).access_token))
+
+        self.stdout.write(
+            f"{'':<14} {'режим':<10} {'запросов':>9} {'p50, мс':>9}")
+        for url_name in URLS:
+            url = reverse(url_name)
+            for mode, stateless in (("db", False), ("stateless", True)):
+                with override_settings(
+                    JWT_STATELESS_READS=stateless,
+                    CATALOG_CACHE_ENABLED=False,
+                ):
+                    queries, p50 = self.run(client, url, options["requests"])
+                self.stdout.write(
+                    f"{url_name:<14} {mode:<10} {queries:9d} "
+                    f"{p50 * 1000:9.1f}"
+                )
+
+    def run(self, client, url, count):
+        """
+        Возвращает число запросов к БД на один ответ и медиану времени.
+        Кэш каталога отключён: сравнивается работа с базой.
+        """
+        timings = []
+        for _ in range(count):
+            with CaptureQueriesContext(connection) as context:
+                started = time.perf_counter()
+                response = client.get(url)
+                timings.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                raise CommandError(f"{url}: ответ {response.status_code}.")
+        return len(context.captured_queries), statistics.median(timings)
@@ -0,0 +1,119 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError, URLError
+from urllib.request import urlopen
+
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from library_app.models import Author, Book
+
+# (имя, синхронный адрес, асинхронный адрес); pk подставляется для
+# страниц одной записи.
+PAIRS = (
+    ("books", "book-list", "async_api_book_list"),
+    ("authors", "author-list", "async_api_author_list"),
+    ("book", "book_detail", "async_book_detail"),
+    ("author", "author_detail", "async_author_detail"),
+    ("book_list", "book_list", "async_book_list"),
+    ("author_list", "author_list", "async_author_list"),
+)
+
+
+def fetch(url):
+    started = time.perf_counter()
+    try:
+        with urlopen(url, timeout=60) as response:
+            response.read()
+            ok = response.status == 200
+    except (HTTPError, URLError, OSError):
+        ok = False
+    return time.perf_counter() - started, ok
+
+
+def percentile(values, fraction):
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+class Command(BaseCommand):
+    """Нагрузочное сравнение синхронных и асинхронных вью каталога."""
+
+    help = (
+        "Отправляет одновременные запросы к запущенному серверу и сравнивает "
+        "пропускную способность и задержки синхронных и асинхронных вью. "
+        "Имеет смысл под ASGI (SERVER_MODE=asgi)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--base-url",
+            default="http://127.0.0.1:8000",
+            help="Адрес запущенного сервера.",
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=200,
+            help="Число запросов к каждому адресу.",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=20,
+            help="Число одновременных запросов.",
+        )
+        parser.add_argument(
+            "--only",
+            action="append",
+            choices=[name for name, *_ in PAIRS],
+            help="Проверить только указанные пары (можно повторять).",
+        )
+
+    def handle(self, *args, **options):
+        book = Book.objects.order_by("pk").first()
+        author = Author.objects.order_by("pk").first()
+        if book is None or author is None:
+            raise CommandError("Каталог пуст: заполните его seed_catalog.")
+        ids = {"book": book.pk, "author": author.pk}
+        base_url = options["base_url"].rstrip("/")
+
+        self.stdout.write(
+            f"{'':<12} {'вью':<6} {'запр/с':>8} {'p50, мс':>9} "
+            f"{'p95, мс':>9} {'ошибок':>7}"
+        )
+        for name, sync_name, async_name in PAIRS:
+            if options["only"] and name not in options["only"]:
+                continue
+            args = [ids[name]] if name in ids else []
+            for kind, url_name in (("sync", sync_name), ("async", async_name)):
+                url = base_url + reverse(url_name, args=args)
+                rate, p50, p95, errors = self.run(url, options)
+                self.stdout.write(
+                    f"{name:<12} {kind:<6} {rate:8.1f} {p50 * 1000:9.1f} "
+                    f"{p95 * 1000:9.1f} {errors:7d}"
+                )
+
+    def run(self, url, options):
+        """
+        Прогоняет запросы к ``url``. Уникальный параметр каждого запроса
+        обходит кэш страниц: сравнивается работа с базой, а не кэш.
+        """
+        separator = "&" if "?" in url else "?"
+        fetch(url)  # прогрев соединений и шаблонов
+        started = time.perf_counter()
+        with ThreadPoolExecutor(options["concurrency"]) as executor:
+            results = list(executor.map(
+                fetch,
+                (f"{url}{separator}bench={i}"
+                 for i in range(options["requests"])),
+            ))
+        elapsed = time.perf_counter() - started
+        timings = sorted(seconds for seconds, _ in results)
+        errors = sum(1 for _, ok in results if not ok)
+        return (
+            len(results) / elapsed,
+            statistics.median(timings),
+            percentile(timings, 0.95),
+            errors,
+        )
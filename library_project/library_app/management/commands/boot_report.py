@@ -0,0 +1,109 @@
+import json
+import os
+import subprocess
+import sys
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Выполняется в отдельном интерпретаторе: в текущем Django уже загружен.
+PROBE = r"""
+import json
+import time
+
+stages = []
+started = last = time.perf_counter()
+
+
+def stage(name):
+    global last
+    now = time.perf_counter()
+    stages.append((name, now - last))
+    last = now
+
+
+import django
+from django.conf import settings
+
+settings.INSTALLED_APPS
+stage("settings")
+django.setup()
+stage("django.setup (приложения и модели)")
+from django.urls import get_resolver
+
+get_resolver().url_patterns
+stage("URLconf")
+from django.core.wsgi import get_wsgi_application
+
+application = get_wsgi_application()
+stage("WSGI-приложение (middleware)")
+from django.template.loader import get_template
+
+get_template("library_app/base.html")
+stage("шаблоны")
+stages.append(("всего", time.perf_counter() - started))
+print(json.dumps(stages))
+"""
+
+
+def import_times(stderr):
+    """
+    Время импорта по пакетам верхнего уровня из вывода ``-X importtime``.
+
+    Берётся накопленное время модулей, импортированных не из других
+    модулей (вместе с их зависимостями).
+    """
+    totals = Counter()
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|", 2)
+        if not cumulative.strip().isdigit():
+            continue
+        # Вложенность обозначается отступом в два пробела.
+        if len(name) - len(name.lstrip()) == 1:
+            totals[name.strip().split(".")[0]] += int(cumulative) / 1e6
+    return totals
+
+
+class Command(BaseCommand):
+    """Показывает, на что уходит время запуска приложения."""
+
+    help = (
+        "Запускает приложение в отдельном интерпретаторе и выводит время "
+        "этапов загрузки и самые медленные импорты пакетов."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--top",
+            type=int,
+            default=15,
+            help="Сколько самых медленных пакетов показать.",
+        )
+
+    def handle(self, *args, **options):
+        env = {
+            **os.environ,
+            "DJANGO_SETTINGS_MODULE": settings.SETTINGS_MODULE,
+            "PYTHONPATH": os.pathsep.join(filter(None, sys.path)),
+        }
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", PROBE],
+            capture_output=True,
+            text=True,
+            env=env,
+        )
+        if result.returncode:
+            raise CommandError(result.stderr.strip().splitlines()[-1])
+        stages = json.loads(result.stdout.strip().splitlines()[-1])
+
+        self.stdout.write("Этапы загрузки:")
+        for name, seconds in stages:
+            self.stdout.write(f"  {name:<40} {seconds * 1000:8.1f} мс")
+
+        self.stdout.write("\nСамые медленные импорты (вместе с зависимостями):")
+        totals = import_times(result.stderr)
+        for package, seconds in totals.most_common(options["top"]):
+            self.stdout.write(f"  {package:<40} {seconds * 1000:8.1f} мс")
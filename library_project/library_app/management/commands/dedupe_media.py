@@ -0,0 +1,68 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from library_app.caching import invalidate_catalog
+from library_app.images import IMAGE_FIELDS, queue_stale
+from library_app.storage import is_hashed
+
+
+class Command(BaseCommand):
+    """Переносит загруженные ранее файлы в хранилище с адресацией по хэшу."""
+
+    help = (
+        "Переименовывает обложки и фото, сохранённые до перехода на "
+        "хранилище с адресацией по содержимому, в имена из SHA-256: "
+        "одинаковые файлы сливаются в один. Уменьшенные копии ставятся "
+        "в очередь process_images."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--delete-orphans",
+            action="store_true",
+            help="Удалить файлы в каталогах загрузок, на которые никто не ссылается.",
+        )
+
+    def handle(self, *args, **options):
+        storage = default_storage
+        for model, (model_class, field_name, _, _) in sorted(IMAGE_FIELDS.items()):
+            rows = (
+                model_class.objects.exclude(**{field_name: ""})
+                .exclude(**{f"{field_name}__isnull": True})
+                .values_list("pk", field_name)
+                .order_by("pk")
+            )
+            legacy = set()
+            hashed = set()
+            for pk, name in rows.iterator():
+                if is_hashed(name):
+                    continue
+                if not storage.exists(name):
+                    self.stderr.write(f"{model} {pk}: файл {name} не найден.")
+                    continue
+                with storage.open(name) as content:
+                    new_name = storage.save(name, content)
+                model_class.objects.filter(
+                    pk=pk, **{field_name: name}).update(**{field_name: new_name})
+                legacy.add(name)
+                hashed.add(new_name)
+            for name in legacy:
+                storage.delete(name)
+
+            orphans = 0
+            upload_to = model_class._meta.get_field(field_name).upload_to
+            if options["delete_orphans"] and storage.exists(upload_to):
+                referenced = set(rows.values_list(field_name, flat=True))
+                _, files = storage.listdir(upload_to)
+                for filename in files:
+                    name = f"{upload_to.rstrip('/')}/{filename}"
+                    if name not in referenced and not is_hashed(name):
+                        storage.delete(name)
+                        orphans += 1
+
+            queued = queue_stale(model)
+            self.stdout.write(
+                f"{model}: {len(legacy)} файлов перенесено в {len(hashed)}, "
+                f"удалено без ссылок: {orphans}, копий в очереди: {queued}."
+            )
+        invalidate_catalog()
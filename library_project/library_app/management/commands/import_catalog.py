@@ -0,0 +1,114 @@
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from library_app.caching import invalidate_catalog
+from library_app.importing import READERS, CatalogImporter, get_checkpoint
+
+
+class Command(BaseCommand):
+    """Потоковый импорт каталога книг и авторов из CSV или JSONL."""
+
+    help = (
+        "Загружает книги и авторов из CSV или JSONL пачками через bulk_create. "
+        "Прерванный импорт продолжается с флагом --resume."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Путь к файлу или «-» для stdin.")
+        parser.add_argument(
+            "--format",
+            choices=sorted(READERS),
+            default=None,
+            help="Формат файла; по умолчанию определяется по расширению.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=2000,
+            help="Количество строк, загружаемых одной транзакцией.",
+        )
+        parser.add_argument(
+            "--author-cache",
+            type=int,
+            default=100000,
+            help="Сколько авторов держать в памяти для поиска дубликатов.",
+        )
+        parser.add_argument(
+            "--encoding",
+            default="utf-8",
+            help="Кодировка файла.",
+        )
+        group = parser.add_mutually_exclusive_group()
+        group.add_argument(
+            "--resume",
+            action="store_true",
+            help="Продолжить прерванный импорт этого файла.",
+        )
+        group.add_argument(
+            "--restart",
+            action="store_true",
+            help="Начать прерванный импорт заново.",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        file_format = options["format"] or self.guess_format(path)
+        if options["chunk_size"] <= 0:
+            raise CommandError("--chunk-size должен быть положительным.")
+        if path == "-" and options["resume"]:
+            raise CommandError("Продолжить можно только импорт из файла.")
+        source = "-" if path == "-" else os.path.abspath(path)
+        try:
+            checkpoint = get_checkpoint(
+                source, resume=options["resume"], restart=options["restart"])
+        except ValueError as error:
+            raise CommandError(
+                f"{error} Используйте --resume или --restart.") from None
+        if checkpoint.rows:
+            self.stdout.write(f"Продолжение со строки {checkpoint.rows + 1}.")
+
+        importer = CatalogImporter(
+            checkpoint,
+            chunk_size=options["chunk_size"],
+            author_cache_size=options["author_cache"],
+            on_error=self.report_error,
+            on_progress=self.report_progress,
+        )
+        stream = (
+            sys.stdin if path == "-"
+            else open(path, encoding=options["encoding"], newline="")
+        )
+        try:
+            importer.run(READERS[file_format](stream))
+        except OSError as error:
+            raise CommandError(f"Ошибка чтения {path}: {error}") from None
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+            # Даже частично загруженные пачки уже видны в каталоге.
+            invalidate_catalog()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Импортировано {importer.imported} книг, создано "
+            f"{importer.authors.created} авторов, ошибок: {importer.errors}; "
+            f"{importer.rate:.0f} строк/с."))
+
+    @staticmethod
+    def guess_format(path):
+        extension = os.path.splitext(path)[1].lower().lstrip(".")
+        if extension == "ndjson":
+            extension = "jsonl"
+        if extension not in READERS:
+            raise CommandError("Укажите формат файла через --format.")
+        return extension
+
+    def report_error(self, number, error):
+        self.stderr.write(f"Строка {number}: {error}")
+
+    def report_progress(self, importer):
+        self.stdout.write(
+            f"Загружено {importer.checkpoint.rows} строк "
+            f"({importer.rate:.0f} строк/с)."
+        )
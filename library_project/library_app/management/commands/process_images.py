@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from library_app.images import process_batch
+
+
+class Command(BaseCommand):
+    """Фоновый обработчик очереди изображений."""
+
+    help = (
+        "Строит уменьшенные копии обложек и фото авторов (JPEG и WebP) "
+        "для изображений из очереди."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=20,
+            help="Количество задач, забираемых из очереди за раз.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=5.0,
+            help="Пауза в секундах, когда очередь пуста.",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Обработать всё, что готово, и завершиться.",
+        )
+
+    def handle(self, *args, **options):
+        total_done = total_failed = 0
+        try:
+            while True:
+                done, failed = process_batch(options["batch_size"])
+                total_done += done
+                total_failed += failed
+                if done or failed:
+                    continue
+                if options["once"]:
+                    break
+                time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(
+            f"Обработано: {total_done}, ошибок: {total_failed}.")
@@ -0,0 +1,58 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from library_app.sessions import (purge_abandoned_visitors,
+                                  purge_expired_sessions)
+
+
+class Command(BaseCommand):
+    """Фоновая очистка истёкших сессий и заброшенных посетителей."""
+
+    help = (
+        "Удаляет истёкшие сессии и посетителей, вошедших по имени, которые "
+        "давно не заходили и ничего не оставили, небольшими пачками без "
+        "долгих блокировок."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="Количество строк, удаляемых одной транзакцией.",
+        )
+        parser.add_argument(
+            "--visitor-idle-days",
+            type=int,
+            default=settings.VISITOR_MAX_IDLE_DAYS,
+            help="Через сколько дней без входа посетитель считается "
+                 "заброшенным.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=3600.0,
+            help="Пауза в секундах между очистками.",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Выполнить одну очистку и завершиться.",
+        )
+
+    def handle(self, *args, **options):
+        sessions = visitors = 0
+        try:
+            while True:
+                sessions += purge_expired_sessions(options["chunk_size"])
+                visitors += purge_abandoned_visitors(
+                    options["visitor_idle_days"], options["chunk_size"])
+                if options["once"]:
+                    break
+                time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(
+            f"Удалено сессий: {sessions}, посетителей: {visitors}.")
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from library_app.stats import rebuild_author_stats, rebuild_book_counters
+
+
+class Command(BaseCommand):
+    """Пересчитывает денормализованные счётчики книг и авторов с нуля."""
+
+    help = (
+        "Пересчитывает счётчики рейтингов, комментариев и выдач книг, "
+        "затем статистику авторов."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Количество записей, пересчитываемых одним запросом.",
+        )
+
+    def handle(self, *args, **options):
+        books = rebuild_book_counters(batch_size=options["batch_size"])
+        authors = rebuild_author_stats(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Счётчики пересчитаны для {books} книг и {authors} авторов."))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from library_app.search import rebuild_book_search_vectors
+
+
+class Command(BaseCommand):
+    """Пересчитывает поисковые векторы книг."""
+
+    help = "Пересчитывает поле search_vector у всех книг."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Количество книг, обновляемых одним запросом.",
+        )
+
+    def handle(self, *args, **options):
+        updated = rebuild_book_search_vectors(
+            batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Поисковый индекс пересчитан для {updated} книг."))
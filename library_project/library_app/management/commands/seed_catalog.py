@@ -0,0 +1,241 @@
+import random
+import time
+from collections import Counter
+from datetime import date, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import IntegerField, Max
+from django.db.models.functions import Cast, Substr
+
+from library_app.caching import invalidate_catalog
+from library_app.models import Author, Book, BookIssue, Comment, Rating
+from library_app.search import rebuild_book_search_vectors
+from library_app.stats import rebuild_author_stats, rebuild_book_counters
+
+FIRST_NAMES = (
+    "Anna", "Boris", "Clara", "Dmitry", "Elena", "Fyodor", "Galina", "Ivan",
+    "Jane", "Leo", "Maria", "Nikolai", "Olga", "Pavel", "Sofia", "Victor",
+)
+LAST_NAMES = (
+    "Austen", "Bulgakov", "Chekhov", "Dickens", "Eliot", "Gogol", "Hugo",
+    "Kafka", "Nabokov", "Orwell", "Pushkin", "Shelley", "Tolstoy", "Twain",
+    "Verne", "Woolf",
+)
+WORDS = (
+    "river", "winter", "garden", "shadow", "city", "letter", "storm", "house",
+    "night", "island", "road", "mirror", "silence", "fire", "stone", "sea",
+    "forest", "journey", "secret", "dream",
+)
+GENRES = (
+    "Novel", "Poetry", "Drama", "Science fiction", "Fantasy", "Detective",
+    "History", "Biography",
+)
+
+
+class Command(BaseCommand):
+    """Заполняет базу синтетическим каталогом для нагрузочных тестов."""
+
+    help = (
+        "Создаёт воспроизводимый набор авторов, книг, пользователей, выдач, "
+        "рейтингов и комментариев через bulk_create, затем пересчитывает "
+        "счётчики и поисковый индекс."
+    )
+
+    def add_arguments(self, parser):
+        for name, default in (
+            ("books", 100000),
+            ("authors", 20000),
+            ("users", 10000),
+            ("issues", 200000),
+            ("ratings", 200000),
+            ("comments", 200000),
+        ):
+            parser.add_argument(
+                f"--{name}",
+                type=int,
+                default=default,
+                help=f"Количество создаваемых объектов ({name}).",
+            )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=42,
+            help="Начальное значение генератора: одинаковый seed — одинаковые данные.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Количество объектов в одном INSERT.",
+        )
+
+    def handle(self, *args, **options):
+        counts = {
+            name: options[name]
+            for name in ("books", "authors", "users", "issues", "ratings", "comments")
+        }
+        if any(count < 0 for count in counts.values()):
+            raise CommandError("Количество объектов не может быть отрицательным.")
+        if counts["books"] and not counts["authors"]:
+            raise CommandError("Для книг нужен хотя бы один автор.")
+        needs_books = counts["issues"] or counts["ratings"] or counts["comments"]
+        if needs_books and not (counts["books"] and counts["users"]):
+            raise CommandError(
+                "Для выдач, рейтингов и комментариев нужны книги и пользователи.")
+        if counts["ratings"] > counts["books"] * counts["users"]:
+            raise CommandError(
+                "Рейтингов больше, чем пар «книга — пользователь».")
+
+        self.rng = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        started = time.monotonic()
+
+        with transaction.atomic():
+            author_ids = self.create(Author, self.authors(counts["authors"]))
+            book_ids = self.create(Book, self.books(counts["books"]))
+            self.create(
+                Book.authors.through, self.book_links(book_ids, author_ids))
+            user_ids = self.create(User, self.users(counts["users"]))
+            self.create(
+                BookIssue, self.issues(counts["issues"], book_ids, user_ids))
+            self.create(
+                Rating, self.ratings(counts["ratings"], book_ids, user_ids))
+            self.create(
+                Comment, self.comments(counts["comments"], book_ids, user_ids))
+
+            # bulk_create не отправляет сигналы: денормализованные данные
+            # и кэш приводятся в порядок явно. Пересчёт чужих книг из того же
+            # диапазона ключей безвреден.
+            if book_ids:
+                new_books = Book.objects.filter(pk__gte=min(book_ids))
+                rebuild_book_counters(new_books, batch_size=self.batch_size)
+                rebuild_book_search_vectors(
+                    new_books, batch_size=self.batch_size)
+            rebuild_author_stats(batch_size=self.batch_size)
+            invalidate_catalog()
+
+        created = ", ".join(f"{name}: {count}" for name, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(
+            f"Создано {created} за {time.monotonic() - started:.1f} с."))
+
+    def create(self, model, objects):
+        """Сохраняет объекты пачками и возвращает их первичные ключи."""
+        pks = []
+        batch = []
+        for obj in objects:
+            batch.append(obj)
+            if len(batch) == self.batch_size:
+                pks.extend(self.flush(model, batch))
+                batch = []
+        if batch:
+            pks.extend(self.flush(model, batch))
+        return pks
+
+    @staticmethod
+    def flush(model, batch):
+        return [obj.pk for obj in model.objects.bulk_create(batch)]
+
+    def random_date(self, start_year, end_year):
+        start = date(start_year, 1, 1)
+        span = (date(end_year, 12, 31) - start).days
+        return start + timedelta(days=self.rng.randint(0, span))
+
+    def words(self, low, high):
+        return " ".join(
+            self.rng.choice(WORDS) for _ in range(self.rng.randint(low, high)))
+
+    def authors(self, count):
+        for _ in range(count):
+            yield Author(
+                first_name=self.rng.choice(FIRST_NAMES),
+                last_name=self.rng.choice(LAST_NAMES),
+                birth_date=self.random_date(1800, 1990),
+            )
+
+    def books(self, count):
+        for _ in range(count):
+            yield Book(
+                title=self.words(1, 4).capitalize(),
+                genre=self.rng.choice(GENRES),
+                published_date=self.random_date(1850, 2024),
+                description=self.words(10, 30),
+            )
+
+    def book_links(self, book_ids, author_ids):
+        through = Book.authors.through
+        for book_id in book_ids:
+            count = min(self.rng.randint(1, 3), len(author_ids))
+            for author_id in self.rng.sample(author_ids, count):
+                yield through(book_id=book_id, author_id=author_id)
+
+    def users(self, count):
+        # Пароль не задаётся: синтетические пользователи не могут войти.
+        password = make_password(None)
+        start = self.next_reader_number()
+        for number in range(start, start + count):
+            yield User(
+                username=f"reader{number}",
+                email=f"reader{number}@example.com",
+                password=password,
+            )
+
+    @staticmethod
+    def next_reader_number():
+        """
+        Номер, следующий за наибольшим из имён ``readerN``: число
+        пользователей не годится, если часть из них уже удалена.
+        """
+        prefix = "reader"
+        highest = (
+            User.objects.filter(username__regex=rf"^{prefix}[0-9]+$")
+            .annotate(number=Cast(
+                Substr("username", len(prefix) + 1), IntegerField()))
+            .aggregate(highest=Max("number"))["highest"]
+        )
+        return 0 if highest is None else highest + 1
+
+    def issues(self, count, book_ids, user_ids):
+        # Новые книги создаются с числом экземпляров по умолчанию; выдачи
+        # сверх него сразу возвращаются, чтобы не уйти в минус.
+        copies = Book._meta.get_field("copies").get_default()
+        active = Counter()
+        today = date.today()
+        for _ in range(count):
+            book_id = self.rng.choice(book_ids)
+            due_date = today + timedelta(days=self.rng.randint(-60, 30))
+            returned = due_date < today and self.rng.random() < 0.8
+            if not returned and active[book_id] >= copies:
+                returned = True
+            if not returned:
+                active[book_id] += 1
+            yield BookIssue(
+                book_id=book_id,
+                user_id=self.rng.choice(user_ids),
+                due_date=due_date,
+                return_date=min(due_date, today) if returned else None,
+            )
+
+    def ratings(self, count, book_ids, user_ids):
+        seen = set()
+        while len(seen) < count:
+            pair = (self.rng.choice(book_ids), self.rng.choice(user_ids))
+            if pair in seen:
+                continue
+            seen.add(pair)
+            yield Rating(
+                book_id=pair[0],
+                user_id=pair[1],
+                score=self.rng.randint(1, 5),
+                review=self.words(3, 12),
+            )
+
+    def comments(self, count, book_ids, user_ids):
+        for _ in range(count):
+            yield Comment(
+                book_id=self.rng.choice(book_ids),
+                user_id=self.rng.choice(user_ids),
+                text=self.words(5, 20),
+            )
@@ -0,0 +1,75 @@
+import time
+
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+
+from library_app.outbox import deliver_batch
+
+
+class Command(BaseCommand):
+    """Фоновый обработчик очереди писем."""
+
+    help = (
+        "Отправляет письма из очереди пачками через одно соединение "
+        "с почтовым сервером, с повторами и экспоненциальной задержкой."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="Количество писем, забираемых из очереди за раз.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=5.0,
+            help="Пауза в секундах, когда очередь пуста.",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Отправить всё, что готово к отправке, и завершиться.",
+        )
+        parser.add_argument(
+            "--backend",
+            default=None,
+            help=(
+                "Почтовый бэкенд вместо EMAIL_BACKEND, полный путь к классу "
+                "(например, django.core.mail.backends.filebased.EmailBackend)."
+            ),
+        )
+
+    def handle(self, *args, **options):
+        connection = get_connection(backend=options["backend"])
+        total_sent = total_failed = 0
+        try:
+            while True:
+                try:
+                    connection.open()
+                except Exception as exc:
+                    # Сервер недоступен: письма ждут следующей попытки.
+                    self.stderr.write(f"Нет соединения с сервером: {exc}")
+                    if options["once"]:
+                        break
+                    time.sleep(options["interval"])
+                    continue
+                while True:
+                    sent, failed = deliver_batch(
+                        connection, options["batch_size"])
+                    total_sent += sent
+                    total_failed += failed
+                    if not sent and not failed:
+                        break
+                if options["once"]:
+                    break
+                # Очередь пуста: не держим соединение с сервером открытым.
+                connection.close()
+                time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            connection.close()
+        self.stdout.write(
+            f"Отправлено: {total_sent}, ошибок: {total_failed}.")
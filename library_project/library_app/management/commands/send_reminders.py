@@ -0,0 +1,51 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from library_app.reminders import send_reminders
+
+
+class Command(BaseCommand):
+    """Напоминания о просроченных и подходящих к сроку выдачах."""
+
+    help = (
+        "Находит невозвращённые книги с истёкшим или близким сроком возврата "
+        "и ставит в очередь по одному письму каждому читателю. Безопасна для "
+        "запуска по расписанию: отправленные напоминания не повторяются."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--due-soon-days",
+            type=int,
+            default=settings.REMINDER_DUE_SOON_DAYS,
+            help="За сколько дней до срока напоминать о возврате.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="Количество выдач, читаемых за один запрос.",
+        )
+        parser.add_argument(
+            "--date",
+            default=None,
+            help="Считать сегодняшней эту дату (ГГГГ-ММ-ДД).",
+        )
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        if options["date"]:
+            try:
+                today = parse_date(options["date"])
+            except ValueError:
+                today = None
+            if today is None:
+                raise CommandError("Дата должна быть в формате ГГГГ-ММ-ДД.")
+        emails, reminders = send_reminders(
+            today, options["due_soon_days"], options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Напоминаний: {reminders}, писем в очереди: {emails}. "
+            "Отправляет их manage.py send_outbox."
+        ))
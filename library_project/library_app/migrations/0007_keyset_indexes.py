@@ -0,0 +1,53 @@
+# Generated by Django 5.2.7 on 2026-10-18 05:22
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("library_app", "0006_bookissue_rental_period"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="author",
+            index=models.Index(
+                fields=["last_name", "id"], name="author_last_name_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="author",
+            index=models.Index(
+                fields=["first_name", "id"], name="author_first_name_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="book",
+            index=models.Index(fields=["title", "id"], name="book_title_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="bookissue",
+            index=models.Index(
+                fields=["issue_date", "id"], name="issue_issue_date_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="bookissue",
+            index=models.Index(fields=["due_date", "id"], name="issue_due_date_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="comment",
+            index=models.Index(
+                fields=["created_at", "id"], name="comment_created_at_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="rating",
+            index=models.Index(
+                fields=["created_at", "id"], name="rating_created_at_id_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.2.7 on 2026-10-18 05:24
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def fill_book_counters(apps, schema_editor):
+    Book = apps.get_model("library_app", "Book")
+    BookIssue = apps.get_model("library_app", "BookIssue")
+    Comment = apps.get_model("library_app", "Comment")
+    Rating = apps.get_model("library_app", "Rating")
+
+    def aggregate(model, function, **filters):
+        return Coalesce(
+            Subquery(
+                model.objects.filter(book=OuterRef("pk"), **filters)
+                .order_by()
+                .values("book")
+                .annotate(total=function)
+                .values("total"),
+                output_field=IntegerField(),
+            ),
+            0,
+        )
+
+    Book.objects.update(
+        rating_count=aggregate(Rating, Count("pk")),
+        rating_sum=aggregate(Rating, Sum("score")),
+        comment_count=aggregate(Comment, Count("pk")),
+        issue_count=aggregate(BookIssue, Count("pk")),
+        active_issue_count=aggregate(
+            BookIssue, Count("pk"), return_date__isnull=True),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("library_app", "0007_keyset_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="book",
+            name="active_issue_count",
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="book",
+            name="comment_count",
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="book",
+            name="issue_count",
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="book",
+            name="rating_count",
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="book",
+            name="rating_sum",
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_book_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.7 on 2026-10-18 05:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def fill_author_stats(apps, schema_editor):
+    Author = apps.get_model("library_app", "Author")
+    AuthorStats = apps.get_model("library_app", "AuthorStats")
+    Book = apps.get_model("library_app", "Book")
+
+    AuthorStats.objects.bulk_create(
+        [AuthorStats(author_id=pk) for pk in Author.objects.values_list("pk", flat=True)]
+    )
+
+    def book_total(function):
+        return Coalesce(
+            Subquery(
+                Book.objects.filter(authors=OuterRef("pk"))
+                .order_by()
+                .values("authors")
+                .annotate(total=function)
+                .values("total"),
+                output_field=IntegerField(),
+            ),
+            0,
+        )
+
+    AuthorStats.objects.update(
+        book_count=book_total(Count("pk")),
+        rating_count=book_total(Sum("rating_count")),
+        rating_sum=book_total(Sum("rating_sum")),
+        issue_count=book_total(Sum("issue_count")),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("library_app", "0008_book_counters"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AuthorStats",
+            fields=[
+                (
+                    "author",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="stats",
+                        serialize=False,
+                        to="library_app.author",
+                    ),
+                ),
+                ("book_count", models.IntegerField(default=0)),
+                ("rating_count", models.IntegerField(default=0)),
+                ("rating_sum", models.IntegerField(default=0)),
+                ("issue_count", models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(fill_author_stats, migrations.RunPython.noop),
+    ]
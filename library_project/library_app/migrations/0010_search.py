@@ -0,0 +1,88 @@
+# Generated by Django 5.2.7 on 2026-10-18 05:28
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.operations import TrigramExtension
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import OuterRef, Subquery, TextField
+from django.db.models import Value as V
+from django.db.models.functions import Concat
+
+
+def fill_search_vectors(apps, schema_editor):
+    Book = apps.get_model("library_app", "Book")
+    config = settings.SEARCH_CONFIG
+    author_names = Subquery(
+        Book.authors.through.objects.filter(book=OuterRef("pk"))
+        .order_by()
+        .values("book")
+        .annotate(
+            names=StringAgg(
+                Concat(
+                    "author__first_name",
+                    V(" "),
+                    "author__last_name",
+                    output_field=TextField(),
+                ),
+                delimiter=" ",
+            )
+        )
+        .values("names"),
+        output_field=TextField(),
+    )
+    Book.objects.update(
+        search_vector=SearchVector("title", weight="A", config=config)
+        + SearchVector(author_names, weight="A", config=config)
+        + SearchVector("genre", weight="B", config=config)
+        + SearchVector("description", weight="C", config=config)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("library_app", "0009_author_stats"),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name="book",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="author",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["first_name"],
+                name="author_first_name_trgm_idx",
+                opclasses=["gin_trgm_ops"],
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="author",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["last_name"],
+                name="author_last_name_trgm_idx",
+                opclasses=["gin_trgm_ops"],
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="book",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"], name="book_search_vector_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="book",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["title"], name="book_title_trgm_idx", opclasses=["gin_trgm_ops"]
+            ),
+        ),
+        migrations.RunPython(fill_search_vectors, migrations.RunPython.noop),
+    ]
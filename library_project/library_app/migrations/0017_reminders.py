@@ -0,0 +1,75 @@
+# Generated by Django 5.2.7 on 2026-10-18 06:25
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("library_app", "0016_conditional_get"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Reminder",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("due_soon", "Скоро срок возврата"),
+                            ("overdue", "Срок возврата истёк"),
+                        ],
+                        max_length=10,
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="bookissue",
+            index=models.Index(
+                condition=models.Q(("return_date__isnull", True)),
+                fields=["due_date", "id"],
+                name="issue_active_due_date_idx",
+            ),
+        ),
+        migrations.AddField(
+            model_name="reminder",
+            name="email",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="reminders",
+                to="library_app.outboxemail",
+            ),
+        ),
+        migrations.AddField(
+            model_name="reminder",
+            name="issue",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="reminders",
+                to="library_app.bookissue",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="reminder",
+            constraint=models.UniqueConstraint(
+                fields=("issue", "kind"), name="reminder_issue_kind_uniq"
+            ),
+        ),
+    ]
@@ -0,0 +1,113 @@
+# Generated by Django 5.2.7 on 2026-10-18 06:31
+
+import django.db.models.deletion
+import django.db.models.expressions
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_copies(apps, schema_editor):
+    # Выданных экземпляров не может быть больше, чем есть в фонде.
+    Book = apps.get_model("library_app", "Book")
+    Book.objects.filter(active_issue_count__gt=1).update(
+        copies=models.F("active_issue_count")
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("library_app", "0017_reminders"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="book",
+            name="copies",
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.RunPython(fill_copies, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name="book",
+            name="available_copies",
+            field=models.GeneratedField(
+                db_persist=True,
+                expression=django.db.models.expressions.CombinedExpression(
+                    models.F("copies"), "-", models.F("active_issue_count")
+                ),
+                output_field=models.IntegerField(),
+            ),
+        ),
+        migrations.CreateModel(
+            name="BookHold",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("rental_period", models.PositiveIntegerField(default=14)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("waiting", "В очереди"),
+                            ("fulfilled", "Выдана"),
+                            ("cancelled", "Отменена"),
+                        ],
+                        default="waiting",
+                        max_length=10,
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("fulfilled_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "book",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="holds",
+                        to="library_app.book",
+                    ),
+                ),
+                (
+                    "issue",
+                    models.OneToOneField(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="hold",
+                        to="library_app.bookissue",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="book_holds",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        condition=models.Q(("status", "waiting")),
+                        fields=["book", "created_at", "id"],
+                        name="hold_waiting_queue_idx",
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        condition=models.Q(("status", "waiting")),
+                        fields=("book", "user"),
+                        name="hold_waiting_book_user_uniq",
+                    )
+                ],
+            },
+        ),
+    ]
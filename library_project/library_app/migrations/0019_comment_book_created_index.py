@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2026-10-18 06:55
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("library_app", "0018_book_copies_and_holds"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="comment",
+            index=models.Index(
+                fields=["book", "created_at", "id"], name="comment_book_created_id_idx"
+            ),
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.contrib.auth.models import User
-from django.db import models
-from django.db.models import Avg
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, router, transaction
+from django.utils import timezone
 
 
 class Author(models.Model):
@@ -13,16 +15,75 @@ class Author(models.Model):
     birth_date = models.DateField(null=True, blank=True)
     photo = models.ImageField(
         upload_to="authors/photos/", null=True, blank=True)
+    # Уменьшенные копии фото (см. images.py).
+    photo_variants = models.JSONField(default=dict, blank=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["last_name", "id"], name="author_last_name_id_idx"),
+            models.Index(
+                fields=["updated_at", "id"], name="author_updated_at_id_idx"),
+            models.Index(
+                fields=["first_name", "id"], name="author_first_name_id_idx"),
+            GinIndex(
+                fields=["first_name"],
+                opclasses=["gin_trgm_ops"],
+                name="author_first_name_trgm_idx",
+            ),
+            GinIndex(
+                fields=["last_name"],
+                opclasses=["gin_trgm_ops"],
+                name="author_last_name_trgm_idx",
+            ),
+        ]
+
+    # Поля, которые читают свойства модели (см. eager_loading.py).
+    PROPERTY_FIELDS = {"average_rating": ("stats.rating_count", "stats.rating_sum")}
 
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
 
     @property
     def average_rating(self):
-        ratings = Rating.objects.filter(book__authors=self)
-        if ratings.exists():
-            return ratings.aggregate(models.Avg("score"))["score__avg"]
-        return None
+        stats = getattr(self, "stats", None)
+        return stats.average_rating if stats is not None else None
+
+
+class AuthorStats(models.Model):
+    """
+    Предрассчитанная статистика автора по всем его книгам.
+    """
+
+    author = models.OneToOneField(
+        Author, on_delete=models.CASCADE, primary_key=True, related_name="stats"
+    )
+    book_count = models.IntegerField(default=0)
+    rating_count = models.IntegerField(default=0)
+    rating_sum = models.IntegerField(default=0)
+    issue_count = models.IntegerField(default=0)
+    # Статистика ведётся UPDATE-запросами (см. stats.py), которые сами
+    # выставляют это поле.
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["updated_at"], name="author_stats_updated_at_idx"),
+        ]
+
+    # Поля, которые переносятся на авторов из счётчиков книги.
+    BOOK_COUNTER_FIELDS = ("rating_count", "rating_sum", "issue_count")
+    PROPERTY_FIELDS = {"average_rating": ("rating_count", "rating_sum")}
+
+    def __str__(self):
+        return f"Stats for {self.author}"
+
+    @property
+    def average_rating(self):
+        if not self.rating_count:
+            return None
+        return self.rating_sum / self.rating_count
 
 
 class Book(models.Model):
@@ -36,17 +97,123 @@ class Book(models.Model):
     published_date = models.DateField(null=True, blank=True)
     description = models.TextField(blank=True)
     cover = models.ImageField(upload_to="books/covers/", null=True, blank=True)
+    # Уменьшенные копии обложки (см. images.py).
+    cover_variants = models.JSONField(default=dict, blank=True, editable=False)
+    rating_count = models.IntegerField(default=0, editable=False)
+    rating_sum = models.IntegerField(default=0, editable=False)
+    comment_count = models.IntegerField(default=0, editable=False)
+    issue_count = models.IntegerField(default=0, editable=False)
+    active_issue_count = models.IntegerField(default=0, editable=False)
+    # Экземпляры в фонде; свободные вычисляет сама база, поэтому условный
+    # UPDATE выдачи (см. inventory.py) видит их вместе со счётчиком выдач.
+    copies = models.PositiveIntegerField(default=1)
+    available_copies = models.GeneratedField(
+        expression=models.F("copies") - models.F("active_issue_count"),
+        output_field=models.IntegerField(),
+        db_persist=True,
+    )
+    search_vector = SearchVectorField(null=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    COUNTER_FIELDS = (
+        "rating_count",
+        "rating_sum",
+        "comment_count",
+        "issue_count",
+        "active_issue_count",
+    )
+    # Поля, которые ведутся отдельными UPDATE и не пишутся при save().
+    DERIVED_FIELDS = COUNTER_FIELDS + ("search_vector", "cover_variants")
+    PROPERTY_FIELDS = {"average_rating": ("rating_count", "rating_sum")}
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["title", "id"], name="book_title_id_idx"),
+            models.Index(
+                fields=["updated_at", "id"], name="book_updated_at_id_idx"),
+            GinIndex(fields=["search_vector"], name="book_search_vector_idx"),
+            GinIndex(
+                fields=["title"],
+                opclasses=["gin_trgm_ops"],
+                name="book_title_trgm_idx",
+            ),
+        ]
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        # Счётчики и поисковый вектор обновляются отдельными запросами
+        # (см. stats.py и search.py), поэтому при обычном сохранении книги
+        # их устаревшие значения не пишутся.
+        if (
+            not self._state.adding
+            and kwargs.get("update_fields") is None
+            and not kwargs.get("force_insert")
+        ):
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and not field.generated
+                and field.name not in self.DERIVED_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
     @property
     def average_rating(self):
-        result = self.ratings.aggregate(Avg("score"))
-        return result["score__avg"] or 0
+        if not self.rating_count:
+            return 0
+        return self.rating_sum / self.rating_count
+
+
+class BookCounterMixin:
+    """
+    Примесь для моделей, влияющих на счётчики книги.
+
+    Запоминает вклад записи в счётчики на момент загрузки из БД, чтобы при
+    сохранении применить к книге только разницу, и сохраняет запись вместе
+    с обновлением счётчиков в одной транзакции.
+
+    Вклад задаётся атрибутом ``counters``: имя счётчика книги и значение —
+    число или функция от записи.
+    """
+
+    counter_fields = ("book_id",)
+    counters = {}
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_counter_state()
+        return instance
 
-class BookIssue(models.Model):
+    def save(self, *args, **kwargs):
+        using = kwargs.get("using") or router.db_for_write(
+            type(self), instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            super().save(*args, **kwargs)
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self.remember_counter_state()
+
+    def remember_counter_state(self):
+        deferred = self.get_deferred_fields()
+        if any(name in deferred for name in self.counter_fields):
+            self.__dict__.pop("_counter_state", None)
+        else:
+            self._counter_state = self.counter_contribution()
+
+    def counter_contribution(self):
+        """Вклад записи в счётчики книги: (book_id, {поле: значение})."""
+        return self.book_id, {
+            name: value(self) if callable(value) else value
+            for name, value in self.counters.items()
+        }
+
+
+class BookIssue(BookCounterMixin, models.Model):
     """
     Модель выдачи книги пользователю.
     """
@@ -60,6 +227,30 @@ class BookIssue(models.Model):
     rental_period = models.PositiveIntegerField(default=14)
     due_date = models.DateField()
     return_date = models.DateField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["issue_date", "id"], name="issue_issue_date_id_idx"),
+            models.Index(fields=["due_date", "id"], name="issue_due_date_id_idx"),
+            models.Index(
+                fields=["updated_at", "id"], name="issue_updated_at_id_idx"),
+            # Только невозвращённые книги: поиск просроченных выдач и
+            # напоминаний не читает архив выдач.
+            models.Index(
+                fields=["due_date", "id"],
+                condition=models.Q(return_date__isnull=True),
+                name="issue_active_due_date_idx",
+            ),
+        ]
+
+    counter_fields = ("book_id", "return_date")
+    counters = {
+        "issue_count": 1,
+        "active_issue_count": lambda issue: int(issue.return_date is None),
+    }
+    PROPERTY_FIELDS = {"is_returned": ("return_date",)}
 
     @property
     def is_returned(self):
@@ -69,7 +260,54 @@ class BookIssue(models.Model):
         return f"{self.book.title} issued to {self.user.username}"
 
 
-class Rating(models.Model):
+class BookHold(models.Model):
+    """
+    Место в очереди на книгу, все экземпляры которой выданы.
+
+    Очередь обслуживается по времени постановки: освободившийся экземпляр
+    сразу выдаётся первому ожидающему (см. inventory.py).
+    """
+
+    class Status(models.TextChoices):
+        WAITING = "waiting", "В очереди"
+        FULFILLED = "fulfilled", "Выдана"
+        CANCELLED = "cancelled", "Отменена"
+
+    book = models.ForeignKey(
+        Book, on_delete=models.CASCADE, related_name="holds")
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="book_holds")
+    rental_period = models.PositiveIntegerField(default=14)
+    status = models.CharField(
+        max_length=10, choices=Status.choices, default=Status.WAITING)
+    created_at = models.DateTimeField(auto_now_add=True)
+    fulfilled_at = models.DateTimeField(null=True, blank=True)
+    issue = models.OneToOneField(
+        BookIssue, on_delete=models.SET_NULL, null=True, blank=True,
+        related_name="hold")
+
+    class Meta:
+        constraints = [
+            # Повторный запрос не ставит пользователя в очередь второй раз.
+            models.UniqueConstraint(
+                fields=["book", "user"],
+                condition=models.Q(status="waiting"),
+                name="hold_waiting_book_user_uniq",
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["book", "created_at", "id"],
+                condition=models.Q(status="waiting"),
+                name="hold_waiting_queue_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} waits for {self.book.title}"
+
+
+class Rating(BookCounterMixin, models.Model):
     """
     Модель рейтинга книги.
     """
@@ -81,15 +319,25 @@ class Rating(models.Model):
     score = models.PositiveSmallIntegerField()
     review = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         unique_together = ("book", "user")
+        indexes = [
+            models.Index(
+                fields=["created_at", "id"], name="rating_created_at_id_idx"),
+            models.Index(
+                fields=["updated_at", "id"], name="rating_updated_at_id_idx"),
+        ]
+
+    counter_fields = ("book_id", "score")
+    counters = {"rating_count": 1, "rating_sum": lambda rating: rating.score}
 
     def __str__(self):
         return f"{self.user.username} rated {self.book.title} as {self.score}"
 
 
-class Comment(models.Model):
+class Comment(BookCounterMixin, models.Model):
     """
     Модель комментария к книге.
     """
@@ -100,6 +348,183 @@ class Comment(models.Model):
         User, on_delete=models.CASCADE, related_name="comments")
     text = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["created_at", "id"], name="comment_created_at_id_idx"),
+            models.Index(
+                fields=["updated_at", "id"], name="comment_updated_at_id_idx"),
+            # Комментарии книги, новые сверху, страницами по курсору
+            # (обратный обход индекса).
+            models.Index(
+                fields=["book", "created_at", "id"],
+                name="comment_book_created_id_idx",
+            ),
+        ]
+
+    counters = {"comment_count": 1}
 
     def __str__(self):
         return f"Comment by {self.user.username} on {self.book.title}"
+
+
+class OutboxEmail(models.Model):
+    """
+    Письмо в очереди на отправку.
+
+    Записывается в той же транзакции, что и породившее его действие, и
+    отправляется фоновым обработчиком ``manage.py send_outbox``.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = "pending", "Ожидает отправки"
+        SENT = "sent", "Отправлено"
+        FAILED = "failed", "Не отправлено"
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254, blank=True)
+    recipients = models.JSONField(default=list)
+    status = models.CharField(
+        max_length=10, choices=Status.choices, default=Status.PENDING
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["available_at", "id"],
+                condition=models.Q(status="pending"),
+                name="outbox_pending_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.recipients)}"
+
+
+class ImportCheckpoint(models.Model):
+    """
+    Позиция массового импорта каталога из файла.
+
+    Обновляется в одной транзакции с каждой загруженной пачкой строк, поэтому
+    после сбоя импорт продолжается ровно с первой незагруженной строки.
+    """
+
+    source = models.CharField(max_length=500, unique=True)
+    rows = models.PositiveBigIntegerField(default=0)
+    imported = models.PositiveBigIntegerField(default=0)
+    errors = models.PositiveBigIntegerField(default=0)
+    started_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.source}: {self.rows}"
+
+
+class ImageTask(models.Model):
+    """
+    Задача построения уменьшенных копий обложки книги или фото автора.
+
+    Ставится при сохранении изображения и выполняется фоновым обработчиком
+    ``manage.py process_images``, а не во время запроса.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = "pending", "Ожидает обработки"
+        FAILED = "failed", "Ошибка"
+
+    model = models.CharField(max_length=20)
+    object_id = models.BigIntegerField()
+    status = models.CharField(
+        max_length=10, choices=Status.choices, default=Status.PENDING
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["available_at", "id"],
+                condition=models.Q(status="pending"),
+                name="image_task_pending_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.model} {self.object_id}"
+
+
+class StoredFile(models.Model):
+    """
+    Файл хранилища с адресацией по содержимому (см. storage.py).
+
+    Одинаковые загрузки хранятся одним файлом; ``references`` — число
+    сохранений, которые на него ссылаются. Файл удаляется с диска, когда
+    удалена последняя ссылка.
+    """
+
+    name = models.CharField(max_length=255, primary_key=True)
+    size = models.BigIntegerField()
+    references = models.PositiveIntegerField(default=1)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.references})"
+
+
+class Reminder(models.Model):
+    """
+    Отправленное напоминание о возврате книги.
+
+    Каждой выдаче напоминание каждого вида отправляется один раз:
+    уникальность пары (выдача, вид) делает ``manage.py send_reminders``
+    идемпотентной даже при параллельных запусках.
+    """
+
+    class Kind(models.TextChoices):
+        DUE_SOON = "due_soon", "Скоро срок возврата"
+        OVERDUE = "overdue", "Срок возврата истёк"
+
+    issue = models.ForeignKey(
+        BookIssue, on_delete=models.CASCADE, related_name="reminders")
+    kind = models.CharField(max_length=10, choices=Kind.choices)
+    # Письмо в очереди; пусто, если у пользователя нет адреса.
+    email = models.ForeignKey(
+        OutboxEmail, on_delete=models.SET_NULL, null=True, blank=True,
+        related_name="reminders")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["issue", "kind"], name="reminder_issue_kind_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()}: {self.issue_id}"
+
+
+class RevokedToken(models.Model):
+    """
+    Отозванный JWT (access или refresh) до истечения его срока.
+
+    Таблица — источник истины для отзыва: в отличие от кэша она общая для
+    всех воркеров и переживает перезапуск. Истёкшие записи удаляются при
+    следующем отзыве.
+    """
+
+    jti = models.CharField(max_length=255, primary_key=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return self.jti
@@ -0,0 +1,116 @@
+# library_app/outbox.py
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OutboxEmail
+
+logger = logging.getLogger(__name__)
+
+
+def queue_email(subject, body, recipients, from_email=""):
+    """Ставит письмо в очередь; вызывается внутри транзакции действия."""
+    return OutboxEmail.objects.create(
+        subject=subject,
+        body=body,
+        recipients=list(recipients),
+        from_email=from_email or "",
+    )
+
+
+def retry_delay(attempts):
+    """Экспоненциальная задержка перед повторной попыткой."""
+    delay = settings.OUTBOX_RETRY_BASE_SECONDS * 2 ** max(attempts - 1, 0)
+    return timedelta(seconds=min(delay, settings.OUTBOX_RETRY_MAX_SECONDS))
+
+
+def claim_batch(batch_size):
+    """
+    Забирает пачку готовых к отправке писем.
+
+    Строки блокируются ``SELECT … FOR UPDATE SKIP LOCKED``, поэтому
+    параллельные обработчики получают разные письма. Пока письмо
+    отправляется, его ``available_at`` сдвигается на время аренды: если
+    обработчик упадёт, письмо снова станет доступно после её окончания.
+    """
+    now = timezone.now()
+    lease = timedelta(seconds=settings.OUTBOX_LEASE_SECONDS)
+    with transaction.atomic():
+        batch = list(
+            OutboxEmail.objects.select_for_update(skip_locked=True)
+            .filter(status=OutboxEmail.Status.PENDING, available_at__lte=now)
+            .order_by("available_at", "id")[:batch_size]
+        )
+        if batch:
+            OutboxEmail.objects.filter(pk__in=[email.pk for email in batch]).update(
+                attempts=F("attempts") + 1, available_at=now + lease
+            )
+    for email in batch:
+        email.attempts += 1
+    return batch
+
+
+def deliver_batch(connection, batch_size=100):
+    """
+    Отправляет одну пачку писем через уже открытое соединение.
+
+    Если после ошибки не удаётся переподключиться к серверу, остаток пачки
+    считается неудачной попыткой и откладывается. Отправленные письма
+    отмечаются в любом случае, даже если отправка прервана исключением:
+    иначе они ушли бы повторно после окончания аренды.
+
+    Возвращает пару (отправлено, с ошибкой); ``(0, 0)`` — очередь пуста.
+    """
+    batch = claim_batch(batch_size)
+    sent_ids = []
+    failed = 0
+    try:
+        for index, email in enumerate(batch):
+            message = EmailMessage(
+                email.subject,
+                email.body,
+                email.from_email or None,
+                email.recipients,
+                connection=connection,
+            )
+            try:
+                connection.send_messages([message])
+            except Exception as exc:
+                failed += 1
+                record_failure(email, exc)
+                # Соединение после ошибки может быть испорчено: открываем
+                # заново.
+                try:
+                    connection.close()
+                    connection.open()
+                except Exception as exc:
+                    for rest in batch[index + 1:]:
+                        record_failure(rest, exc)
+                        failed += 1
+                    break
+            else:
+                sent_ids.append(email.pk)
+    finally:
+        if sent_ids:
+            OutboxEmail.objects.filter(pk__in=sent_ids).update(
+                status=OutboxEmail.Status.SENT,
+                sent_at=timezone.now(),
+                last_error="",
+            )
+    return len(sent_ids), failed
+
+
+def record_failure(email, exc):
+    """Планирует повтор с задержкой или помечает письмо неотправленным."""
+    logger.warning("Outbox email %s failed: %s", email.pk, exc)
+    updates = {"last_error": f"{type(exc).__name__}: {exc}"}
+    if email.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+        updates["status"] = OutboxEmail.Status.FAILED
+    else:
+        updates["available_at"] = timezone.now() + retry_delay(email.attempts)
+    OutboxEmail.objects.filter(pk=email.pk).update(**updates)
@@ -0,0 +1,281 @@
+# library_app/pagination.py
+import base64
+import datetime
+import decimal
+import json
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Курсорная (keyset) пагинация по индексированной паре (sort_key, id).
+
+    Курсор хранит значения ключа сортировки и id последней записи страницы,
+    поэтому следующая страница выбирается условием WHERE по индексу,
+    без OFFSET: глубокие страницы стоят столько же, сколько первая.
+
+    Допустимые сортировки задаются во вьюсете атрибутами ``ordering_fields``
+    и ``ordering`` (сортировка по умолчанию), клиент выбирает их параметром
+    ``?ordering=title`` или ``?ordering=-title``. Для результатов поиска
+    дополнительно доступна сортировка по ``search_rank``.
+    """
+
+    page_size = api_settings.PAGE_SIZE or 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    cursor_query_param = "cursor"
+    ordering_query_param = "ordering"
+    default_ordering = "id"
+    # Аннотация релевантности из search.py: результаты поиска по умолчанию
+    # идут по убыванию релевантности.
+    rank_field = "search_rank"
+
+    invalid_cursor_message = "Некорректный курсор."
+    invalid_ordering_message = "Недопустимая сортировка. Допустимые значения: {}."
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.set_page(list(self.page_queryset(queryset, request, view)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """Асинхронный вариант ``paginate_queryset``."""
+        queryset = self.page_queryset(queryset, request, view)
+        return self.set_page([obj async for obj in queryset])
+
+    def page_queryset(self, queryset, request, view):
+        """Queryset страницы и ещё одной записи — признака следующей."""
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.sort_field, self.descending = self.parse_ordering(self.ordering)
+
+        cursor = self.decode_cursor(request)
+        self.cursor = cursor
+        reverse = bool(cursor and cursor["r"])
+
+        queryset = queryset.order_by(*self.get_order_by(reverse))
+        if cursor is not None:
+            try:
+                queryset = queryset.filter(
+                    self.get_position_filter(cursor["p"], reverse))
+            except (DjangoValidationError, TypeError, ValueError):
+                # Значение курсора не приводится к типу поля сортировки.
+                raise NotFound(self.invalid_cursor_message)
+        return queryset[: self.page_size + 1]
+
+    def first_page_queryset(self, queryset, url, view, page_size=None):
+        """
+        Queryset первой страницы вне API (например, для HTML-страницы):
+        ссылка ``get_next_link()`` после ``set_page`` ведёт на продолжение
+        по адресу API ``url`` с сортировкой вьюсета ``view``.
+        """
+        self.base_url = url
+        self.page_size = page_size or self.page_size
+        self.ordering = getattr(view, "ordering", None) or self.default_ordering
+        self.sort_field, self.descending = self.parse_ordering(self.ordering)
+        self.cursor = None
+        queryset = queryset.order_by(*self.get_order_by(False))
+        return queryset[: self.page_size + 1]
+
+    def set_page(self, results):
+        reverse = bool(self.cursor and self.cursor["r"])
+        has_more = len(results) > self.page_size
+        results = results[: self.page_size]
+        if reverse:
+            results.reverse()
+
+        self.page = results
+        if reverse:
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+        return results
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "results": data,
+            }
+        )
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        allowed = ", ".join(self.get_allowed_orderings(view))
+        return [
+            {
+                "name": self.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Курсор страницы из ссылок next/previous.",
+                "schema": {"type": "string"},
+            },
+            {
+                "name": self.page_size_query_param,
+                "required": False,
+                "in": "query",
+                "description": f"Размер страницы (не более {self.max_page_size}).",
+                "schema": {"type": "integer"},
+            },
+            {
+                "name": self.ordering_query_param,
+                "required": False,
+                "in": "query",
+                "description": f"Сортировка: {allowed}.",
+                "schema": {"type": "string"},
+            },
+        ]
+
+    def get_page_size(self, request):
+        value = request.query_params.get(self.page_size_query_param)
+        if value is None:
+            return self.page_size
+        try:
+            size = int(value)
+        except (TypeError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def get_allowed_orderings(self, view, ranked=False):
+        fields = list(getattr(view, "ordering_fields", None) or ("id",))
+        if ranked:
+            fields.append(self.rank_field)
+        allowed = []
+        for field in fields:
+            allowed.extend([field, f"-{field}"])
+        return allowed
+
+    def get_ordering(self, request, queryset, view):
+        ranked = self.rank_field in queryset.query.annotations
+        requested = request.query_params.get(self.ordering_query_param)
+        if not requested:
+            if ranked:
+                return f"-{self.rank_field}"
+            return getattr(view, "ordering", None) or self.default_ordering
+        allowed = self.get_allowed_orderings(view, ranked)
+        if requested not in allowed:
+            raise ValidationError(
+                {
+                    self.ordering_query_param: self.invalid_ordering_message.format(
+                        ", ".join(allowed)
+                    )
+                }
+            )
+        return requested
+
+    @staticmethod
+    def parse_ordering(ordering):
+        descending = ordering.startswith("-")
+        field = ordering.lstrip("-")
+        if field == "pk":
+            field = "id"
+        return field, descending
+
+    def get_order_by(self, reverse):
+        descending = self.descending != reverse
+        prefix = "-" if descending else ""
+        if self.sort_field == "id":
+            return [f"{prefix}id"]
+        return [f"{prefix}{self.sort_field}", f"{prefix}id"]
+
+    def get_position_filter(self, position, reverse):
+        """Условие «строго после позиции» в текущем направлении обхода."""
+        value, pk = position
+        after = "lt" if self.descending != reverse else "gt"
+        if self.sort_field == "id":
+            return Q(**{f"id__{after}": pk})
+        bound = "lte" if after == "lt" else "gte"
+        return Q(**{f"{self.sort_field}__{bound}": value}) & (
+            Q(**{f"{self.sort_field}__{after}": value})
+            | Q(**{self.sort_field: value, f"id__{after}": pk})
+        )
+
+    def get_position(self, obj):
+        value = None
+        if self.sort_field != "id":
+            value = self.serialize_value(getattr(obj, self.sort_field))
+        return [value, obj.pk]
+
+    @staticmethod
+    def serialize_value(value):
+        if isinstance(value, (datetime.date, datetime.time)):
+            return value.isoformat()
+        if isinstance(value, decimal.Decimal):
+            return str(value)
+        return value
+
+    def encode_cursor(self, position, reverse):
+        payload = json.dumps(
+            {"o": self.ordering, "p": position, "r": int(reverse)},
+            separators=(",", ":"),
+        )
+        encoded = base64.urlsafe_b64encode(payload.encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+        except (TypeError, ValueError):
+            cursor = None
+        if not self.is_valid_cursor(cursor):
+            raise NotFound(self.invalid_cursor_message)
+        return cursor
+
+    def is_valid_cursor(self, cursor):
+        """
+        Курсор — объект с ключами ``o`` (текущая сортировка), ``p`` (пара
+        «скалярное значение ключа сортировки, id») и ``r`` (0 или 1).
+        """
+        if not isinstance(cursor, dict) or set(cursor) != {"o", "p", "r"}:
+            return False
+        position = cursor["p"]
+        return (
+            cursor["o"] == self.ordering
+            and cursor["r"] in (0, 1)
+            and not isinstance(cursor["r"], float)
+            and isinstance(position, list)
+            and len(position) == 2
+            and (position[0] is None
+                 or isinstance(position[0], (str, int, float)))
+            and isinstance(position[1], int)
+            and not isinstance(position[1], bool)
+        )
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if not self.page:
+            return None
+        return self.encode_cursor(self.get_position(self.page[-1]), False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.get_position(self.page[0]), True)
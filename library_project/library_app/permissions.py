@@ -1,6 +1,8 @@
 # library_app/permissions.py
 from rest_framework import permissions
 
+from .roles import is_admin
+
 
 class IsAdminOrReadOnly(permissions.BasePermission):
     """
@@ -11,7 +13,7 @@ class IsAdminOrReadOnly(permissions.BasePermission):
     def has_permission(self, request, view):
         if request.method in permissions.SAFE_METHODS:
             return True
-        return request.user and request.user.is_staff
+        return is_admin(request.user)
 
 
 class IsOwnerOrAdmin(permissions.BasePermission):
@@ -20,7 +22,8 @@ class IsOwnerOrAdmin(permissions.BasePermission):
     """
 
     def has_object_permission(self, request, view, obj):
-        return request.user and (obj.user == request.user or request.user.is_staff)
+        # Сравнение по id не загружает владельца каждого объекта.
+        return obj.user_id == request.user.pk or is_admin(request.user)
 
 
 class IsOwnerOrReadOnly(permissions.BasePermission):
@@ -31,4 +34,4 @@ class IsOwnerOrReadOnly(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         if request.method in permissions.SAFE_METHODS:
             return True
-        return obj.user == request.user
+        return obj.user_id == request.user.pk
@@ -0,0 +1,82 @@
+# library_app/ratings.py
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from .caching import invalidate, page_namespaces
+from .links import book_author_ids
+from .models import Rating
+from .stats import apply_book_deltas, counter_deltas
+
+
+# Прежняя оценка блокируется (FOR UPDATE видит последнюю версию строки) и
+# читается до вставки: строка источника INSERT зависит от неё. Если первая
+# оценка появилась параллельно, после чтения, DO UPDATE не срабатывает
+# (прежней оценки нет в снимке) и запрос не возвращает строк.
+UPSERT_SQL = """
+    WITH previous AS (
+        SELECT score FROM {table}
+        WHERE book_id = %(book)s AND user_id = %(user)s
+        FOR UPDATE
+    ), saved AS (
+        INSERT INTO {table} AS rating
+            (book_id, user_id, score, review, created_at, updated_at)
+        SELECT %(book)s, %(user)s, %(score)s, %(review)s, %(now)s, %(now)s
+        FROM (SELECT count(*) FROM previous) AS locked
+        ON CONFLICT (book_id, user_id) DO UPDATE SET
+            score = EXCLUDED.score,
+            review = EXCLUDED.review,
+            updated_at = EXCLUDED.updated_at
+        WHERE EXISTS (SELECT 1 FROM previous)
+        RETURNING rating.id, rating.created_at, rating.xmax = 0 AS created
+    )
+    SELECT id, created_at, created, (SELECT score FROM previous) FROM saved
+"""
+
+# Повтор нужен, только если первую оценку параллельно записал другой
+# запрос; на следующей попытке она уже блокируется как прежняя.
+UPSERT_ATTEMPTS = 3
+
+
+def upsert_rating(user, book, score, review=None):
+    """
+    Создаёт оценку ``book`` пользователем ``user`` или заменяет прежнюю.
+
+    Оценка записывается одним ``INSERT ... ON CONFLICT (book_id, user_id)
+    DO UPDATE ... RETURNING`` вместе с блокировкой и чтением прежней
+    оценки (см. ``UPSERT_SQL``), а к счётчикам книги и авторов в той же
+    транзакции применяется точная разница. Параллельные запросы того же
+    пользователя выполняются по очереди. Возвращает пару (оценка, создана
+    ли).
+    """
+    rating = Rating(book=book, user=user, score=score, review=review)
+    sql = UPSERT_SQL.format(
+        table=connection.ops.quote_name(Rating._meta.db_table))
+    params = {
+        "book": book.pk, "user": user.pk, "score": score, "review": review,
+        "now": timezone.now(),
+    }
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            for _ in range(UPSERT_ATTEMPTS):
+                cursor.execute(sql, params)
+                row = cursor.fetchone()
+                if row is not None:
+                    break
+            else:
+                raise IntegrityError(
+                    "Не удалось записать оценку: её параллельно меняют "
+                    "другие запросы.")
+        rating.pk, rating.created_at, created, previous = row
+        rating.updated_at = params["now"]
+        rating._state.adding = False
+        rating._state.db = connection.alias
+        old = None
+        if not created:
+            old = (book.pk, {"rating_count": 1, "rating_sum": previous})
+        apply_book_deltas(counter_deltas(old, rating.counter_contribution()))
+        rating.remember_counter_state()
+    invalidate(
+        {"ratings", "books", "authors"}
+        | page_namespaces([book.pk], book_author_ids([book.pk]))
+    )
+    return rating, created
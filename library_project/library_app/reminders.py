@@ -0,0 +1,121 @@
+# library_app/reminders.py
+from datetime import timedelta
+from itertools import groupby
+from operator import attrgetter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Exists, OuterRef, Q, Value, When
+
+from .models import BookIssue, Reminder
+from .utils import queue_reminder_email
+
+
+def pending_issues(today, due_soon_days):
+    """
+    Невозвращённые выдачи, по которым нужно напоминание.
+
+    Выдача с истёкшим сроком получает напоминание вида ``overdue``, со
+    сроком в ближайшие ``due_soon_days`` дней — ``due_soon``; уже
+    отправленные напоминания исключаются. Условие ``return_date IS NULL``
+    и сортировка по (due_date, id) совпадают с частичным индексом
+    ``issue_active_due_date_idx``.
+    """
+    return (
+        BookIssue.objects.filter(
+            return_date__isnull=True,
+            due_date__lte=today + timedelta(days=due_soon_days),
+        )
+        .annotate(
+            reminder_kind=Case(
+                When(due_date__lt=today, then=Value(Reminder.Kind.OVERDUE)),
+                default=Value(Reminder.Kind.DUE_SOON),
+            )
+        )
+        .filter(
+            ~Exists(
+                Reminder.objects.filter(
+                    issue=OuterRef("pk"), kind=OuterRef("reminder_kind"))
+            )
+        )
+    )
+
+
+def iter_user_chunks(queryset, chunk_size):
+    """
+    Обходит ``queryset`` пачками по (due_date, id) без OFFSET и выдаёт
+    множества id пользователей каждой пачки.
+    """
+    position = None
+    while True:
+        chunk = queryset.order_by("due_date", "id")
+        if position is not None:
+            due_date, pk = position
+            chunk = chunk.filter(
+                Q(due_date__gt=due_date) | Q(due_date=due_date, id__gt=pk))
+        rows = list(chunk.values_list("due_date", "id", "user_id")[:chunk_size])
+        if not rows:
+            return
+        position = rows[-1][:2]
+        yield {user_id for _, _, user_id in rows}
+
+
+def remind_users(queryset, user_ids):
+    """
+    Ставит по одному письму каждому из пользователей ``user_ids`` со всеми
+    его выдачами из ``queryset`` и записывает напоминания.
+
+    Выдачи блокируются ``SKIP LOCKED``: параллельный запуск пропускает
+    пользователей, которых уже обрабатывает другой. Письмо и записи
+    напоминаний создаются в одной точке сохранения; если напоминание уже
+    записано (нарушение уникальности), письмо не ставится. Возвращает
+    пару (писем, напоминаний).
+    """
+    emails = reminders = 0
+    with transaction.atomic():
+        issues = (
+            queryset.filter(user_id__in=user_ids)
+            .select_related("book", "user")
+            .select_for_update(skip_locked=True, of=("self",))
+            .order_by("user_id", "due_date", "id")
+        )
+        for _, user_issues in groupby(issues, key=attrgetter("user_id")):
+            user_issues = list(user_issues)
+            overdue = [
+                issue for issue in user_issues
+                if issue.reminder_kind == Reminder.Kind.OVERDUE
+            ]
+            due_soon = [
+                issue for issue in user_issues
+                if issue.reminder_kind == Reminder.Kind.DUE_SOON
+            ]
+            try:
+                with transaction.atomic():
+                    email = queue_reminder_email(
+                        user_issues[0].user, overdue, due_soon)
+                    Reminder.objects.bulk_create(
+                        Reminder(issue=issue, kind=issue.reminder_kind,
+                                 email=email)
+                        for issue in user_issues
+                    )
+            except IntegrityError:
+                continue
+            emails += email is not None
+            reminders += len(user_issues)
+    return emails, reminders
+
+
+def send_reminders(today, due_soon_days, chunk_size=1000):
+    """
+    Ставит в очередь напоминания о просроченных и подходящих к сроку
+    выдачах; повторный запуск не дублирует уже отправленные.
+
+    Обработанные пользователи исчезают из выборки, поэтому их выдачи в
+    следующих пачках пропускаются. Возвращает пару (писем, напоминаний).
+    """
+    queryset = pending_issues(today, due_soon_days)
+    emails = reminders = 0
+    for user_ids in iter_user_chunks(queryset, chunk_size):
+        sent, recorded = remind_users(queryset, user_ids)
+        emails += sent
+        reminders += recorded
+    return emails, reminders
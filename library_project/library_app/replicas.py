@@ -0,0 +1,115 @@
+# library_app/replicas.py
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.core.cache import cache
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+# Чтение с реплик разрешает только ReplicaMiddleware для безопасных
+# запросов; команды, фоновые обработчики и тесты читают с основной базы.
+use_primary = ContextVar("use_primary", default=True)
+
+# Приложения, которые всегда читаются с основной базы: сессия, созданная
+# при входе, должна быть видна следующему запросу независимо от отставания.
+PRIMARY_APPS = {"sessions"}
+
+
+class ReplicaRouter:
+    """
+    Чтение — с реплик из ``DB_REPLICAS``, запись — в основную базу.
+
+    Без реплик или при закреплении за основной базой (см.
+    ``ReplicaMiddleware``) всё идёт в ``default``.
+    """
+
+    def db_for_read(self, model, **hints):
+        if (
+            use_primary.get()
+            or not settings.DB_REPLICAS
+            or model._meta.app_label in PRIMARY_APPS
+        ):
+            return "default"
+        return random.choice(settings.DB_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики содержат те же данные, что и основная база.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == "default"
+
+
+def _sticky_key(user_id):
+    return f"replicas:sticky:{user_id}"
+
+
+def request_user_id(request):
+    """
+    Id пользователя из сессии или JWT без запросов к базе.
+
+    Токен только проверяется на подпись и срок: пользователь ещё не
+    аутентифицирован, id нужен лишь для выбора базы.
+    """
+    user_id = request.session.get(SESSION_KEY)
+    if user_id is not None:
+        return str(user_id)
+    authentication = JWTAuthentication()
+    header = authentication.get_header(request)
+    raw_token = header and authentication.get_raw_token(header)
+    if not raw_token:
+        return None
+    try:
+        token = authentication.get_validated_token(raw_token)
+    except (InvalidToken, TokenError):
+        return None
+    user_id = token.get(jwt_settings.USER_ID_CLAIM)
+    return None if user_id is None else str(user_id)
+
+
+def stick_to_primary(user_id):
+    """Закрепляет чтение пользователя за основной базой на время окна."""
+    if user_id is not None and settings.DB_REPLICA_STICKY_SECONDS > 0:
+        cache.set(
+            _sticky_key(user_id), True, settings.DB_REPLICA_STICKY_SECONDS)
+
+
+def is_sticky(user_id):
+    return user_id is not None and bool(cache.get(_sticky_key(user_id)))
+
+
+class ReplicaMiddleware:
+    """
+    Выбирает базу для чтения в запросе.
+
+    Безопасные запросы читают с реплик, изменяющие — с основной базы.
+    После успешного изменения пользователь ``DB_REPLICA_STICKY_SECONDS``
+    секунд читает с основной базы и видит свои записи, даже если реплика
+    отстаёт. Окно хранится в кэше: при нескольких воркерах нужен общий
+    кэш (redis, memcached).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.DB_REPLICAS:
+            return self.get_response(request)
+        safe = request.method in SAFE_METHODS
+        token = use_primary.set(
+            not safe or is_sticky(request_user_id(request)))
+        try:
+            response = self.get_response(request)
+        finally:
+            use_primary.reset(token)
+        if not safe and response.status_code < 400:
+            # Id берётся заново: запрос мог выполнить вход.
+            stick_to_primary(request_user_id(request))
+        return response
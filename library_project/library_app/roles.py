@@ -0,0 +1,113 @@
+# library_app/roles.py
+import time
+
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from .caching import get_versions, invalidate
+
+AUTHORS = "Authors"
+VISITORS = "Visitors"
+
+# Общее пространство имён ролей: сбрасывает роли всех пользователей,
+# например при изменении прав группы.
+ROLES_NAMESPACE = "roles"
+
+NO_ROLES = {"groups": frozenset(), "permissions": frozenset()}
+
+# Id групп по имени на время жизни процесса. Группы ролей создаются один
+# раз и не удаляются; удаление в этом процессе сбрасывает словарь.
+_group_ids = {}
+
+
+def group_id(name):
+    """Id группы ``name``, при первом обращении группа создаётся."""
+    pk = _group_ids.get(name)
+    if pk is None:
+        pk = _group_ids[name] = Group.objects.get_or_create(name=name)[0].pk
+    return pk
+
+
+def forget_group_ids():
+    _group_ids.clear()
+
+
+def _user_namespace(user_id):
+    return f"roles:user:{user_id}"
+
+
+def _changed_key(namespace):
+    return f"{namespace}:changed"
+
+
+def get_roles(user):
+    """
+    Группы и права пользователя: ``{"groups": …, "permissions": …}``.
+
+    Загружаются один раз за запрос (запоминаются на объекте пользователя)
+    и хранятся в кэше под версиями пространств имён пользователя и всех
+    ролей; сигналы сдвигают версии при изменении состава групп и прав.
+    """
+    if not user.is_authenticated:
+        return NO_ROLES
+    roles = getattr(user, "_roles", None)
+    if roles is not None:
+        return roles
+    versions = get_versions([ROLES_NAMESPACE, _user_namespace(user.pk)])
+    key = "roles:{}:{}:{}".format(user.pk, *versions)
+    roles = cache.get(key)
+    if roles is None:
+        roles = {
+            "groups": frozenset(user.groups.values_list("name", flat=True)),
+            "permissions": frozenset(user.get_all_permissions()),
+        }
+        cache.set(key, roles)
+    user._roles = roles
+    return roles
+
+
+def invalidate_roles(user_ids=None):
+    """
+    Сбрасывает роли пользователей ``user_ids`` или, без них, всех.
+
+    Время изменения хранится, пока живут выпущенные до него access-токены:
+    роли в них устарели (см. authentication.py).
+    """
+    if user_ids is None:
+        namespaces = [ROLES_NAMESPACE]
+    else:
+        namespaces = [_user_namespace(pk) for pk in user_ids]
+    invalidate(namespaces)
+    cache.set_many(
+        {_changed_key(namespace): time.time() for namespace in namespaces},
+        int(jwt_settings.ACCESS_TOKEN_LIFETIME.total_seconds()),
+    )
+
+
+def roles_changed_at(user_id):
+    """Время последнего изменения ролей пользователя (0 — не менялись)."""
+    changed = cache.get_many([
+        _changed_key(ROLES_NAMESPACE),
+        _changed_key(_user_namespace(user_id)),
+    ])
+    return max(changed.values(), default=0)
+
+
+def has_group(user, name):
+    return name in get_roles(user)["groups"]
+
+
+def has_permission(user, perm):
+    """Право вида ``"library_app.add_book"`` с учётом групп."""
+    return perm in get_roles(user)["permissions"]
+
+
+def is_author(user):
+    """Проверяет, принадлежит ли пользователь группе 'Authors'."""
+    return has_group(user, AUTHORS)
+
+
+def is_admin(user):
+    """Проверяет, является ли пользователь администратором."""
+    return bool(user and user.is_staff)
@@ -0,0 +1,133 @@
+# library_app/search.py
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                           SearchVector, TrigramWordSimilarity)
+from django.db.models import F, FloatField, OuterRef, Q, Subquery, TextField
+from django.db.models import Value as V
+from django.db.models.functions import Cast, Concat, Now
+
+from .models import Book
+
+SEARCH_CONFIG = settings.SEARCH_CONFIG
+
+
+def book_search_vector():
+    """
+    Выражение поискового вектора книги.
+
+    Название и имена авторов получают вес A, жанр — B, описание — C.
+    Имена авторов собираются коррелированным подзапросом, поэтому вектор
+    можно обновить одним UPDATE для любого набора книг.
+    """
+    author_names = Subquery(
+        Book.authors.through.objects.filter(book=OuterRef("pk"))
+        .order_by()
+        .values("book")
+        .annotate(
+            names=StringAgg(
+                Concat(
+                    "author__first_name",
+                    V(" "),
+                    "author__last_name",
+                    output_field=TextField(),
+                ),
+                delimiter=" ",
+            )
+        )
+        .values("names"),
+        output_field=TextField(),
+    )
+    return (
+        SearchVector("title", weight="A", config=SEARCH_CONFIG)
+        + SearchVector(author_names, weight="A", config=SEARCH_CONFIG)
+        + SearchVector("genre", weight="B", config=SEARCH_CONFIG)
+        + SearchVector("description", weight="C", config=SEARCH_CONFIG)
+    )
+
+
+def refresh_book_search_vectors(queryset=None, touch=False):
+    """
+    Пересчитывает поисковый вектор для книг из ``queryset``.
+
+    ``touch=True`` также обновляет ``updated_at``: нужно, когда у книг
+    изменились авторы, которые входят в выгрузку каталога.
+    """
+    if queryset is None:
+        queryset = Book.objects.all()
+    updates = {"search_vector": book_search_vector()}
+    if touch:
+        updates["updated_at"] = Now()
+    return queryset.update(**updates)
+
+
+def rebuild_book_search_vectors(queryset=None, batch_size=1000):
+    """
+    Пересчитывает поисковые векторы диапазонами первичного ключа.
+
+    Каждый диапазон обновляется отдельным запросом, чтобы не держать
+    блокировки всей таблицы. Возвращает число книг.
+    """
+    if queryset is None:
+        queryset = Book.objects.all()
+    updated = 0
+    last_pk = 0
+    while True:
+        pks = list(
+            queryset.filter(pk__gt=last_pk)
+            .order_by("pk")
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        if not pks:
+            return updated
+        updated += refresh_book_search_vectors(Book.objects.filter(pk__in=pks))
+        last_pk = pks[-1]
+
+
+def search_books(queryset, query):
+    """
+    Полнотекстовый поиск книг с нечётким совпадением по названию.
+
+    Книга находится, если запрос совпал с поисковым вектором (GIN-индекс)
+    или похож на слово из названия (триграммный GIN-индекс). Результат
+    аннотирован ``search_rank`` и отсортирован по убыванию релевантности.
+    """
+    search_query = SearchQuery(
+        query, search_type="websearch", config=SEARCH_CONFIG)
+    return (
+        queryset.filter(
+            Q(search_vector=search_query) | Q(title__trigram_word_similar=query)
+        )
+        .annotate(
+            search_rank=Cast(
+                SearchRank(F("search_vector"), search_query)
+                + TrigramWordSimilarity(query, "title"),
+                FloatField(),
+            )
+        )
+        .order_by("-search_rank", "-id")
+    )
+
+
+def search_authors(queryset, query):
+    """
+    Нечёткий поиск авторов по имени и фамилии через триграммные индексы.
+
+    Каждое слово запроса сравнивается с именем и фамилией, релевантность —
+    сходство всего запроса с полным именем автора.
+    """
+    condition = Q()
+    for word in query.split():
+        condition |= Q(first_name__trigram_word_similar=word) | Q(
+            last_name__trigram_word_similar=word
+        )
+    full_name = Concat(
+        "first_name", V(" "), "last_name", output_field=TextField())
+    return (
+        queryset.filter(condition)
+        .annotate(
+            search_rank=Cast(TrigramWordSimilarity(
+                query, full_name), FloatField())
+        )
+        .order_by("-search_rank", "-id")
+    )
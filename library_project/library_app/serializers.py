@@ -1,15 +1,94 @@
 # library_app/serializers.py
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError as DjangoValidationError
 from rest_framework import serializers
 
+from .images import srcset
 from .models import Author, Book, BookIssue, Comment, Rating
 
 
+class PreloadedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    PrimaryKeyRelatedField, который при пакетной записи берёт объекты из
+    ``context["preloaded"]`` вместо отдельного запроса на каждое значение.
+
+    Без предзагрузки ведёт себя как обычное поле.
+    """
+
+    @property
+    def preload_key(self):
+        # Дочернее поле ManyRelatedField привязано с пустым именем.
+        return self.field_name or self.parent.field_name
+
+    def to_internal_value(self, data):
+        preloaded = self.context.get("preloaded", {}).get(self.preload_key)
+        if preloaded is None:
+            return super().to_internal_value(data)
+        try:
+            if isinstance(data, bool):
+                raise TypeError
+            pk = self.get_queryset().model._meta.pk.to_python(data)
+        except (TypeError, ValueError, DjangoValidationError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        if pk not in preloaded:
+            self.fail("does_not_exist", pk_value=data)
+        return preloaded[pk]
+
+
+class ImageVariantsField(serializers.ReadOnlyField):
+    """
+    Уменьшенные копии изображения с абсолютными URL и ``srcset``.
+
+    Пока копии не построены, возвращает ``None``.
+    """
+
+    def __init__(self, image_field, **kwargs):
+        self.image_field = image_field
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        if not value or not value.get("images"):
+            return None
+        model = self.parent.Meta.model
+        storage = model._meta.get_field(self.image_field).storage
+        request = self.context.get("request")
+
+        def url(name):
+            url = storage.url(name)
+            return request.build_absolute_uri(url) if request else url
+
+        return {
+            "width": value["width"],
+            "height": value["height"],
+            "images": [
+                {
+                    "width": entry["width"],
+                    "height": entry["height"],
+                    "jpeg": url(entry["jpeg"]),
+                    "webp": url(entry["webp"]),
+                }
+                for entry in value["images"]
+            ],
+            "srcset": srcset(value, "jpeg", url),
+            "webp_srcset": srcset(value, "webp", url),
+        }
+
+
 class AuthorSerializer(serializers.ModelSerializer):
     """
     Сериализатор для модели Author.
     """
 
+    book_count = serializers.IntegerField(
+        source="stats.book_count", read_only=True)
+    average_rating = serializers.FloatField(
+        source="stats.average_rating", read_only=True)
+    rating_count = serializers.IntegerField(
+        source="stats.rating_count", read_only=True)
+    issue_count = serializers.IntegerField(
+        source="stats.issue_count", read_only=True)
+    photo_variants = ImageVariantsField("photo")
+
     class Meta:
         model = Author
         fields = "__all__"
@@ -20,10 +99,12 @@ class BookSerializer(serializers.ModelSerializer):
     Сериализатор для модели Book.
     """
 
-    author_ids = serializers.PrimaryKeyRelatedField(
+    author_ids = PreloadedPrimaryKeyRelatedField(
         many=True, queryset=Author.objects.all(), write_only=True, source="authors"
     )
     authors = AuthorSerializer(many=True, read_only=True)
+    average_rating = serializers.FloatField(read_only=True)
+    cover_variants = ImageVariantsField("cover")
 
     class Meta:
         model = Book
@@ -36,6 +117,14 @@ class BookSerializer(serializers.ModelSerializer):
             "published_date",
             "description",
             "cover",
+            "cover_variants",
+            "average_rating",
+            "rating_count",
+            "comment_count",
+            "issue_count",
+            "active_issue_count",
+            "copies",
+            "available_copies",
         ]
 
 
@@ -86,13 +175,13 @@ class BookIssueSerializer(serializers.ModelSerializer):
     """
 
     book = BookSerializer(read_only=True)
-    book_id = serializers.PrimaryKeyRelatedField(
+    book_id = PreloadedPrimaryKeyRelatedField(
         queryset=Book.objects.all(),
         source="book",
         write_only=True,
     )
     user = UserSerializer(read_only=True)
-    user_id = serializers.PrimaryKeyRelatedField(
+    user_id = PreloadedPrimaryKeyRelatedField(
         queryset=User.objects.all(),
         source="user",
         write_only=True,
@@ -121,7 +210,7 @@ class CommentSerializer(serializers.ModelSerializer):
     """
 
     user = serializers.ReadOnlyField(source="user.username")
-    book = serializers.PrimaryKeyRelatedField(queryset=Book.objects.all())
+    book = PreloadedPrimaryKeyRelatedField(queryset=Book.objects.all())
 
     class Meta:
         model = Comment
@@ -134,7 +223,7 @@ class RatingSerializer(serializers.ModelSerializer):
     """
 
     user = serializers.ReadOnlyField(source="user.username")
-    book = serializers.PrimaryKeyRelatedField(queryset=Book.objects.all())
+    book = PreloadedPrimaryKeyRelatedField(queryset=Book.objects.all())
 
     class Meta:
         model = Rating
@@ -146,8 +235,19 @@ class RatingSerializer(serializers.ModelSerializer):
         return value
 
     def validate(self, data):
+        if self.context.get("upsert"):
+            # Повторная оценка заменяет прежнюю (см. ratings.upsert_rating).
+            return data
         user = self.context["request"].user
         book = data.get("book")
-        if Rating.objects.filter(user=user, book=book).exists():
+        # При пакетной записи оценённые книги загружены заранее одним
+        # запросом; книга из пакета отмечается, чтобы не оценить её дважды.
+        rated = self.context.get("rated_book_ids")
+        if rated is None:
+            exists = Rating.objects.filter(user=user, book=book).exists()
+        else:
+            exists = book.pk in rated
+            rated.add(book.pk)
+        if exists:
             raise serializers.ValidationError("Вы уже оценили эту книгу.")
         return data
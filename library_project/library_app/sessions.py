@@ -0,0 +1,102 @@
+# library_app/sessions.py
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import BookHold, BookIssue, Comment, Rating
+from .roles import VISITORS
+
+
+class SessionCache(LocMemCache):
+    """
+    Кэш сессий в памяти процесса, общий для его потоков.
+
+    ``cached_db`` хранит сессию в кэше до истечения её срока; здесь срок
+    записи ограничен ``TIMEOUT``: выход или смена ключа сессии в другом
+    воркере видны этому не позже чем через ``TIMEOUT`` секунд, после
+    чего сессия снова читается из базы.
+    """
+
+    def get_backend_timeout(self, timeout=DEFAULT_TIMEOUT):
+        if self.default_timeout is not None and (
+            timeout is None or timeout is DEFAULT_TIMEOUT
+            or timeout > self.default_timeout
+        ):
+            timeout = self.default_timeout
+        return super().get_backend_timeout(timeout)
+
+
+def delete_in_chunks(queryset, chunk_size):
+    """
+    Удаляет строки ``queryset`` пачками по ``chunk_size`` первичных
+    ключей. Каждая пачка — отдельная короткая транзакция: строки не
+    блокируются надолго, а прерванная очистка продолжается с того же
+    места. Строки, заблокированные другими транзакциями, пропускаются
+    (``SKIP LOCKED``). Возвращает число удалённых строк ``queryset``.
+    """
+    deleted = 0
+    model = queryset.model
+    while True:
+        with transaction.atomic():
+            pks = list(
+                queryset.order_by("pk")
+                .select_for_update(skip_locked=True, of=("self",))
+                .values_list("pk", flat=True)[:chunk_size]
+            )
+            if not pks:
+                return deleted
+            deleted += model.objects.filter(pk__in=pks).delete()[1].get(
+                model._meta.label, 0)
+
+
+def purge_expired_sessions(chunk_size=1000, now=None):
+    """Удаляет истёкшие сессии (индекс по ``expire_date``)."""
+    expired = Session.objects.filter(expire_date__lt=now or timezone.now())
+    return delete_in_chunks(expired, chunk_size)
+
+
+def abandoned_visitors(idle_days, now=None):
+    """
+    Посетители, вошедшие по имени (группа «Visitors», без пароля и без
+    прав персонала), которые не входили ``idle_days`` дней и не оставили
+    выдач, броней, оценок и комментариев.
+
+    Срок не короче жизни сессии: у таких посетителей не осталось
+    действующих сессий.
+    """
+    idle = max(
+        timedelta(days=idle_days),
+        timedelta(seconds=settings.SESSION_COOKIE_AGE),
+    )
+    related = (BookIssue, BookHold, Rating, Comment)
+    return (
+        User.objects.filter(
+            groups__name=VISITORS,
+            is_staff=False,
+            is_superuser=False,
+            password__startswith=UNUSABLE_PASSWORD_PREFIX,
+        )
+        .alias(last_seen=Coalesce("last_login", "date_joined"))
+        .filter(last_seen__lt=(now or timezone.now()) - idle)
+        .filter(*[
+            ~Exists(model.objects.filter(user=OuterRef("pk")))
+            for model in related
+        ])
+    )
+
+
+def purge_abandoned_visitors(idle_days, chunk_size=1000, now=None):
+    """
+    Удаляет заброшенных посетителей (см. ``abandoned_visitors``) вместе
+    с их членством в группах.
+    """
+    return delete_in_chunks(abandoned_visitors(idle_days, now), chunk_size)
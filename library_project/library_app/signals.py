@@ -0,0 +1,308 @@
+# library_app/signals.py
+from django.contrib.auth.models import Group, User
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import receiver
+
+from .caching import invalidate, page_namespaces
+from .inventory import fulfil_holds
+from .links import author_book_ids, book_author_ids
+from .models import Author, AuthorStats, Book, BookIssue, Comment, Rating
+from .roles import forget_group_ids, invalidate_roles
+from .search import refresh_book_search_vectors
+from .stats import (adjust_author_links, apply_book_deltas, counter_deltas,
+                    rebuild_book_counters)
+
+
+@receiver(post_save, sender=Rating)
+@receiver(post_save, sender=Comment)
+@receiver(post_save, sender=BookIssue)
+def update_book_counters_on_save(sender, instance, created, raw=False, **kwargs):
+    """Применяет к счётчикам книги разницу между старым и новым состоянием."""
+    if raw:
+        return
+    if created and instance.__dict__.pop("_counters_applied", False):
+        # Выдача уже учтена условным UPDATE (см. inventory.reserve_copy).
+        instance.remember_counter_state()
+        return
+    if created:
+        old = None
+    elif hasattr(instance, "_counter_state"):
+        old = instance._counter_state
+    else:
+        # Прежнее состояние неизвестно (запись загружена без нужных полей):
+        # пересчитываем книгу целиком.
+        rebuild_book_counters(Book.objects.filter(pk=instance.book_id))
+        instance.remember_counter_state()
+        return
+    apply_book_deltas(counter_deltas(old, instance.counter_contribution()))
+    instance.remember_counter_state()
+
+
+@receiver(post_delete, sender=Rating)
+@receiver(post_delete, sender=Comment)
+@receiver(post_delete, sender=BookIssue)
+def update_book_counters_on_delete(sender, instance, **kwargs):
+    """Вычитает вклад удалённой записи из счётчиков книги."""
+    old = getattr(instance, "_counter_state", None)
+    if old is None:
+        old = instance.counter_contribution()
+    apply_book_deltas(counter_deltas(old=old))
+
+
+@receiver(post_save, sender=BookIssue)
+def fulfil_holds_on_return(sender, instance, raw=False, **kwargs):
+    """Возвращённый экземпляр сразу достаётся очереди."""
+    if not raw and instance.return_date is not None:
+        fulfil_holds(instance.book_id)
+
+
+@receiver(post_delete, sender=BookIssue)
+def fulfil_holds_on_issue_delete(sender, instance, **kwargs):
+    fulfil_holds(instance.book_id)
+
+
+@receiver(post_save, sender=Book)
+def fulfil_holds_on_copies(sender, instance, created, raw=False,
+                           update_fields=None, **kwargs):
+    """Новые экземпляры в фонде тоже достаются очереди."""
+    if raw or created:
+        return
+    if update_fields is None or "copies" in update_fields:
+        fulfil_holds(instance.pk)
+
+
+@receiver(post_save, sender=Author)
+def create_author_stats(sender, instance, created, raw=False, **kwargs):
+    """Создаёт пустую статистику для нового автора."""
+    if created and not raw:
+        AuthorStats.objects.get_or_create(author=instance)
+
+
+def changed_link_pks(instance, action, pk_set):
+    """Первичные ключи связей, затронутых m2m-операцией."""
+    if action == "post_clear":
+        return getattr(instance, "_cleared_pks", None)
+    return pk_set
+
+
+@receiver(m2m_changed, sender=Book.authors.through)
+def remember_cleared_links(sender, instance, action, reverse, **kwargs):
+    """Запоминает связи перед clear(): после него их уже не получить."""
+    if action == "pre_clear":
+        related = instance.books if reverse else instance.authors
+        instance._cleared_pks = set(related.values_list("pk", flat=True))
+
+
+@receiver(m2m_changed, sender=Book.authors.through)
+def update_author_stats_on_links(sender, instance, action, reverse, pk_set,
+                                 **kwargs):
+    """Переносит счётчики книги на авторов при изменении связей."""
+    pk_set = changed_link_pks(instance, action, pk_set)
+    if action == "post_clear":
+        sign = -1
+    elif action == "post_add":
+        sign = 1
+    elif action == "post_remove":
+        sign = -1
+    else:
+        return
+    if not pk_set:
+        return
+    if reverse:
+        adjust_author_links([instance.pk], pk_set, sign)
+    else:
+        adjust_author_links(pk_set, [instance.pk], sign)
+
+
+@receiver(pre_delete, sender=Book)
+def remove_book_from_author_stats(sender, instance, **kwargs):
+    """Вычитает удаляемую книгу из статистики её авторов."""
+    author_ids = list(instance.authors.values_list("pk", flat=True))
+    if author_ids:
+        adjust_author_links(author_ids, [instance.pk], -1)
+
+
+@receiver(post_save, sender=Book)
+def refresh_search_vector_on_book_save(sender, instance, raw=False, **kwargs):
+    """Обновляет поисковый вектор сохранённой книги."""
+    if not raw:
+        refresh_book_search_vectors(Book.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=Author)
+def refresh_search_vectors_on_author_save(sender, instance, created, raw=False,
+                                          **kwargs):
+    """Обновляет поисковые векторы книг переименованного автора."""
+    if not created and not raw:
+        refresh_book_search_vectors(
+            Book.objects.filter(authors=instance), touch=True)
+
+
+@receiver(pre_delete, sender=Author)
+def remember_deleted_author_books(sender, instance, **kwargs):
+    """
+    Запоминает книги удаляемого автора: связи удаляются каскадом без
+    ``m2m_changed``, а после удаления их уже не получить.
+    """
+    instance._deleted_book_ids = author_book_ids([instance.pk])
+
+
+@receiver(post_delete, sender=Author)
+def refresh_search_vectors_on_author_delete(sender, instance, **kwargs):
+    """
+    Обновляет поисковые векторы и ``updated_at`` книг удалённого автора,
+    чтобы сменились их ETag.
+    """
+    book_ids = getattr(instance, "_deleted_book_ids", None)
+    if book_ids:
+        refresh_book_search_vectors(
+            Book.objects.filter(pk__in=book_ids), touch=True)
+
+
+@receiver(m2m_changed, sender=Book.authors.through)
+def refresh_search_vectors_on_links(sender, instance, action, reverse, pk_set,
+                                    **kwargs):
+    """Обновляет поисковые векторы книг при изменении их авторов."""
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if reverse:
+        book_ids = changed_link_pks(instance, action, pk_set)
+        if book_ids:
+            refresh_book_search_vectors(
+                Book.objects.filter(pk__in=book_ids), touch=True)
+    else:
+        refresh_book_search_vectors(
+            Book.objects.filter(pk=instance.pk), touch=True)
+
+
+@receiver(post_save, sender=Book)
+def invalidate_cache_on_book_save(sender, instance, **kwargs):
+    """Книга видна в списке книг, на своей странице и у авторов."""
+    invalidate(
+        {"books"}
+        | page_namespaces([instance.pk], book_author_ids([instance.pk]))
+    )
+
+
+@receiver(pre_delete, sender=Book)
+def invalidate_cache_on_book_delete(sender, instance, **kwargs):
+    """Удаление книги также меняет статистику её авторов."""
+    invalidate(
+        {"books", "authors"}
+        | page_namespaces([instance.pk], book_author_ids([instance.pk]))
+    )
+
+
+@receiver(post_save, sender=Author)
+@receiver(pre_delete, sender=Author)
+def invalidate_cache_on_author_change(sender, instance, **kwargs):
+    """Имя автора выводится в списках и на страницах его книг."""
+    invalidate(
+        {"authors", "books"}
+        | page_namespaces(author_book_ids([instance.pk]), [instance.pk])
+    )
+
+
+@receiver(m2m_changed, sender=Book.authors.through)
+def invalidate_cache_on_links(sender, instance, action, reverse, pk_set,
+                              **kwargs):
+    """Связи книг и авторов видны в обоих каталогах."""
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    related = changed_link_pks(instance, action, pk_set) or set()
+    if reverse:
+        namespaces = page_namespaces(related, [instance.pk])
+    else:
+        namespaces = page_namespaces([instance.pk], related)
+    invalidate({"books", "authors"} | namespaces)
+
+
+@receiver(pre_save, sender=Rating)
+@receiver(pre_save, sender=Comment)
+@receiver(pre_save, sender=BookIssue)
+def invalidate_cache_on_book_move(sender, instance, raw=False, **kwargs):
+    """Запись перенесена к другой книге: прежняя книга тоже меняется."""
+    old = getattr(instance, "_counter_state", None)
+    if raw or old is None or old[0] == instance.book_id:
+        return
+    invalidate(
+        {"books", "authors"}
+        | page_namespaces([old[0]], book_author_ids([old[0]]))
+    )
+
+
+@receiver(post_save, sender=Rating)
+@receiver(post_delete, sender=Rating)
+def invalidate_cache_on_rating_change(sender, instance, **kwargs):
+    """Рейтинг меняет средние оценки книги и её авторов."""
+    invalidate(
+        {"ratings", "books", "authors"}
+        | page_namespaces([instance.book_id], book_author_ids([instance.book_id]))
+    )
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_cache_on_comment_change(sender, instance, **kwargs):
+    """Комментарии выводятся на странице книги, их число — в списке."""
+    invalidate({"comments", "books"} | page_namespaces([instance.book_id]))
+
+
+@receiver(post_save, sender=BookIssue)
+@receiver(post_delete, sender=BookIssue)
+def invalidate_cache_on_issue_change(sender, instance, **kwargs):
+    """
+    Число выдач и свободных экземпляров выводится в API каталога, на
+    странице книги и на страницах авторов.
+    """
+    invalidate(
+        {"books", "authors"}
+        | page_namespaces(
+            [instance.book_id], book_author_ids([instance.book_id]))
+    )
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def invalidate_roles_on_membership(sender, instance, action, reverse, pk_set,
+                                   **kwargs):
+    """Изменился состав групп или личные права пользователей."""
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        instance.__dict__.pop("_roles", None)
+        invalidate_roles([instance.pk])
+    elif pk_set is None:
+        # Очистка со стороны группы или права: затронуты все её участники.
+        invalidate_roles()
+    else:
+        invalidate_roles(pk_set)
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def invalidate_roles_on_group_permissions(sender, action, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        invalidate_roles()
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_roles_on_group_change(sender, **kwargs):
+    forget_group_ids()
+    invalidate_roles()
+
+
+@receiver(post_save, sender=User)
+def invalidate_roles_on_user_save(sender, instance, created=False,
+                                  update_fields=None, **kwargs):
+    """
+    Права зависят от is_active и is_superuser пользователя. У нового
+    пользователя ещё нет ни ролей в кэше, ни выпущенных токенов.
+    """
+    if created:
+        return
+    if update_fields is not None and set(update_fields) == {"last_login"}:
+        return
+    instance.__dict__.pop("_roles", None)
+    invalidate_roles([instance.pk])
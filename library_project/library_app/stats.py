@@ -0,0 +1,241 @@
+# library_app/stats.py
+from collections import Counter, defaultdict
+from functools import partial
+
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, Now
+
+from .models import Author, AuthorStats, Book, BookIssue, Comment, Rating
+
+
+def counter_deltas(old=None, new=None):
+    """
+    Разница вкладов записи в счётчики книг.
+
+    ``old`` и ``new`` — вклады вида ``(book_id, {поле: значение})`` до и после
+    изменения (``None``, если записи не было). Возвращает
+    ``{book_id: Counter(поле=приращение)}``.
+    """
+    deltas = defaultdict(Counter)
+    if old is not None:
+        book_id, values = old
+        for field, value in values.items():
+            deltas[book_id][field] -= value
+    if new is not None:
+        book_id, values = new
+        for field, value in values.items():
+            deltas[book_id][field] += value
+    return deltas
+
+
+def update_author_stats(book_id, updates):
+    """
+    Применяет ``updates`` к статистике авторов книги. Строки блокируются
+    по возрастанию id: одновременные обновления книг с общими авторами
+    не взаимоблокируются.
+    """
+    with transaction.atomic():
+        pks = list(
+            AuthorStats.objects.filter(author__books=book_id)
+            .order_by("pk")
+            .select_for_update(of=("self",))
+            .values_list("pk", flat=True)
+        )
+        if pks:
+            AuthorStats.objects.filter(pk__in=pks).update(
+                updated_at=Now(), **updates)
+
+
+def apply_book_deltas(deltas, require_available=False,
+                      defer_author_stats=False):
+    """
+    Атомарно применяет приращения счётчиков через F-выражения.
+
+    Счётчики входят в выгрузку книг, поэтому книга помечается изменённой.
+    С ``require_available`` книга без свободных экземпляров не меняется:
+    условие проверяется тем же UPDATE. С ``defer_author_stats``
+    статистика авторов обновляется после коммита: транзакция не держит
+    строки авторов, общие для разных книг. Возвращает число изменённых
+    книг.
+    """
+    updated = 0
+    for book_id, values in deltas.items():
+        updates = {
+            field: F(field) + delta for field, delta in values.items() if delta
+        }
+        if book_id is None or not updates:
+            continue
+        books = Book.objects.filter(pk=book_id)
+        if require_available:
+            books = books.filter(available_copies__gt=0)
+        if not books.update(updated_at=Now(), **updates):
+            continue
+        updated += 1
+        author_updates = {
+            field: updates[field]
+            for field in AuthorStats.BOOK_COUNTER_FIELDS
+            if field in updates
+        }
+        if not author_updates:
+            continue
+        if defer_author_stats:
+            transaction.on_commit(
+                partial(update_author_stats, book_id, author_updates))
+        else:
+            update_author_stats(book_id, author_updates)
+    return updated
+
+
+def adjust_author_links(author_ids, book_ids, sign):
+    """
+    Учитывает в статистике авторов появление (``sign=1``) или удаление
+    (``sign=-1``) связи каждого из ``author_ids`` с каждой из ``book_ids``.
+    """
+    book_ids = list(book_ids)
+    totals = Book.objects.filter(pk__in=book_ids).aggregate(
+        **{
+            field: Coalesce(Sum(field), 0)
+            for field in AuthorStats.BOOK_COUNTER_FIELDS
+        }
+    )
+    updates = {
+        "book_count": F("book_count") + sign * len(book_ids),
+        "updated_at": Now(),
+    }
+    for field, total in totals.items():
+        if total:
+            updates[field] = F(field) + sign * total
+    AuthorStats.objects.filter(author_id__in=author_ids).update(**updates)
+
+
+def add_author_book_counts(book_counts):
+    """
+    Увеличивает ``book_count`` авторов на число новых книг без рейтингов
+    и выдач: ``{author_id: число книг}``. Авторы с одинаковым приращением
+    обновляются одним запросом.
+    """
+    by_increment = defaultdict(list)
+    for author_id, count in book_counts.items():
+        by_increment[count].append(author_id)
+    for count, author_ids in by_increment.items():
+        AuthorStats.objects.filter(author_id__in=author_ids).update(
+            book_count=F("book_count") + count, updated_at=Now())
+
+
+def _count_subquery(model, **filters):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(book=OuterRef("pk"), **filters)
+            .order_by()
+            .values("book")
+            .annotate(total=Count("pk"))
+            .values("total"),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def rebuild_book_counters(queryset=None, batch_size=1000):
+    """
+    Пересчитывает счётчики книг с нуля.
+
+    Книги обрабатываются диапазонами первичного ключа, каждый диапазон —
+    одним UPDATE с коррелированными подзапросами. Возвращает число книг.
+    """
+    if queryset is None:
+        queryset = Book.objects.all()
+    rating_sum = Coalesce(
+        Subquery(
+            Rating.objects.filter(book=OuterRef("pk"))
+            .order_by()
+            .values("book")
+            .annotate(total=Sum("score"))
+            .values("total"),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+    updated = 0
+    last_pk = 0
+    while True:
+        pks = list(
+            queryset.filter(pk__gt=last_pk)
+            .order_by("pk")
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        if not pks:
+            return updated
+        updated += Book.objects.filter(pk__in=pks).update(
+            updated_at=Now(),
+            rating_count=_count_subquery(Rating),
+            rating_sum=rating_sum,
+            comment_count=_count_subquery(Comment),
+            issue_count=_count_subquery(BookIssue),
+            active_issue_count=_count_subquery(
+                BookIssue, return_date__isnull=True),
+        )
+        last_pk = pks[-1]
+
+
+def rebuild_author_stats(batch_size=1000):
+    """
+    Пересчитывает статистику авторов с нуля по счётчикам их книг.
+
+    Недостающие записи статистики создаются. Возвращает число авторов.
+    """
+    missing = Author.objects.filter(stats__isnull=True).values_list(
+        "pk", flat=True)
+    while True:
+        pks = list(missing[:batch_size])
+        if not pks:
+            break
+        AuthorStats.objects.bulk_create(
+            [AuthorStats(author_id=pk) for pk in pks], ignore_conflicts=True
+        )
+
+    links = Book.authors.through.objects.filter(author=OuterRef("pk"))
+    book_count = Coalesce(
+        Subquery(
+            links.order_by()
+            .values("author")
+            .annotate(total=Count("pk"))
+            .values("total"),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+    def book_total(field):
+        return Coalesce(
+            Subquery(
+                Book.objects.filter(authors=OuterRef("pk"))
+                .order_by()
+                .values("authors")
+                .annotate(total=Sum(field))
+                .values("total"),
+                output_field=IntegerField(),
+            ),
+            0,
+        )
+
+    updated = 0
+    last_pk = 0
+    while True:
+        pks = list(
+            AuthorStats.objects.filter(pk__gt=last_pk)
+            .order_by("pk")
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        if not pks:
+            return updated
+        updated += AuthorStats.objects.filter(pk__in=pks).update(
+            book_count=book_count,
+            updated_at=Now(),
+            **{
+                field: book_total(field)
+                for field in AuthorStats.BOOK_COUNTER_FIELDS
+            },
+        )
+        last_pk = pks[-1]
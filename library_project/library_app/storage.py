@@ -0,0 +1,86 @@
+# library_app/storage.py
+import hashlib
+import os
+import posixpath
+import re
+import uuid
+
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import StoredFile
+
+# <каталог>/<первые два символа хэша>/<SHA-256 содержимого><расширение>
+HASHED_NAME = re.compile(r"(?:^|/)([0-9a-f]{2})/\1[0-9a-f]{62}(?:\.\w+)?$")
+
+
+def is_hashed(name):
+    """Имя файла получено из хэша содержимого и никогда не меняет смысл."""
+    return bool(name and HASHED_NAME.search(name))
+
+
+def content_hash(content):
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Файловое хранилище, в котором файл называется SHA-256 своего содержимого.
+
+    Каталог из ``upload_to`` и расширение сохраняются, исходное имя — нет:
+    одинаковые загрузки получают одно имя и хранятся одним файлом. Ссылки
+    на файл считаются в ``StoredFile``; ``delete()`` удаляет файл с диска
+    только вместе с последней ссылкой. Файлы, сохранённые до перехода на
+    это хранилище, удаляются как обычно (см. ``manage.py dedupe_media``).
+    """
+
+    def hashed_name(self, name, content):
+        digest = content_hash(content)
+        directory = posixpath.dirname(name)
+        extension = posixpath.splitext(name)[1].lower()
+        return posixpath.join(directory, digest[:2], digest + extension)
+
+    def _save(self, name, content):
+        name = self.hashed_name(name, content)
+        if not self.exists(name):
+            # Файл пишется под временным именем и переименовывается
+            # атомарно: читатели не увидят его недописанным.
+            temporary = super()._save(f"{name}.{uuid.uuid4().hex}.tmp", content)
+            os.replace(self.path(temporary), self.path(name))
+        self.add_reference(name, content.size)
+        return name
+
+    def add_reference(self, name, size):
+        if StoredFile.objects.filter(name=name).update(
+                references=F("references") + 1):
+            return
+        try:
+            with transaction.atomic():
+                StoredFile.objects.create(name=name, size=size)
+        except IntegrityError:
+            # Ту же загрузку параллельно сохранил другой запрос.
+            StoredFile.objects.filter(name=name).update(
+                references=F("references") + 1)
+
+    def delete(self, name):
+        """
+        Снимает ссылку на файл; сам файл удаляется после фиксации
+        транзакции, если ссылок не осталось.
+        """
+        if not is_hashed(name):
+            return super().delete(name)
+        with transaction.atomic():
+            if StoredFile.objects.filter(name=name, references__gt=1).update(
+                    references=F("references") - 1):
+                return
+            StoredFile.objects.filter(name=name).delete()
+        transaction.on_commit(lambda: self.delete_unreferenced(name))
+
+    def delete_unreferenced(self, name):
+        # Пока транзакция фиксировалась, тот же файл могли загрузить снова.
+        if not StoredFile.objects.filter(name=name).exists():
+            super().delete(name)
@@ -0,0 +1,40 @@
+# library_app/templatetags/library_images.py
+from django import template
+from django.forms.utils import flatatt
+from django.utils.html import format_html
+
+from library_app.images import srcset
+
+register = template.Library()
+
+
+@register.simple_tag
+def picture(field_file, variants, alt="", sizes="100vw", **attrs):
+    """
+    ``<picture>`` с WebP и JPEG копиями изображения и ``srcset``.
+
+    Пока копии не построены, выводит исходное изображение.
+    """
+    if not field_file:
+        return ""
+    variants = variants or {}
+    images = variants.get("images")
+    if not images or variants.get("source") != field_file.name:
+        return format_html(
+            '<img src="{}" alt="{}"{}>', field_file.url, alt, flatatt(attrs))
+    url = field_file.storage.url
+    largest = images[-1]
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}" '
+        'alt="{}" loading="lazy"{}></picture>',
+        srcset(variants, "webp", url),
+        sizes,
+        url(largest["jpeg"]),
+        srcset(variants, "jpeg", url),
+        sizes,
+        largest["width"],
+        largest["height"],
+        alt,
+        flatatt(attrs),
+    )
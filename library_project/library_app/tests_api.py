@@ -1,11 +1,31 @@
+import base64
+import csv
+import json
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import StringIO
+
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection
+from django.test.utils import CaptureQueriesContext, override_settings
 from django.urls import reverse
 from django.utils import timezone
 from rest_framework import status
-from rest_framework.test import APITestCase
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework.test import (APIClient, APITestCase,
+                                 APITransactionTestCase)
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
 
-from .models import Author, Book, BookIssue, Comment, Rating
+from .authentication import LibraryRefreshToken
+from .checks import check_stateless_jwt
+from .models import (Author, AuthorStats, Book, BookHold, BookIssue,
+                     Comment, ImportCheckpoint, OutboxEmail, Rating,
+                     RevokedToken)
+from .ratings import upsert_rating
 
 
 class UserRegistrationTest(APITestCase):
@@ -206,3 +226,1148 @@ class ProfileAPITest(APITestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertContains(response, self.book.title)
+
+
+class KeysetPaginationAPITest(APITestCase):
+    """Тесты курсорной пагинации списков API."""
+
+    def setUp(self):
+        for title in ["Delta", "Alpha", "Echo", "Bravo", "Charlie"]:
+            Book.objects.create(title=title)
+
+    def collect(self, url):
+        titles = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            titles.extend(book["title"] for book in response.data["results"])
+            url = response.data["next"]
+        return titles
+
+    def test_walks_all_pages_in_order(self):
+        url = reverse("book-list") + "?page_size=2"
+        self.assertEqual(
+            self.collect(url), ["Alpha", "Bravo", "Charlie", "Delta", "Echo"]
+        )
+
+    def test_descending_ordering(self):
+        url = reverse("book-list") + "?page_size=2&ordering=-title"
+        self.assertEqual(
+            self.collect(url), ["Echo", "Delta", "Charlie", "Bravo", "Alpha"]
+        )
+
+    def test_previous_link_returns_prior_page(self):
+        first = self.client.get(reverse("book-list") + "?page_size=2")
+        second = self.client.get(first.data["next"])
+        self.assertEqual(
+            [book["title"] for book in second.data["results"]],
+            ["Charlie", "Delta"],
+        )
+        previous = self.client.get(second.data["previous"])
+        self.assertEqual(
+            [book["title"] for book in previous.data["results"]],
+            ["Alpha", "Bravo"],
+        )
+        self.assertIsNone(previous.data["previous"])
+
+    def test_duplicate_sort_keys_are_not_skipped(self):
+        for _ in range(3):
+            Book.objects.create(title="Alpha")
+        url = reverse("book-list") + "?page_size=2"
+        self.assertEqual(len(self.collect(url)), 8)
+
+    def test_unknown_ordering_rejected(self):
+        response = self.client.get(reverse("book-list") + "?ordering=genre")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_invalid_cursor_rejected(self):
+        response = self.client.get(reverse("book-list") + "?cursor=garbage")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_tampered_cursor_rejected(self):
+        payloads = [
+            ("book-list", {"o": "id", "p": [None, 1]}),
+            ("book-list", {"o": "id", "p": [None, 1], "r": "x"}),
+            ("book-list", {"o": "title", "p": [["a"], 1], "r": 0}),
+            ("book-list", {"o": "title", "p": [{"a": 1}, 1], "r": 0}),
+            ("book-list", {"o": "id", "p": [None, True], "r": 0}),
+            ("book-list", ["o", "p", "r"]),
+            ("comment-list",
+             {"o": "-created_at", "p": ["not a date", 1], "r": 0}),
+        ]
+        for url_name, payload in payloads:
+            ordering = payload["o"] if isinstance(payload, dict) else "id"
+            cursor = base64.urlsafe_b64encode(json.dumps(payload).encode())
+            with self.subTest(payload=payload):
+                response = self.client.get(
+                    reverse(url_name),
+                    {"ordering": ordering, "cursor": cursor.decode()},
+                )
+                self.assertEqual(
+                    response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_datetime_sort_key(self):
+        user = User.objects.create_user(username="reader", password="pass12345")
+        book = Book.objects.first()
+        for index in range(5):
+            Comment.objects.create(book=book, user=user, text=str(index))
+        url = reverse("comment-list") + "?page_size=2"
+        texts = []
+        while url:
+            response = self.client.get(url)
+            texts.extend(comment["text"] for comment in response.data["results"])
+            url = response.data["next"]
+        self.assertEqual(texts, ["4", "3", "2", "1", "0"])
+
+
+class BookCountersTest(APITestCase):
+    """Тесты денормализованных счётчиков книги."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="user1", password="pass12345")
+        self.other = User.objects.create_user(
+            username="user2", password="pass12345")
+        self.book = Book.objects.create(title="Test Book")
+
+    def assertCounters(self, **expected):
+        self.book.refresh_from_db()
+        for field, value in expected.items():
+            self.assertEqual(getattr(self.book, field), value, field)
+
+    def test_rating_create_update_delete(self):
+        rating = Rating.objects.create(book=self.book, user=self.user, score=4)
+        Rating.objects.create(book=self.book, user=self.other, score=2)
+        self.assertCounters(rating_count=2, rating_sum=6, average_rating=3)
+
+        rating.score = 5
+        rating.save()
+        self.assertCounters(rating_count=2, rating_sum=7)
+
+        rating = Rating.objects.get(pk=rating.pk)
+        rating.delete()
+        self.assertCounters(rating_count=1, rating_sum=2)
+
+    def test_rating_moved_to_other_book(self):
+        other_book = Book.objects.create(title="Other")
+        rating = Rating.objects.create(book=self.book, user=self.user, score=3)
+        rating.book = other_book
+        rating.save()
+        self.assertCounters(rating_count=0, rating_sum=0)
+        other_book.refresh_from_db()
+        self.assertEqual(other_book.rating_sum, 3)
+
+    def test_issue_return_and_delete(self):
+        issue = BookIssue.objects.create(
+            book=self.book, user=self.user, due_date="2099-12-31")
+        self.assertCounters(issue_count=1, active_issue_count=1)
+
+        issue.return_date = timezone.now().date()
+        issue.save()
+        self.assertCounters(issue_count=1, active_issue_count=0)
+
+        issue.delete()
+        self.assertCounters(issue_count=0, active_issue_count=0)
+
+    def test_comment_counter_via_api(self):
+        self.client.force_authenticate(self.user)
+        self.client.post(
+            reverse("comment-list"),
+            {"book": self.book.id, "text": "Nice"},
+            format="json",
+        )
+        self.assertCounters(comment_count=1)
+
+    def test_book_save_keeps_counters(self):
+        stale = Book.objects.get(pk=self.book.pk)
+        Rating.objects.create(book=self.book, user=self.user, score=5)
+        stale.title = "Renamed"
+        stale.save()
+        self.assertCounters(title="Renamed", rating_count=1, rating_sum=5)
+
+    def test_rebuild_command_repairs_drift(self):
+        Rating.objects.create(book=self.book, user=self.user, score=4)
+        Comment.objects.create(book=self.book, user=self.user, text="Hi")
+        Book.objects.update(rating_count=10, rating_sum=0, comment_count=7)
+        call_command("rebuild_counters", stdout=StringIO())
+        self.assertCounters(rating_count=1, rating_sum=4, comment_count=1)
+
+
+class AuthorStatsTest(APITestCase):
+    """Тесты предрассчитанной статистики авторов."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="user1", password="pass12345")
+        self.other = User.objects.create_user(
+            username="user2", password="pass12345")
+        self.author = Author.objects.create(first_name="John", last_name="Doe")
+        self.coauthor = Author.objects.create(
+            first_name="Jane", last_name="Roe")
+        self.book = Book.objects.create(title="Test Book")
+        self.book.authors.add(self.author, self.coauthor)
+
+    def stats(self, author):
+        author.stats.refresh_from_db()
+        return author.stats
+
+    def test_ratings_and_issues_propagate(self):
+        Rating.objects.create(book=self.book, user=self.user, score=5)
+        Rating.objects.create(book=self.book, user=self.other, score=3)
+        BookIssue.objects.create(
+            book=self.book, user=self.user, due_date="2099-12-31")
+        for author in (self.author, self.coauthor):
+            stats = self.stats(author)
+            self.assertEqual(stats.book_count, 1)
+            self.assertEqual(stats.rating_count, 2)
+            self.assertEqual(stats.average_rating, 4)
+            self.assertEqual(stats.issue_count, 1)
+
+    def test_link_changes_move_book_totals(self):
+        Rating.objects.create(book=self.book, user=self.user, score=4)
+        self.book.authors.remove(self.coauthor)
+        stats = self.stats(self.coauthor)
+        self.assertEqual((stats.book_count, stats.rating_count), (0, 0))
+
+        self.coauthor.books.add(self.book)
+        stats = self.stats(self.coauthor)
+        self.assertEqual((stats.book_count, stats.rating_sum), (1, 4))
+
+        self.book.authors.clear()
+        stats = self.stats(self.author)
+        self.assertEqual((stats.book_count, stats.rating_count), (0, 0))
+
+    def test_book_delete_subtracts_once(self):
+        second = Book.objects.create(title="Second")
+        second.authors.add(self.author)
+        Rating.objects.create(book=self.book, user=self.user, score=2)
+        Rating.objects.create(book=second, user=self.user, score=4)
+        self.book.delete()
+        stats = self.stats(self.author)
+        self.assertEqual(stats.book_count, 1)
+        self.assertEqual((stats.rating_count, stats.rating_sum), (1, 4))
+
+    def test_rebuild_command_restores_stats(self):
+        Rating.objects.create(book=self.book, user=self.user, score=4)
+        AuthorStats.objects.all().delete()
+        call_command("rebuild_counters", stdout=StringIO())
+        stats = self.stats(self.author)
+        self.assertEqual((stats.book_count, stats.rating_sum), (1, 4))
+
+    def test_author_list_single_query(self):
+        for index in range(5):
+            Author.objects.create(first_name="A", last_name=str(index))
+        # Версия списка для ETag (conditional.py) и сама выборка.
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("author-list"))
+        counts = {
+            author["last_name"]: author["book_count"]
+            for author in response.data["results"]
+        }
+        self.assertEqual(counts["Doe"], 1)
+
+
+class SearchAPITest(APITestCase):
+    """Тесты полнотекстового и нечёткого поиска книг и авторов."""
+
+    def setUp(self):
+        self.tolstoy = Author.objects.create(
+            first_name="Leo", last_name="Tolstoy")
+        self.war = Book.objects.create(
+            title="War and Peace", genre="Novel",
+            description="Napoleon invades Russia")
+        self.war.authors.add(self.tolstoy)
+        self.anna = Book.objects.create(
+            title="Anna Karenina", genre="Novel",
+            description="A story about war veterans")
+        self.anna.authors.add(self.tolstoy)
+        Book.objects.create(title="Dune", genre="Science fiction")
+
+    def search(self, query, name="book-list", **params):
+        response = self.client.get(
+            reverse(name), {"search": query, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [item["id"] for item in response.data["results"]]
+
+    def test_title_match_ranks_above_description(self):
+        self.assertEqual(self.search("war"), [self.war.id, self.anna.id])
+
+    def test_search_by_author_name(self):
+        self.assertCountEqual(
+            self.search("Tolstoy"), [self.war.id, self.anna.id])
+
+    def test_author_rename_updates_index(self):
+        self.tolstoy.last_name = "Tolstoi"
+        self.tolstoy.save()
+        self.assertCountEqual(
+            self.search("Tolstoi"), [self.war.id, self.anna.id])
+
+    def test_fuzzy_title_match(self):
+        self.assertEqual(self.search("Karenin"), [self.anna.id])
+
+    def test_fuzzy_author_search(self):
+        Author.objects.create(first_name="Frank", last_name="Herbert")
+        self.assertEqual(
+            self.search("Tolstoj", name="author-list"), [self.tolstoy.id])
+
+    def test_ranked_results_paginate(self):
+        first = self.client.get(
+            reverse("book-list"), {"search": "war", "page_size": 1})
+        second = self.client.get(first.data["next"])
+        self.assertEqual(
+            [first.data["results"][0]["id"], second.data["results"][0]["id"]],
+            [self.war.id, self.anna.id],
+        )
+        self.assertIsNone(second.data["next"])
+
+
+class CatalogCacheAPITest(APITestCase):
+    """Тесты кэширования списков API и статистики кэша."""
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser(
+            username="admin", password="adminpass")
+        self.book = Book.objects.create(title="Dune", genre="Science fiction")
+
+    def titles(self):
+        response = self.client.get(reverse("book-list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [item["title"] for item in response.data["results"]]
+
+    def test_list_is_cached_until_book_changes(self):
+        self.assertEqual(self.titles(), ["Dune"])
+        Book.objects.filter(pk=self.book.pk).update(title="Arrakis")
+        self.assertEqual(self.titles(), ["Dune"])
+        self.book.refresh_from_db()
+        self.book.save()
+        self.assertEqual(self.titles(), ["Arrakis"])
+
+    def test_cache_stats(self):
+        self.titles()
+        self.titles()
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get(reverse("cache_stats"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data["sections"]["api_books"], {"hits": 1, "misses": 1})
+
+    def test_cache_stats_requires_admin(self):
+        response = self.client.get(reverse("cache_stats"))
+        self.assertIn(
+            response.status_code,
+            (status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN),
+        )
+
+
+class EagerLoadingAPITest(APITestCase):
+    """Тесты автоматической подгрузки связей по полям сериализаторов."""
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser(
+            username="admin", password="adminpass")
+        self.client.force_authenticate(user=self.admin)
+
+    def add_issue(self, number):
+        author = Author.objects.create(
+            first_name="Author", last_name=str(number))
+        book = Book.objects.create(title=f"Book {number}")
+        book.authors.add(author)
+        user = User.objects.create_user(
+            username=f"reader{number}", password="pass")
+        BookIssue.objects.create(
+            book=book, user=user, due_date=timezone.now().date())
+        Comment.objects.create(book=book, user=user, text="Text")
+        Rating.objects.create(book=book, user=user, score=5)
+
+    def count_queries(self, name):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse(name))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(context.captured_queries)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        self.add_issue(1)
+        names = ["issues-list", "book-list", "comment-list", "rating-list"]
+        single = {name: self.count_queries(name) for name in names}
+        for number in range(2, 6):
+            self.add_issue(number)
+        for name in names:
+            with self.subTest(name=name):
+                self.assertEqual(self.count_queries(name), single[name])
+
+    def test_nested_data_is_loaded(self):
+        self.add_issue(1)
+        response = self.client.get(reverse("issues-list"))
+        issue = response.data["results"][0]
+        self.assertEqual(issue["user"]["username"], "reader1")
+        self.assertEqual(issue["book"]["authors"][0]["last_name"], "1")
+        self.assertEqual(issue["book"]["authors"][0]["book_count"], 1)
+        self.assertEqual(issue["book"]["average_rating"], 5)
+        self.assertFalse(issue["is_returned"])
+
+    def test_unused_columns_are_not_selected(self):
+        self.add_issue(1)
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(reverse("book-list"))
+        self.assertFalse(
+            any("search_vector" in query["sql"]
+                for query in context.captured_queries)
+        )
+
+
+class ImportCatalogTest(APITestCase):
+    """Тесты потокового импорта каталога командой import_catalog."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        Author.objects.create(first_name="Leo", last_name="Tolstoy")
+
+    def write(self, name, content):
+        path = os.path.join(self.directory.name, name)
+        with open(path, "w", encoding="utf-8") as stream:
+            stream.write(content)
+        return path
+
+    def run_import(self, path, *args):
+        out, err = StringIO(), StringIO()
+        call_command("import_catalog", path, *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_csv_import_deduplicates_authors(self):
+        path = self.write(
+            "catalog.csv",
+            "title,authors,genre,published_date,description\n"
+            "War and Peace,Leo Tolstoy,Novel,1869-01-01,Napoleon\n"
+            "Anna Karenina,Leo Tolstoy,Novel,,\n"
+            "Good Omens,Terry Pratchett; Neil Gaiman,Fantasy,1990-05-01,\n",
+        )
+        out, _ = self.run_import(path, "--chunk-size", "2")
+        self.assertIn("строк/с", out)
+        self.assertEqual(Book.objects.count(), 3)
+        self.assertEqual(Author.objects.filter(last_name="Tolstoy").count(), 1)
+        tolstoy = Author.objects.get(last_name="Tolstoy")
+        self.assertEqual(tolstoy.stats.book_count, 2)
+        omens = Book.objects.get(title="Good Omens")
+        self.assertEqual(
+            sorted(omens.authors.values_list("last_name", flat=True)),
+            ["Gaiman", "Pratchett"],
+        )
+        response = self.client.get(reverse("book-list"), {"search": "Napoleon"})
+        self.assertEqual(
+            [item["title"] for item in response.data["results"]],
+            ["War and Peace"])
+
+    def test_jsonl_import_reports_invalid_rows(self):
+        path = self.write("catalog.jsonl", "\n".join([
+            json.dumps({"title": "Dune", "authors": [
+                {"first_name": "Frank", "last_name": "Herbert"}]}),
+            "{broken",
+            json.dumps({"title": "", "authors": []}),
+            json.dumps({"title": "Emma", "authors": ["Jane Austen"]}),
+        ]))
+        out, err = self.run_import(path)
+        self.assertEqual(
+            sorted(Book.objects.values_list("title", flat=True)),
+            ["Dune", "Emma"])
+        self.assertIn("Строка 2", err)
+        self.assertIn("Строка 3", err)
+        checkpoint = ImportCheckpoint.objects.get()
+        self.assertEqual((checkpoint.rows, checkpoint.errors), (4, 2))
+        self.assertIsNotNone(checkpoint.finished_at)
+
+    def test_resume_skips_loaded_rows(self):
+        path = self.write(
+            "catalog.csv",
+            "title,authors\nFirst,A One\nSecond,B Two\nThird,C Three\n",
+        )
+        ImportCheckpoint.objects.create(source=os.path.abspath(path), rows=2)
+        with self.assertRaises(CommandError):
+            self.run_import(path)
+        self.run_import(path, "--resume")
+        self.assertEqual(
+            list(Book.objects.values_list("title", flat=True)), ["Third"])
+        self.run_import(path, "--resume")
+        self.assertEqual(Book.objects.count(), 1)
+
+
+class CatalogExportAPITest(APITestCase):
+    """Тесты потоковой выгрузки каталога."""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            username="admin", password="adminpass")
+        self.tolstoy = Author.objects.create(
+            first_name="Leo", last_name="Tolstoy")
+        self.war = Book.objects.create(title="War and Peace", genre="Novel")
+        self.war.authors.add(self.tolstoy)
+        self.dune = Book.objects.create(title="Dune", genre="Science fiction")
+
+    def export(self, name, **params):
+        response = self.client.get(name, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content).decode()
+
+    def url(self, resource, export_format):
+        return reverse("catalog_export", args=[resource, export_format])
+
+    def test_books_csv(self):
+        rows = list(csv.DictReader(
+            self.export(self.url("books", "csv")).splitlines()))
+        self.assertEqual([row["title"] for row in rows], ["War and Peace", "Dune"])
+        self.assertEqual(rows[0]["authors"], "Leo Tolstoy")
+
+    def test_books_ndjson(self):
+        lines = self.export(self.url("books", "ndjson")).splitlines()
+        first = json.loads(lines[0])
+        self.assertEqual(first["authors"], ["Leo Tolstoy"])
+        self.assertEqual(len(lines), 2)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        url = self.url("books", "ndjson")
+        with CaptureQueriesContext(connection) as context:
+            self.export(url)
+        for number in range(10):
+            book = Book.objects.create(title=f"Book {number}")
+            book.authors.add(self.tolstoy)
+        with self.assertNumQueries(len(context.captured_queries)):
+            self.export(url)
+
+    def test_updated_since(self):
+        Book.objects.filter(pk=self.dune.pk).update(
+            updated_at=timezone.now() - timedelta(days=10))
+        since = (timezone.now() - timedelta(days=1)).date().isoformat()
+        lines = self.export(self.url("books", "ndjson"), updated_since=since)
+        self.assertEqual(
+            [json.loads(line)["title"] for line in lines.splitlines()],
+            ["War and Peace"])
+
+    def test_rating_marks_book_updated(self):
+        Book.objects.update(updated_at=timezone.now() - timedelta(days=10))
+        user = User.objects.create_user(username="reader", password="pass")
+        Rating.objects.create(book=self.dune, user=user, score=5)
+        since = (timezone.now() - timedelta(days=1)).isoformat()
+        lines = self.export(self.url("books", "ndjson"), updated_since=since)
+        self.assertEqual(
+            [json.loads(line)["title"] for line in lines.splitlines()], ["Dune"])
+
+    def test_invalid_updated_since(self):
+        response = self.client.get(
+            self.url("books", "csv"), {"updated_since": "yesterday"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_issues_require_staff(self):
+        response = self.client.get(self.url("issues", "csv"))
+        self.assertIn(
+            response.status_code,
+            (status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN),
+        )
+        self.client.force_authenticate(user=self.admin)
+        BookIssue.objects.create(
+            book=self.war, user=self.admin, due_date=timezone.now().date())
+        rows = list(csv.DictReader(
+            self.export(self.url("issues", "csv")).splitlines()))
+        self.assertEqual(rows[0]["book_id"], str(self.war.pk))
+
+    def test_unknown_resource(self):
+        response = self.client.get(self.url("users", "csv"))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class BulkWriteAPITest(APITestCase):
+    """Тесты пакетной записи книг, выдач и рейтингов."""
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser(
+            username="admin", password="adminpass")
+        self.reader = User.objects.create_user(
+            username="reader", password="pass")
+        self.tolstoy = Author.objects.create(
+            first_name="Leo", last_name="Tolstoy")
+        self.chekhov = Author.objects.create(
+            first_name="Anton", last_name="Chekhov")
+        self.book = Book.objects.create(title="War and Peace")
+        self.book.authors.add(self.tolstoy)
+
+    def post_books(self, count):
+        return self.client.post(
+            reverse("book-bulk"),
+            [
+                {"title": f"Book {number}",
+                 "author_ids": [self.tolstoy.pk, self.chekhov.pk]}
+                for number in range(count)
+            ],
+            format="json",
+        )
+
+    def test_books_bulk_create(self):
+        self.client.force_authenticate(user=self.admin)
+        response = self.post_books(3)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data["created"]), 3)
+        self.assertEqual(
+            len(response.data["created"][0]["authors"]), 2)
+        self.assertEqual(AuthorStats.objects.get(
+            author=self.chekhov).book_count, 3)
+        self.assertEqual(AuthorStats.objects.get(
+            author=self.tolstoy).book_count, 4)
+        response = self.client.get(reverse("book-list"), {"search": "Chekhov"})
+        self.assertEqual(len(response.data["results"]), 3)
+
+    def test_query_count_does_not_grow_with_batch(self):
+        self.client.force_authenticate(user=self.admin)
+        with CaptureQueriesContext(connection) as context:
+            self.post_books(2)
+        with self.assertNumQueries(len(context.captured_queries)):
+            self.post_books(20)
+
+    def test_per_item_errors(self):
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.post(
+            reverse("book-bulk"),
+            [
+                {"title": "Valid", "author_ids": [self.tolstoy.pk]},
+                {"author_ids": [self.tolstoy.pk]},
+                {"title": "Unknown author", "author_ids": [999999]},
+                "not an object",
+            ],
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            [item["title"] for item in response.data["created"]], ["Valid"])
+        self.assertEqual(
+            [error["index"] for error in response.data["errors"]], [1, 2, 3])
+        self.assertIn("title", response.data["errors"][0]["errors"])
+        self.assertIn("author_ids", response.data["errors"][1]["errors"])
+
+    def test_all_invalid(self):
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.post(
+            reverse("book-bulk"), [{"title": ""}], format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(
+            reverse("book-bulk"), {"title": "x"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_books_bulk_requires_admin(self):
+        self.client.force_authenticate(user=self.reader)
+        response = self.post_books(1)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_issues_bulk_updates_counters(self):
+        Book.objects.filter(pk=self.book.pk).update(copies=2)
+        self.reader.email = "reader@example.com"
+        self.reader.save()
+        self.client.force_authenticate(user=self.reader)
+        due_date = timezone.now().date().isoformat()
+        # Статистика авторов при выдаче обновляется после коммита.
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse("issues-bulk"),
+                [{"book_id": self.book.pk, "due_date": due_date}] * 2,
+                format="json",
+            )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            response.data["created"][0]["user"]["username"], "reader")
+        self.assertEqual(response.data["held"], [])
+        self.book.refresh_from_db()
+        self.assertEqual(
+            (self.book.issue_count, self.book.active_issue_count), (2, 2))
+        self.tolstoy.stats.refresh_from_db()
+        self.assertEqual(self.tolstoy.stats.issue_count, 2)
+        self.assertEqual(OutboxEmail.objects.count(), 2)
+
+    def test_issues_bulk_does_not_oversell(self):
+        self.client.force_authenticate(user=self.reader)
+        due_date = timezone.now().date().isoformat()
+        response = self.client.post(
+            reverse("issues-bulk"),
+            [{"book_id": self.book.pk, "due_date": due_date}] * 3,
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data["created"]), 1)
+        self.assertEqual(
+            [hold["index"] for hold in response.data["held"]], [1, 2])
+        self.assertEqual(
+            {hold["hold_id"] for hold in response.data["held"]},
+            set(BookHold.objects.values_list("pk", flat=True)),
+        )
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.available_copies, 0)
+
+    def test_issues_bulk_ignores_user_id(self):
+        self.client.force_authenticate(user=self.reader)
+        response = self.client.post(
+            reverse("issues-bulk"),
+            [{"book_id": self.book.pk, "user_id": self.admin.pk,
+              "due_date": timezone.now().date().isoformat()}],
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(BookIssue.objects.get().user, self.reader)
+
+    def test_ratings_bulk_rejects_duplicates(self):
+        other = Book.objects.create(title="Anna Karenina")
+        Rating.objects.create(book=other, user=self.reader, score=3)
+        self.client.force_authenticate(user=self.reader)
+        response = self.client.post(
+            reverse("rating-bulk"),
+            [
+                {"book": self.book.pk, "score": 5},
+                {"book": self.book.pk, "score": 4},
+                {"book": other.pk, "score": 1},
+                {"book": self.book.pk, "score": 9},
+            ],
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data["created"]), 1)
+        self.assertEqual(
+            [error["index"] for error in response.data["errors"]], [1, 2, 3])
+        self.book.refresh_from_db()
+        self.assertEqual((self.book.rating_count, self.book.rating_sum), (1, 5))
+
+
+class ConditionalGetAPITest(APITestCase):
+    """Тесты условных запросов (ETag, Last-Modified) к API."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="reader", password="pass")
+        self.author = Author.objects.create(first_name="Leo", last_name="Tolstoy")
+        self.book = Book.objects.create(title="War and Peace")
+        self.book.authors.add(self.author)
+        self.other = Book.objects.create(title="Anna Karenina")
+        self.other.authors.add(self.author)
+        self.comment = Comment.objects.create(
+            book=self.book, user=self.user, text="Great")
+        self.client.force_authenticate(user=self.user)
+
+    def revalidate(self, url, response):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+
+    def test_unchanged_list_is_not_modified(self):
+        url = reverse("book-list")
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("Last-Modified", response)
+        self.assertIn("no-cache", response["Cache-Control"])
+        # Версия списка сохранена в кэше вместе с ним: ни выборки, ни
+        # агрегата по таблице.
+        with self.assertNumQueries(0):
+            not_modified = self.revalidate(url, response)
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(not_modified["ETag"], response["ETag"])
+        self.assertEqual(
+            self.client.get(
+                url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+            ).status_code,
+            status.HTTP_304_NOT_MODIFIED,
+        )
+
+    @override_settings(CACHE_SHARED=True)
+    def test_shared_cache_list_version_skips_database(self):
+        url = reverse("book-list")
+        response = self.client.get(url)
+        self.assertNotIn("Last-Modified", response)
+        with self.assertNumQueries(0):
+            not_modified = self.revalidate(url, response)
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        Rating.objects.create(book=self.other, user=self.user, score=5)
+        self.assertEqual(
+            self.revalidate(url, response).status_code, status.HTTP_200_OK)
+
+    @override_settings(CATALOG_CACHE_ENABLED=False)
+    def test_list_version_without_cache(self):
+        url = reverse("book-list")
+        response = self.client.get(url)
+        with self.assertNumQueries(1):
+            not_modified = self.revalidate(url, response)
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_related_changes_refresh_etag(self):
+        url = reverse("book-list")
+        response = self.client.get(url)
+        # Рейтинг другой книги меняет статистику автора во вложенных данных.
+        Rating.objects.create(book=self.other, user=self.user, score=5)
+        self.assertEqual(
+            self.revalidate(url, response).status_code, status.HTTP_200_OK)
+
+        response = self.client.get(url)
+        self.other.delete()
+        self.assertEqual(
+            self.revalidate(url, response).status_code, status.HTTP_200_OK)
+
+    def test_author_delete_refreshes_book_etag(self):
+        urls = [reverse("book-list"),
+                reverse("async_api_book_detail", args=[self.book.pk])]
+        responses = [self.client.get(url) for url in urls]
+        self.author.delete()
+        for url, response in zip(urls, responses):
+            response = self.revalidate(url, response)
+            self.assertEqual(response.status_code, status.HTTP_200_OK, url)
+        self.assertEqual(
+            self.client.get(reverse("book-list"), {"search": "Tolstoy"})
+            .data["results"],
+            [],
+        )
+
+    def test_comment_edit_refreshes_etag(self):
+        url = reverse("comment-detail", args=[self.comment.pk])
+        response = self.client.get(url)
+        self.assertEqual(
+            self.revalidate(url, response).status_code,
+            status.HTTP_304_NOT_MODIFIED,
+        )
+        self.comment.text = "Edited"
+        self.comment.save()
+        response = self.revalidate(url, response)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["text"], "Edited")
+
+    def test_etag_depends_on_query_and_user(self):
+        url = reverse("rating-list")
+        Rating.objects.create(book=self.book, user=self.user, score=4)
+        response = self.client.get(url)
+        other = self.client.get(url, {"page_size": 1})
+        self.assertNotEqual(response["ETag"], other["ETag"])
+        self.client.force_authenticate(
+            user=User.objects.create_user(username="other", password="pass"))
+        self.assertEqual(
+            self.revalidate(url, response).status_code, status.HTTP_200_OK)
+
+    def test_missing_object_is_not_conditional(self):
+        url = reverse("comment-detail", args=[self.comment.pk + 100])
+        response = self.client.get(url, HTTP_IF_NONE_MATCH="*")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class AsyncReadAPITest(APITestCase):
+    """Тесты асинхронных эндпоинтов чтения книг и авторов."""
+
+    def setUp(self):
+        cache.clear()
+        self.author = Author.objects.create(first_name="Leo", last_name="Tolstoy")
+        self.book = Book.objects.create(title="War and Peace", genre="Novel")
+        self.book.authors.add(self.author)
+        self.other = Book.objects.create(title="Anna Karenina", genre="Novel")
+        self.other.authors.add(self.author)
+
+    def test_list_matches_viewset(self):
+        for sync_name, async_name in [
+            ("book-list", "async_api_book_list"),
+            ("author-list", "async_api_author_list"),
+        ]:
+            with self.subTest(sync_name):
+                expected = self.client.get(reverse(sync_name)).json()
+                response = self.client.get(reverse(async_name))
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(response.json()["results"], expected["results"])
+
+    def test_cursor_search_and_errors(self):
+        url = reverse("async_api_book_list")
+        first = self.client.get(url, {"page_size": 1}).json()
+        self.assertEqual(first["results"][0]["title"], "Anna Karenina")
+        second = self.client.get(first["next"]).json()
+        self.assertEqual(second["results"][0]["title"], "War and Peace")
+        self.assertIsNone(second["next"])
+
+        found = self.client.get(url, {"search": "Karenina"}).json()
+        self.assertEqual(
+            [book["id"] for book in found["results"]], [self.other.pk])
+        self.assertEqual(
+            self.client.get(url, {"ordering": "genre"}).status_code,
+            status.HTTP_400_BAD_REQUEST,
+        )
+        self.assertEqual(
+            self.client.post(url, {}).status_code,
+            status.HTTP_405_METHOD_NOT_ALLOWED,
+        )
+
+    def test_detail_and_revalidation(self):
+        url = reverse("async_api_book_detail", args=[self.book.pk])
+        response = self.client.get(url)
+        self.assertEqual(
+            response.json(),
+            self.client.get(
+                reverse(
+                    "book-detail", kwargs={"pk": self.book.pk, "format": "json"})
+            ).json(),
+        )
+        with self.assertNumQueries(1):
+            not_modified = self.client.get(
+                url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(
+            self.client.get(
+                reverse("async_api_author_detail", args=[0])).status_code,
+            status.HTTP_404_NOT_FOUND,
+        )
+
+
+class DatabaseStatsAPITest(APITestCase):
+    """Тесты метрик соединений с БД."""
+
+    def test_stats_for_admin(self):
+        admin = User.objects.create_superuser(
+            username="admin", password="adminpass")
+        self.client.force_authenticate(user=admin)
+        response = self.client.get(reverse("db_stats"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["mode"], "persistent")
+        self.assertTrue(response.data["settings"]["health_checks"])
+        self.assertIsNone(response.data["pool"])
+        server = response.data["server"]
+        self.assertGreaterEqual(server["used"], 1)
+        self.assertGreaterEqual(server["max_connections"], server["used"])
+        self.assertGreaterEqual(server["database"]["active"], 1)
+
+    def test_stats_require_admin(self):
+        user = User.objects.create_user(username="reader", password="pass")
+        self.client.force_authenticate(user=user)
+        response = self.client.get(reverse("db_stats"))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class RatingUpsertAPITest(APITransactionTestCase):
+    """
+    Тесты замены оценки. Параллельные запросы идут из потоков со своими
+    соединениями, поэтому нужен APITransactionTestCase.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="user1", password="pass")
+        self.author = Author.objects.create(first_name="John", last_name="Doe")
+        self.book = Book.objects.create(title="Test Book")
+        self.book.authors.add(self.author)
+        self.url = reverse("rating-upsert")
+
+    def put(self, score):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        try:
+            return client.put(
+                self.url, {"book": self.book.pk, "score": score}, format="json")
+        finally:
+            connection.close()
+
+    def assertAggregates(self, count, total):
+        self.book.refresh_from_db()
+        self.author.stats.refresh_from_db()
+        for obj in (self.book, self.author.stats):
+            self.assertEqual((obj.rating_count, obj.rating_sum), (count, total))
+
+    def test_upsert_creates_then_replaces(self):
+        response = self.put(4)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(response.data["created"])
+        response = self.put(2)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.data["created"])
+        self.assertEqual(response.data["score"], 2)
+        self.assertEqual(Rating.objects.get().score, 2)
+        self.assertAggregates(1, 2)
+
+    def test_replace_is_one_statement(self):
+        upsert_rating(self.user, self.book, 4)
+        with CaptureQueriesContext(connection) as context:
+            rating, created = upsert_rating(self.user, self.book, 2, "Ok")
+        self.assertFalse(created)
+        self.assertEqual((rating.score, rating.review), (2, "Ok"))
+        self.assertEqual(
+            [query["sql"].count("ON CONFLICT")
+             for query in context.captured_queries].count(1), 1)
+        self.assertFalse(any(
+            query["sql"].startswith("SELECT")
+            and Rating._meta.db_table in query["sql"]
+            for query in context.captured_queries))
+        self.assertAggregates(1, 2)
+
+    def test_deleted_book_is_not_retried(self):
+        book = Book.objects.create(title="Gone")
+        Book.objects.filter(pk=book.pk).delete()
+        with CaptureQueriesContext(connection) as context:
+            with self.assertRaises(IntegrityError):
+                upsert_rating(self.user, book, 3)
+        self.assertEqual(
+            sum("ON CONFLICT" in query["sql"]
+                for query in context.captured_queries), 1)
+
+    def test_parallel_submissions(self):
+        scores = [1, 2, 3, 4, 5] * 4
+        with ThreadPoolExecutor(10) as executor:
+            responses = list(executor.map(self.put, scores))
+        codes = [response.status_code for response in responses]
+        self.assertEqual(codes.count(status.HTTP_201_CREATED), 1)
+        self.assertEqual(codes.count(status.HTTP_200_OK), len(scores) - 1)
+        rating = Rating.objects.get()
+        self.assertAggregates(1, rating.score)
+
+    def test_parallel_create_is_not_server_error(self):
+        def post(_):
+            client = APIClient()
+            client.force_authenticate(self.user)
+            try:
+                return client.post(
+                    reverse("rating-list"),
+                    {"book": self.book.pk, "score": 5},
+                    format="json",
+                ).status_code
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(10) as executor:
+            codes = list(executor.map(post, range(10)))
+        self.assertEqual(codes.count(status.HTTP_201_CREATED), 1)
+        self.assertEqual(codes.count(status.HTTP_400_BAD_REQUEST), 9)
+        self.assertAggregates(1, 5)
+
+
+@override_settings(CACHE_SHARED=True, JWT_STATELESS_READS=True)
+class StatelessAuthAPITest(APITestCase):
+    """
+    Тесты JWT-аутентификации без запроса пользователя и отзыва токенов.
+    Кэш тестов в памяти процесса, но общий для всех запросов теста.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="reader", password="pass")
+        self.refresh = LibraryRefreshToken.for_user(self.user)
+        self.access = self.refresh.access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.access}")
+
+    def count_queries(self, url, stateless):
+        with override_settings(JWT_STATELESS_READS=stateless):
+            # Первый запрос кэширует отметку «токен не отозван».
+            self.client.get(url)
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(context.captured_queries)
+
+    def test_obtained_token_has_user_claims(self):
+        response = self.client.post(
+            reverse("token_obtain_pair"),
+            {"username": "reader", "password": "pass"},
+        )
+        access = AccessToken(response.data["access"])
+        self.assertEqual(access["username"], "reader")
+        self.assertFalse(access["is_staff"])
+        self.assertEqual(access["roles"], [])
+
+    def test_read_skips_user_query(self):
+        url = reverse("issues-list")
+        self.assertEqual(
+            self.count_queries(url, stateless=False) - 1,
+            self.count_queries(url, stateless=True),
+        )
+
+    def test_write_loads_user(self):
+        book = Book.objects.create(title="Book")
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(
+                reverse("rating-list"), {"book": book.pk, "score": 4})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(any(
+            'FROM "auth_user"' in query["sql"]
+            for query in context.captured_queries
+        ))
+
+    def test_revoked_tokens_are_rejected(self):
+        response = self.client.post(
+            reverse("token_revoke"), {"refresh": str(self.refresh)})
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        response = self.client.get(reverse("issues-list"))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.client.credentials()
+        response = self.client.post(
+            reverse("token_refresh"), {"refresh": str(self.refresh)})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_cannot_revoke_foreign_refresh_token(self):
+        other = User.objects.create_user(username="other", password="pass")
+        response = self.client.post(
+            reverse("token_revoke"),
+            {"refresh": str(LibraryRefreshToken.for_user(other))},
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_revocation_survives_cache_loss(self):
+        self.client.post(reverse("token_revoke"))
+        cache.clear()
+        response = self.client.get(reverse("issues-list"))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_revocation_without_shared_cache(self):
+        with override_settings(CACHE_SHARED=False):
+            self.client.post(reverse("token_revoke"))
+            self.assertEqual(
+                RevokedToken.objects.get().jti,
+                self.access[jwt_settings.JTI_CLAIM],
+            )
+            response = self.client.get(reverse("issues-list"))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(CACHE_SHARED=False, JWT_STATELESS_READS=False)
+    def test_revocation_check_is_cached_per_worker(self):
+        url = reverse("issues-list")
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(url)
+        self.assertFalse(any(
+            RevokedToken._meta.db_table in query["sql"]
+            for query in context.captured_queries))
+        # Отзыв в другом воркере: запись в таблице без отметки в этом кэше.
+        RevokedToken.objects.create(
+            jti=self.access[jwt_settings.JTI_CLAIM],
+            expires_at=timezone.now() + timedelta(minutes=5),
+        )
+        with override_settings(JWT_REVOCATION_CHECK_INTERVAL=0):
+            cache.clear()
+            self.client.get(url)
+            self.assertEqual(
+                self.client.get(url).status_code,
+                status.HTTP_401_UNAUTHORIZED,
+            )
+
+    def test_staff_token_is_checked_against_database(self):
+        self.user.is_staff = True
+        self.user.save()
+        token = LibraryRefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.assertEqual(
+            self.client.get(reverse("db_stats")).status_code,
+            status.HTTP_200_OK,
+        )
+        # Снятие прав видно сразу, даже если отметка в кэше потеряна.
+        self.user.is_staff = False
+        self.user.save()
+        cache.clear()
+        self.assertEqual(
+            self.client.get(reverse("db_stats")).status_code,
+            status.HTTP_403_FORBIDDEN,
+        )
+
+    def test_stateless_reads_require_shared_cache(self):
+        with override_settings(CACHE_SHARED=False):
+            errors = check_stateless_jwt(None)
+        self.assertEqual([error.id for error in errors], ["library_app.E001"])
+        self.assertEqual(check_stateless_jwt(None), [])
+
+    def test_role_change_loads_user(self):
+        # Токен выпущен до того, как пользователь стал администратором:
+        # его данные устарели, и пользователь читается из базы.
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get(reverse("db_stats"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
@@ -0,0 +1,186 @@
+import os
+import time
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from .models import Author, Book, BookIssue, Comment, Rating
+
+# Размер набора данных: по умолчанию небольшой, чтобы тесты шли в CI;
+# PERF_SCALE=10 и выше приближает его к рабочему объёму.
+SCALE = int(os.getenv("PERF_SCALE", "1"))
+# Множитель бюджетов времени для медленных машин.
+TIME_FACTOR = float(os.getenv("PERF_TIME_FACTOR", "1"))
+
+
+class QueryBudgetTest(APITestCase):
+    """
+    Бюджеты запросов к БД и времени ответа для эндпоинтов на большом наборе.
+
+    Число запросов не должно зависеть от числа строк, поэтому бюджет
+    задаётся константой; превышение означает N+1 или потерю индекса.
+    Бюджеты включают запрос версии данных для ETag (см. conditional.py).
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command(
+            "seed_catalog",
+            books=500 * SCALE,
+            authors=100 * SCALE,
+            users=100 * SCALE,
+            issues=1000 * SCALE,
+            ratings=1000 * SCALE,
+            comments=1000 * SCALE,
+            seed=1,
+            stdout=StringIO(),
+        )
+        cls.admin = User.objects.create_superuser(
+            username="admin", password="adminpass")
+        cls.book = Book.objects.order_by("-comment_count").first()
+        cls.author = Author.objects.order_by("pk").first()
+        cls.issue = BookIssue.objects.order_by("pk").first()
+        cls.comment = Comment.objects.order_by("pk").first()
+        cls.rating = Rating.objects.order_by("pk").first()
+        cls.reader = User.objects.filter(
+            issued_books__return_date__isnull=True).order_by("pk").first()
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(user=self.admin)
+
+    @staticmethod
+    def api_detail_url(name, pk):
+        """
+        Адрес ``retrieve()`` вьюсета. Маршруты HTML-страниц книги и автора
+        объявлены раньше роутера и перекрывают /api/books/<pk>/ и
+        /api/authors/<pk>/, поэтому берётся маршрут роутера с суффиксом
+        формата — он ведёт в тот же вьюсет.
+        """
+        return reverse(name, kwargs={"pk": pk, "format": "json"})
+
+    def assertWithinBudget(self, url, queries, seconds, **params):
+        """Запрос без кэша укладывается в бюджеты запросов и времени."""
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            started = time.perf_counter()
+            response = self.client.get(url, params)
+            elapsed = time.perf_counter() - started
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        executed = len(context.captured_queries)
+        self.assertLessEqual(
+            executed,
+            queries,
+            f"{url}: {executed} запросов при бюджете {queries}:\n"
+            + "\n".join(query["sql"] for query in context.captured_queries),
+        )
+        self.assertLessEqual(
+            elapsed,
+            seconds * TIME_FACTOR,
+            f"{url}: {elapsed:.3f} с при бюджете {seconds * TIME_FACTOR} с",
+        )
+        return response
+
+    def test_book_api(self):
+        self.assertWithinBudget(reverse("book-list"), 3, 1.0)
+        self.assertWithinBudget(
+            reverse("book-list"), 3, 1.0, search="river", page_size=100)
+        response = self.assertWithinBudget(
+            self.api_detail_url("book-detail", self.book.pk), 3, 0.5)
+        self.assertEqual(response.data["id"], self.book.pk)
+
+    def test_author_api(self):
+        self.assertWithinBudget(reverse("author-list"), 2, 1.0)
+        self.assertWithinBudget(
+            reverse("author-list"), 2, 1.0, ordering="-first_name")
+        response = self.assertWithinBudget(
+            self.api_detail_url("author-detail", self.author.pk), 2, 0.5)
+        self.assertEqual(response.data["id"], self.author.pk)
+
+    def test_user_api(self):
+        self.assertWithinBudget(reverse("user-list"), 1, 1.0)
+        self.assertWithinBudget(
+            reverse("user-detail", args=[self.reader.pk]), 1, 0.5)
+
+    def test_issue_api(self):
+        self.assertWithinBudget(reverse("issues-list"), 3, 1.0, page_size=100)
+        self.assertWithinBudget(
+            reverse("issues-list"), 3, 1.0, ordering="due_date")
+        self.assertWithinBudget(
+            reverse("issues-detail", args=[self.issue.pk]), 3, 0.5)
+
+    def test_comment_api(self):
+        self.assertWithinBudget(reverse("comment-list"), 2, 1.0, page_size=100)
+        self.assertWithinBudget(
+            reverse("comment-detail", args=[self.comment.pk]), 2, 0.5)
+
+    def test_rating_api(self):
+        self.assertWithinBudget(reverse("rating-list"), 2, 1.0, page_size=100)
+        self.assertWithinBudget(
+            reverse("rating-detail", args=[self.rating.pk]), 2, 0.5)
+
+    def test_book_list_page(self):
+        self.client.force_authenticate(user=None)
+        self.assertWithinBudget(reverse("book_list"), 3, 3.0)
+        self.assertWithinBudget(reverse("book_list"), 3, 1.0, search="river")
+
+    def test_book_detail_page(self):
+        self.client.force_authenticate(user=None)
+        self.assertWithinBudget(
+            reverse("book_detail", args=[self.book.pk]), 4, 0.5)
+
+    def test_author_detail_page(self):
+        # /api/authors/<pk>/ и /api/books/<pk>/ отдают HTML-страницы:
+        # их маршруты объявлены раньше маршрутов роутера (API — см.
+        # api_detail_url).
+        self.client.force_authenticate(user=None)
+        self.assertWithinBudget(
+            reverse("author_detail", args=[self.author.pk]), 3, 0.5)
+
+    def test_profile_page(self):
+        self.client.force_login(self.reader)
+        self.assertWithinBudget(reverse("profile"), 3, 0.5)
+
+    def test_seed_is_reproducible(self):
+        def seed():
+            call_command(
+                "seed_catalog", books=20, authors=5, users=5, issues=0,
+                ratings=10, comments=0, seed=7, stdout=StringIO(),
+            )
+            return list(
+                Book.objects.order_by("-pk").values_list(
+                    "title", "genre", "rating_sum")[:20]
+            )
+
+        self.assertEqual(seed(), seed())
+
+    def test_seed_keeps_copies_available(self):
+        call_command(
+            "seed_catalog", books=3, authors=1, users=5, issues=60,
+            ratings=0, comments=0, seed=3, stdout=StringIO(),
+        )
+        new_books = Book.objects.order_by("-pk")[:3]
+        self.assertTrue(all(book.available_copies >= 0 for book in new_books))
+
+    def test_seed_numbers_readers_after_highest(self):
+        def seed():
+            call_command(
+                "seed_catalog", books=0, authors=0, users=2, issues=0,
+                ratings=0, comments=0, stdout=StringIO(),
+            )
+
+        seed()
+        User.objects.filter(username__startswith="reader").order_by(
+            "pk").first().delete()
+        seed()
+        self.assertEqual(
+            User.objects.filter(username__startswith="reader").count(),
+            100 * SCALE + 3,
+        )
@@ -1,9 +1,65 @@
-from django.contrib.auth.models import User
-from django.test import Client, TestCase
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO, StringIO
+
+from django.contrib.auth.models import Group, User
+from django.core import mail
+from django.contrib.sessions.models import Session
+from django.core.cache import cache, caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.test import (Client, RequestFactory, TestCase,
+                         TransactionTestCase, override_settings)
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
 
-from .models import Author, Book, BookIssue
+from PIL import Image
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .checks import check_cached_sessions
+from .inventory import checkout, new_issue
+from .models import (Author, AuthorStats, Book, BookHold, BookIssue,
+                     Comment, ImageTask, OutboxEmail, Rating, Reminder,
+                     StoredFile)
+from .roles import forget_group_ids
+from .storage import is_hashed
+from .views import serve_media
+
+
+class FailingEmailBackend(BaseEmailBackend):
+    """Почтовый бэкенд, имитирующий недоступный SMTP-сервер."""
+
+    def send_messages(self, email_messages):
+        raise ConnectionError("SMTP server unavailable")
+
+
+class DroppingEmailBackend(BaseEmailBackend):
+    """
+    Почтовый бэкенд, у которого SMTP-сервер пропадает после первого
+    письма: следующая отправка и повторное подключение завершаются ошибкой.
+    """
+
+    sent = []
+
+    def open(self):
+        if self.sent:
+            raise ConnectionRefusedError("SMTP server unavailable")
+        return True
+
+    def send_messages(self, email_messages):
+        if self.sent:
+            raise ConnectionError("SMTP server unavailable")
+        self.sent.extend(email_messages)
+        return len(email_messages)
 
 
 class AuthorWebTest(TestCase):
@@ -96,3 +152,938 @@ class ProfileWebTest(TestCase):
         self.client.login(username="user1", password="pass123")
         response = self.client.get(reverse("profile"))
         self.assertContains(response, "You have not rented any books.")
+
+
+class SearchWebTest(TestCase):
+    """Тесты поиска на HTML-страницах каталога."""
+
+    def setUp(self):
+        self.author = Author.objects.create(
+            first_name="Frank", last_name="Herbert")
+        self.book = Book.objects.create(title="Dune", genre="Science fiction")
+        self.book.authors.add(self.author)
+        Book.objects.create(title="Emma", genre="Novel")
+
+    def test_book_list_search(self):
+        response = self.client.get(reverse("book_list"), {"search": "Herbert"})
+        self.assertContains(response, "Dune")
+        self.assertNotContains(response, "Emma")
+
+    def test_author_list_search(self):
+        Author.objects.create(first_name="Jane", last_name="Austen")
+        response = self.client.get(reverse("author_list"), {"search": "Herbet"})
+        self.assertContains(response, "Herbert")
+        self.assertNotContains(response, "Austen")
+
+
+class CatalogCacheWebTest(TestCase):
+    """Тесты кэширования страниц каталога для анонимных посетителей."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="reader", password="pass")
+        self.author = Author.objects.create(
+            first_name="Frank", last_name="Herbert")
+        self.book = Book.objects.create(title="Dune", genre="Science fiction")
+        self.book.authors.add(self.author)
+
+    def test_anonymous_page_is_served_from_cache(self):
+        self.client.get(reverse("book_list"))
+        Book.objects.filter(pk=self.book.pk).update(title="Arrakis")
+        response = self.client.get(reverse("book_list"))
+        self.assertContains(response, "Dune")
+
+    def test_rating_invalidates_book_and_author_pages(self):
+        book_url = reverse("book_detail", args=[self.book.pk])
+        author_url = reverse("author_detail", args=[self.author.pk])
+        self.client.get(book_url)
+        self.client.get(author_url)
+        Rating.objects.create(book=self.book, user=self.user, score=4)
+        self.assertContains(self.client.get(book_url), "4.0 (1)")
+        self.assertContains(self.client.get(author_url), "4.0 (1)")
+
+    def test_comment_invalidates_book_page(self):
+        url = reverse("book_detail", args=[self.book.pk])
+        self.client.get(url)
+        self.book.comments.create(user=self.user, text="Classic")
+        self.assertContains(self.client.get(url), "Classic")
+
+    def test_authenticated_pages_are_not_cached(self):
+        self.client.login(username="reader", password="pass")
+        self.client.get(reverse("book_list"))
+        Book.objects.filter(pk=self.book.pk).update(title="Arrakis")
+        response = self.client.get(reverse("book_list"))
+        self.assertContains(response, "Arrakis")
+
+
+class RentalOutboxWebTest(TestCase):
+    """Тесты отправки подтверждения аренды через очередь писем."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            "reader", "reader@example.com", "pass12345")
+        self.book = Book.objects.create(title="Test Book")
+        self.client.login(username="reader", password="pass12345")
+
+    def rent(self):
+        return self.client.post(
+            reverse("book_issue_create", args=[self.book.id]),
+            {"rental_period": 7},
+        )
+
+    def test_rental_queues_email_without_sending(self):
+        response = self.rent()
+        self.assertRedirects(response, reverse("profile"))
+        self.assertEqual(BookIssue.objects.count(), 1)
+        email = OutboxEmail.objects.get()
+        self.assertEqual(email.recipients, ["reader@example.com"])
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_worker_sends_queued_email(self):
+        self.rent()
+        call_command("send_outbox", "--once", stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn("Test Book", mail.outbox[0].body)
+        email = OutboxEmail.objects.get()
+        self.assertEqual(email.status, OutboxEmail.Status.SENT)
+        self.assertEqual(email.attempts, 1)
+
+    def test_failed_delivery_is_retried_later(self):
+        self.rent()
+        call_command(
+            "send_outbox",
+            "--once",
+            "--backend=library_app.tests_web.FailingEmailBackend",
+            stdout=StringIO(),
+        )
+        email = OutboxEmail.objects.get()
+        self.assertEqual(email.status, OutboxEmail.Status.PENDING)
+        self.assertEqual(email.attempts, 1)
+        self.assertGreater(email.available_at, timezone.now())
+        self.assertIn("SMTP server unavailable", email.last_error)
+
+    def test_reconnect_failure_keeps_sent_emails(self):
+        DroppingEmailBackend.sent.clear()
+        for _ in range(3):
+            self.rent()
+            BookIssue.objects.all().delete()
+        stderr = StringIO()
+        call_command(
+            "send_outbox",
+            "--once",
+            "--backend=library_app.tests_web.DroppingEmailBackend",
+            stdout=StringIO(),
+            stderr=stderr,
+        )
+        self.assertEqual(len(DroppingEmailBackend.sent), 1)
+        emails = OutboxEmail.objects.order_by("pk")
+        self.assertEqual(
+            [email.status for email in emails],
+            [OutboxEmail.Status.SENT] + [OutboxEmail.Status.PENDING] * 2,
+        )
+        self.assertTrue(all(email.attempts == 1 for email in emails))
+        self.assertIn("SMTP server unavailable", emails[2].last_error)
+
+        # Сервер всё ещё недоступен: обработчик не падает при подключении.
+        call_command(
+            "send_outbox",
+            "--once",
+            "--backend=library_app.tests_web.DroppingEmailBackend",
+            stdout=StringIO(),
+            stderr=stderr,
+        )
+        self.assertIn("Нет соединения с сервером", stderr.getvalue())
+
+    @override_settings(OUTBOX_MAX_ATTEMPTS=1)
+    def test_gives_up_after_max_attempts(self):
+        self.rent()
+        call_command(
+            "send_outbox",
+            "--once",
+            "--backend=library_app.tests_web.FailingEmailBackend",
+            stdout=StringIO(),
+        )
+        email = OutboxEmail.objects.get()
+        self.assertEqual(email.status, OutboxEmail.Status.FAILED)
+
+    def test_file_backend_stands_in_for_smtp(self):
+        self.rent()
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(EMAIL_FILE_PATH=directory):
+                call_command(
+                    "send_outbox",
+                    "--once",
+                    "--backend=django.core.mail.backends.filebased.EmailBackend",
+                    stdout=StringIO(),
+                )
+            self.assertEqual(len(os.listdir(directory)), 1)
+
+
+def make_image(name, size=(800, 1200), mode="RGB", color="red"):
+    buffer = BytesIO()
+    Image.new(mode, size, color).save(buffer, "PNG")
+    return SimpleUploadedFile(name, buffer.getvalue(), "image/png")
+
+
+class OverdueReminderWebTest(TestCase):
+    """Тесты напоминаний о возврате (manage.py send_reminders)."""
+
+    def setUp(self):
+        self.reader = User.objects.create_user(
+            username="reader", email="reader@example.com", password="pass")
+        self.other = User.objects.create_user(
+            username="other", email="other@example.com", password="pass")
+        self.silent = User.objects.create_user(username="silent", password="pass")
+        self.books = [Book.objects.create(title=f"Book {i}") for i in range(5)]
+
+    def issue(self, user, book, due_date, returned=False):
+        return BookIssue.objects.create(
+            book=book, user=user, due_date=due_date,
+            return_date="2026-01-01" if returned else None)
+
+    def remind(self, date="2026-03-10"):
+        call_command(
+            "send_reminders", date=date, due_soon_days=2, chunk_size=1,
+            stdout=StringIO())
+
+    def test_one_email_per_user_and_idempotent(self):
+        self.issue(self.reader, self.books[0], "2026-03-01")
+        self.issue(self.other, self.books[1], "2026-03-05")
+        self.issue(self.reader, self.books[2], "2026-03-11")
+        self.issue(self.reader, self.books[3], "2026-03-20")  # ещё не скоро
+        self.issue(self.reader, self.books[4], "2026-03-01", returned=True)
+        self.issue(self.silent, self.books[4], "2026-03-02")
+
+        self.remind()
+        emails = {
+            email.recipients[0]: email for email in OutboxEmail.objects.all()}
+        self.assertEqual(
+            sorted(emails), ["other@example.com", "reader@example.com"])
+        body = emails["reader@example.com"].body
+        self.assertIn("Срок возврата истёк:\n- \"Book 0\" — до 2026-03-01", body)
+        self.assertIn("Скоро нужно вернуть:\n- \"Book 2\" — до 2026-03-11", body)
+        self.assertNotIn("Book 3", body)
+        self.assertNotIn("Book 4", body)
+        # Без адреса письма нет, но напоминание записано и не повторяется.
+        self.assertEqual(Reminder.objects.count(), 4)
+        self.assertTrue(Reminder.objects.filter(
+            issue__user=self.silent, email__isnull=True).exists())
+
+        self.remind()
+        self.assertEqual(OutboxEmail.objects.count(), 2)
+        self.assertEqual(Reminder.objects.count(), 4)
+
+    def test_due_soon_then_overdue(self):
+        issue = self.issue(self.reader, self.books[0], "2026-03-11")
+        self.remind("2026-03-10")
+        self.remind("2026-03-12")
+        self.assertEqual(
+            sorted(issue.reminders.values_list("kind", flat=True)),
+            [Reminder.Kind.DUE_SOON, Reminder.Kind.OVERDUE],
+        )
+        self.assertEqual(OutboxEmail.objects.count(), 2)
+        self.assertEqual(
+            OutboxEmail.objects.latest("id").subject, "Просрочен возврат книг")
+
+    def test_admin_state_filter(self):
+        today = timezone.localdate()
+        self.issue(self.reader, self.books[0], today - timezone.timedelta(days=1))
+        self.issue(self.reader, self.books[1], today + timezone.timedelta(days=1))
+        self.issue(self.reader, self.books[2], today, returned=True)
+        admin_user = User.objects.create_superuser(
+            username="admin", password="adminpass")
+        self.client.force_login(admin_user)
+        url = reverse("admin:library_app_bookissue_changelist")
+        for state, count in [
+            ("overdue", 1), ("due_soon", 1), ("active", 2), ("returned", 1)]:
+            with self.subTest(state):
+                response = self.client.get(url, {"state": state})
+                self.assertEqual(response.context["cl"].result_count, count)
+
+
+class ImageVariantsWebTest(TestCase):
+    """Тесты построения уменьшенных копий обложек и фото."""
+
+    def setUp(self):
+        cache.clear()
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=self.media.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.staff = User.objects.create_user(
+            username="staff", password="pass", is_staff=True)
+        self.staff.groups.add(Group.objects.create(name="Authors"))
+
+    def media_exists(self, name):
+        return os.path.exists(os.path.join(self.media.name, name))
+
+    def process(self):
+        # Файлы хранилища удаляются после фиксации транзакции.
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("process_images", "--once", stdout=StringIO())
+
+    def test_upload_queues_task_instead_of_resizing(self):
+        author = Author.objects.create(first_name="Leo", last_name="Tolstoy")
+        self.client.force_login(self.staff)
+        self.client.post(
+            reverse("book_create"),
+            {"title": "Covered", "authors": [author.pk],
+             "cover": make_image("cover.png")},
+        )
+        book = Book.objects.get(title="Covered")
+        self.assertEqual(book.cover_variants, {})
+        self.assertTrue(
+            ImageTask.objects.filter(model="book", object_id=book.pk).exists())
+        response = self.client.get(reverse("book_detail", args=[book.pk]))
+        self.assertContains(response, f'src="{book.cover.url}"')
+
+        self.process()
+        book.refresh_from_db()
+        self.assertFalse(ImageTask.objects.exists())
+        self.assertEqual(
+            [(image["width"], image["height"])
+             for image in book.cover_variants["images"]],
+            [(160, 240), (320, 480), (640, 960)],
+        )
+        for image in book.cover_variants["images"]:
+            self.assertTrue(self.media_exists(image["jpeg"]))
+            with Image.open(os.path.join(self.media.name, image["webp"])) as webp:
+                self.assertEqual(webp.format, "WEBP")
+                self.assertEqual(webp.width, image["width"])
+        response = self.client.get(reverse("book_detail", args=[book.pk]))
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, ".webp 320w")
+
+        response = self.client.get(reverse("book-list"))
+        variants = response.json()["results"][0]["cover_variants"]
+        self.assertEqual(variants["width"], 800)
+        self.assertTrue(variants["images"][0]["webp"].startswith("http://"))
+        self.assertIn(" 640w", variants["srcset"])
+
+    def test_small_and_transparent_image(self):
+        author = Author.objects.create(
+            first_name="Leo", last_name="Tolstoy",
+            photo=make_image("photo.png", (150, 100), "RGBA"))
+        self.process()
+        author.refresh_from_db()
+        self.assertEqual(
+            [image["width"] for image in author.photo_variants["images"]],
+            [100, 150],
+        )
+
+    def test_replacing_image_removes_old_variants(self):
+        book = Book.objects.create(title="Covered", cover=make_image("a.png"))
+        self.process()
+        book.refresh_from_db()
+        old = [image["jpeg"] for image in book.cover_variants["images"]]
+        old.append(book.cover.name)
+        book.cover = make_image("b.png", color="blue")
+        with self.captureOnCommitCallbacks(execute=True):
+            book.save()
+        self.process()
+        book.refresh_from_db()
+        self.assertEqual(book.cover_variants["source"], book.cover.name)
+        self.assertFalse(any(self.media_exists(name) for name in old))
+
+        book.cover = None
+        with self.captureOnCommitCallbacks(execute=True):
+            book.save()
+        self.process()
+        book.refresh_from_db()
+        self.assertEqual(book.cover_variants, {})
+
+    def test_broken_image_fails_after_retries(self):
+        book = Book.objects.create(
+            title="Broken",
+            cover=SimpleUploadedFile("broken.png", b"not an image"))
+        with override_settings(IMAGE_TASK_MAX_ATTEMPTS=1):
+            self.process()
+        task = ImageTask.objects.get()
+        self.assertEqual(task.status, ImageTask.Status.FAILED)
+        self.assertEqual(Book.objects.get(pk=book.pk).cover_variants, {})
+
+    def test_backfill_queues_stale_images(self):
+        book = Book.objects.create(title="Covered", cover=make_image("a.png"))
+        Book.objects.create(title="No cover")
+        self.process()
+        Book.objects.filter(pk=book.pk).update(cover_variants={})
+        call_command("backfill_images", stdout=StringIO())
+        call_command("backfill_images", stdout=StringIO())
+        self.assertEqual(
+            list(ImageTask.objects.values_list("model", "object_id")),
+            [("book", book.pk)],
+        )
+        self.process()
+        self.assertTrue(Book.objects.get(pk=book.pk).cover_variants)
+
+
+class ContentAddressedStorageWebTest(TestCase):
+    """Тесты хранилища загрузок с адресацией по содержимому."""
+
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=self.media.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def media_exists(self, name):
+        return os.path.exists(os.path.join(self.media.name, name))
+
+    def test_identical_uploads_share_one_file(self):
+        first = Book.objects.create(title="First", cover=make_image("a.png"))
+        second = Book.objects.create(title="Second", cover=make_image("b.png"))
+        self.assertEqual(first.cover.name, second.cover.name)
+        self.assertTrue(is_hashed(first.cover.name))
+        self.assertEqual(StoredFile.objects.get().references, 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(self.media_exists(second.cover.name))
+        self.assertEqual(StoredFile.objects.get().references, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(self.media_exists(second.cover.name))
+        self.assertFalse(StoredFile.objects.exists())
+
+    def test_dedupe_media_folds_legacy_copies(self):
+        legacy = FileSystemStorage(location=self.media.name)
+        content = make_image("test.png").read()
+        names = [
+            legacy.save("books/covers/test.png", ContentFile(content))
+            for _ in range(2)
+        ]
+        orphan = legacy.save("books/covers/test.png", ContentFile(content))
+        books = [
+            Book.objects.create(title=f"Book {number}") for number in range(2)
+        ]
+        for book, name in zip(books, names):
+            Book.objects.filter(pk=book.pk).update(cover=name)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("dedupe_media", "--delete-orphans", stdout=StringIO())
+        covers = {Book.objects.get(pk=book.pk).cover.name for book in books}
+        self.assertEqual(len(covers), 1)
+        self.assertTrue(self.media_exists(covers.pop()))
+        self.assertEqual(StoredFile.objects.get().references, 2)
+        for name in names + [orphan]:
+            self.assertFalse(self.media_exists(name))
+        self.assertEqual(ImageTask.objects.filter(model="book").count(), 2)
+
+    @override_settings(DEBUG=True)
+    def test_hashed_media_is_cached_forever(self):
+        book = Book.objects.create(title="Covered", cover=make_image("a.png"))
+        response = serve_media(RequestFactory().get("/"), book.cover.name)
+        self.assertIn("immutable", response["Cache-Control"])
+
+        FileSystemStorage(location=self.media.name).save(
+            "books/covers/plain.png", ContentFile(b"plain"))
+        response = serve_media(
+            RequestFactory().get("/"), "books/covers/plain.png")
+        self.assertFalse(response.has_header("Cache-Control"))
+
+
+class ConditionalGetWebTest(TestCase):
+    """Тесты условных запросов к HTML-страницам каталога."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="reader", password="pass")
+        self.author = Author.objects.create(first_name="Leo", last_name="Tolstoy")
+        self.book = Book.objects.create(title="War and Peace")
+        self.book.authors.add(self.author)
+
+    def test_book_detail_revalidation(self):
+        url = reverse("book_detail", args=[self.book.pk])
+        response = self.client.get(url)
+        with self.assertNumQueries(1):
+            not_modified = self.client.get(
+                url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(not_modified.status_code, 304)
+
+        comment = Comment.objects.create(
+            book=self.book, user=self.user, text="Great")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertContains(response, "Great")
+        comment.text = "Edited"
+        comment.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertContains(response, "Edited")
+
+    def test_author_detail_follows_book_titles(self):
+        url = reverse("author_detail", args=[self.author.pk])
+        response = self.client.get(url)
+        self.book.title = "Voina i mir"
+        self.book.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertContains(response, "Voina i mir")
+
+    def test_login_changes_etag(self):
+        url = reverse("book_list")
+        response = self.client.get(url)
+        self.client.force_login(self.user)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertContains(response, "reader")
+
+
+class AsyncViewsWebTest(TestCase):
+    """Тесты асинхронных вариантов страниц каталога."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="reader", password="pass")
+        self.author = Author.objects.create(first_name="Leo", last_name="Tolstoy")
+        self.book = Book.objects.create(title="War and Peace")
+        self.book.authors.add(self.author)
+        Comment.objects.create(book=self.book, user=self.user, text="Great")
+        BookIssue.objects.create(
+            book=self.book, user=self.user, due_date="2099-12-31")
+
+    async def test_pages_match_sync_views(self):
+        await self.async_client.aforce_login(self.user)
+        pages = [
+            ("book_list", [], ["War and Peace", "Leo Tolstoy"]),
+            ("author_list", [], ["Leo Tolstoy", "Книг: 1"]),
+            ("book_detail", [self.book.pk], ["Leo Tolstoy", "reader:</strong> Great"]),
+            ("author_detail", [self.author.pk], ["War and Peace"]),
+            ("profile", [], ["War and Peace"]),
+        ]
+        for name, args, texts in pages:
+            with self.subTest(name):
+                response = await self.async_client.get(
+                    reverse(f"async_{name}", args=args))
+                for text in texts + ["Привет, reader!"]:
+                    self.assertContains(response, text)
+
+    async def test_anonymous_page_is_cached_and_revalidated(self):
+        url = reverse("async_book_detail", args=[self.book.pk])
+        response = await self.async_client.get(url)
+        self.assertContains(response, "Great")
+        not_modified = await self.async_client.get(
+            url, headers={"if-none-match": response["ETag"]})
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(
+            cache.get("catalog:stats:book_detail:misses"), 1)
+
+        await Comment.objects.acreate(
+            book=self.book, user=self.user, text="Edited")
+        response = await self.async_client.get(
+            url, headers={"if-none-match": response["ETag"]})
+        self.assertContains(response, "Edited")
+
+    async def test_profile_requires_login(self):
+        response = await self.async_client.get(reverse("async_profile"))
+        self.assertEqual(response.status_code, 302)
+
+
+@override_settings(DB_REPLICAS=["replica"], DB_REPLICA_STICKY_SECONDS=30)
+class ReplicaRoutingWebTest(TransactionTestCase):
+    """
+    Тесты чтения с реплик. Реплику изображает второе соединение с
+    тестовой базой под псевдонимом ``replica``; TransactionTestCase нужен,
+    чтобы оно видело данные, записанные через ``default``.
+    """
+
+    databases = {"default", "replica"}
+
+    @classmethod
+    def setUpClass(cls):
+        settings_dict = connection.settings_dict
+        connections.settings["replica"] = {
+            **settings_dict,
+            "TEST": {**settings_dict["TEST"], "MIRROR": "default"},
+        }
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections["replica"].close()
+        del connections["replica"]
+        del connections.settings["replica"]
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="reader", password="pass")
+        self.book = Book.objects.create(title="Dune")
+
+    def queries(self, client, method, url, data=None):
+        """Выполняет запрос и возвращает число запросов к каждой базе."""
+        with CaptureQueriesContext(connection) as primary:
+            with CaptureQueriesContext(connections["replica"]) as replica:
+                response = getattr(client, method)(url, data)
+        self.assertLess(response.status_code, 400)
+        return len(primary), len(replica)
+
+    def test_anonymous_reads_go_to_replica(self):
+        primary, replica = self.queries(
+            self.client, "get", reverse("book-list"))
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+        # Вне запросов (команды, фоновые обработчики) — основная база.
+        self.assertEqual(Book.objects.all().db, "default")
+
+    def test_comment_sticks_user_to_primary(self):
+        self.client.force_login(self.user)
+        url = reverse("book_detail", args=[self.book.pk])
+        self.assertGreater(self.queries(self.client, "get", url)[1], 0)
+
+        self.queries(
+            self.client, "post", reverse("add_comment", args=[self.book.pk]),
+            {"text": "Great"})
+        primary, replica = self.queries(self.client, "get", url)
+        self.assertEqual(replica, 0)
+        self.assertGreater(primary, 0)
+        # Другие посетители по-прежнему читают с реплики.
+        self.assertGreater(self.queries(Client(), "get", url)[1], 0)
+
+        cache.clear()  # окно истекло
+        self.assertGreater(self.queries(self.client, "get", url)[1], 0)
+
+    def test_api_rating_sticks_token_user_to_primary(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=(
+            f"Bearer {RefreshToken.for_user(self.user).access_token}"))
+        url = reverse("book-list")
+        self.assertGreater(self.queries(client, "get", url)[1], 0)
+        self.queries(
+            client, "post", reverse("rating-list"),
+            {"book": self.book.pk, "score": 5})
+        self.assertEqual(self.queries(client, "get", url)[1], 0)
+
+
+class InventoryWebTest(TransactionTestCase):
+    """
+    Тесты выдачи экземпляров под конкурентной нагрузкой. Запросы идут из
+    потоков со своими соединениями, поэтому нужен TransactionTestCase.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.book = Book.objects.create(title="Dune", copies=5)
+        self.users = User.objects.bulk_create(
+            User(username=f"reader{i}", email=f"reader{i}@example.com")
+            for i in range(40)
+        )
+
+    def rent(self, user, book=None):
+        client = Client()
+        client.force_login(user)
+        try:
+            return client.post(
+                reverse("book_issue_create", args=[(book or self.book).pk]),
+                {"rental_period": 7},
+            )
+        finally:
+            connection.close()
+
+    def test_concurrent_rentals_never_oversell(self):
+        with ThreadPoolExecutor(20) as executor:
+            responses = list(executor.map(self.rent, self.users))
+        self.assertTrue(all(r.status_code == 302 for r in responses))
+
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.available_copies, 0)
+        self.assertEqual(self.book.active_issue_count, 5)
+        self.assertEqual(BookIssue.objects.count(), 5)
+        self.assertEqual(
+            BookHold.objects.filter(status=BookHold.Status.WAITING).count(), 35)
+        self.assertEqual(OutboxEmail.objects.count(), 5)
+
+    def test_rental_locks_only_the_book_row(self):
+        other = Book.objects.create(title="Emma")
+        # Общий автор: его статистика не должна блокироваться выдачей.
+        author = Author.objects.create(first_name="Jane", last_name="Austen")
+        author.books.add(self.book, other)
+        reserved = threading.Event()
+        release = threading.Event()
+
+        def rent_and_wait():
+            try:
+                with transaction.atomic():
+                    checkout(new_issue(self.book, self.users[0], 7))
+                    reserved.set()
+                    release.wait(10)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=rent_and_wait)
+        thread.start()
+        try:
+            self.assertTrue(reserved.wait(10))
+            # Пока выдача первой книги не завершена, другая выдаётся без
+            # ожидания: блокировка не шире строки книги.
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    cursor.execute("SET LOCAL lock_timeout = '2s'")
+                self.assertIsNone(checkout(new_issue(other, self.users[1], 7)))
+        finally:
+            release.set()
+            thread.join()
+        self.assertEqual(BookIssue.objects.count(), 2)
+        self.assertEqual(
+            AuthorStats.objects.get(author=author).issue_count, 2)
+
+    def test_return_passes_copy_to_first_in_queue(self):
+        Book.objects.filter(pk=self.book.pk).update(copies=1)
+        first, second, third = self.users[:3]
+        self.assertRedirects(self.rent(first), reverse("profile"))
+        response = self.rent(second)
+        self.assertRedirects(
+            response, reverse("book_detail", args=[self.book.pk]))
+        self.rent(third)
+        self.rent(second)  # повторный запрос не ставит в очередь второй раз
+        self.assertEqual(
+            list(BookHold.objects.order_by("pk").values_list("user", flat=True)),
+            [second.pk, third.pk],
+        )
+
+        client = APIClient()
+        client.force_authenticate(first)
+        issue = BookIssue.objects.get(user=first)
+        url = reverse("issues-return-book", args=[issue.pk])
+        self.assertEqual(client.post(url).status_code, 200)
+        self.assertEqual(client.post(url).status_code, 400)
+
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.available_copies, 0)
+        hold = BookHold.objects.get(user=second)
+        self.assertEqual(hold.status, BookHold.Status.FULFILLED)
+        self.assertEqual(hold.issue.user, second)
+        self.assertIsNone(hold.issue.return_date)
+        self.assertEqual(
+            BookHold.objects.get(user=third).status, BookHold.Status.WAITING)
+        self.assertEqual(
+            OutboxEmail.objects.filter(recipients=[second.email]).count(), 1)
+
+    def test_anonymous_book_page_shows_current_availability(self):
+        Book.objects.filter(pk=self.book.pk).update(copies=1)
+        url = reverse("book_detail", args=[self.book.pk])
+        self.assertContains(self.client.get(url), "1 из 1")
+        self.rent(self.users[0])
+        self.assertContains(self.client.get(url), "0 из 1")
+        issue = BookIssue.objects.get()
+        client = APIClient()
+        client.force_authenticate(self.users[0])
+        client.post(reverse("issues-return-book", args=[issue.pk]))
+        self.assertContains(self.client.get(url), "1 из 1")
+
+    def test_update_cannot_move_or_reopen_issue(self):
+        Book.objects.filter(pk=self.book.pk).update(copies=1)
+        other = Book.objects.create(title="Emma", copies=1)
+        reader = self.users[0]
+        self.rent(reader)
+        issue = BookIssue.objects.get(user=reader)
+        client = APIClient()
+        client.force_authenticate(reader)
+        url = reverse("issues-detail", args=[issue.pk])
+        self.assertEqual(client.post(
+            reverse("issues-return-book", args=[issue.pk])).status_code, 200)
+        self.rent(self.users[1])
+
+        response = client.patch(url, {"return_date": None}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("return_date", response.data)
+        response = client.patch(url, {"book_id": other.pk}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("book_id", response.data)
+        response = client.patch(
+            url, {"due_date": "2030-01-01"}, format="json")
+        self.assertEqual(response.status_code, 200)
+
+        self.book.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(self.book.available_copies, 0)
+        self.assertEqual(other.available_copies, 1)
+
+
+class RoleCacheWebTest(TestCase):
+    """Тесты кэша групп и прав пользователя."""
+
+    def setUp(self):
+        cache.clear()
+        forget_group_ids()
+        self.authors = Group.objects.create(name="Authors")
+        self.user = User.objects.create_user(username="writer", password="pass")
+        self.user.groups.add(self.authors)
+        self.client.force_login(self.user)
+
+    def group_queries(self, method, url, data=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, data)
+        return response, [
+            query["sql"] for query in queries if '"auth_group"' in query["sql"]]
+
+    def test_author_check_reads_cached_roles(self):
+        url = reverse("book_create")
+        response, queries = self.group_queries("get", url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(queries)
+        response, queries = self.group_queries("get", url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(queries, [])
+
+        self.user.groups.remove(self.authors)
+        self.assertRedirects(self.client.get(url), reverse("book_list"))
+
+    def test_new_visitors_reuse_group_id(self):
+        self.client.logout()
+        self.client.post(reverse("visitor_login"), {"username": "anna"})
+        response, queries = self.group_queries(
+            "post", reverse("visitor_login"), {"username": "boris"})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(queries, [])
+        visitors = Group.objects.get(name="Visitors")
+        self.assertEqual(
+            set(visitors.user_set.values_list("username", flat=True)),
+            {"anna", "boris"},
+        )
+
+
+class SessionHousekeepingWebTest(TestCase):
+    """Тесты кэша сессий и очистки сессий и посетителей."""
+
+    def setUp(self):
+        forget_group_ids()
+
+    def session_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [
+            query["sql"] for query in queries
+            if '"django_session"' in query["sql"]
+        ]
+
+    @override_settings(
+        SESSION_ENGINE="django.contrib.sessions.backends.cached_db")
+    def test_session_is_read_from_cache(self):
+        user = User.objects.create_user(username="reader", password="pass")
+        self.client.force_login(user)
+        self.assertEqual(self.session_queries(reverse("book_list")), [])
+        self.assertTrue(Session.objects.filter(
+            pk=self.client.session.session_key).exists())
+
+    def test_sessions_are_in_database_without_shared_cache(self):
+        user = User.objects.create_user(username="reader", password="pass")
+        self.client.force_login(user)
+        Session.objects.all().delete()
+        # Удалённая в другом воркере сессия больше не действует.
+        response = self.client.get(reverse("profile"))
+        self.assertEqual(response.status_code, 302)
+        with override_settings(
+            SESSION_ENGINE="django.contrib.sessions.backends.cached_db"
+        ):
+            self.assertEqual(
+                [warning.id for warning in check_cached_sessions(None)],
+                ["library_app.W001"],
+            )
+        self.assertEqual(check_cached_sessions(None), [])
+
+    def test_session_cache_timeout_is_capped(self):
+        sessions = caches["sessions"]
+        self.assertLessEqual(
+            sessions.get_backend_timeout(14 * 24 * 3600),
+            time.time() + sessions.default_timeout,
+        )
+        self.assertLessEqual(
+            sessions.get_backend_timeout(None),
+            time.time() + sessions.default_timeout,
+        )
+
+    def test_purge_expired_sessions(self):
+        now = timezone.now()
+        for i in range(5):
+            Session.objects.create(
+                session_key=f"expired{i}", session_data="",
+                expire_date=now - timezone.timedelta(minutes=1))
+        Session.objects.create(
+            session_key="active", session_data="",
+            expire_date=now + timezone.timedelta(days=1))
+        out = StringIO()
+        call_command(
+            "purge_sessions", once=True, chunk_size=2, stdout=out)
+        self.assertEqual(
+            list(Session.objects.values_list("session_key", flat=True)),
+            ["active"],
+        )
+        self.assertIn("Удалено сессий: 5, посетителей: 0.", out.getvalue())
+
+    def test_purge_abandoned_visitors(self):
+        for username in ("anna", "boris", "vera", "gleb"):
+            self.client.post(reverse("visitor_login"), {"username": username})
+        User.objects.create_user(username="reader", password="pass")
+        User.objects.update(last_login=timezone.now() - timezone.timedelta(days=60))
+        User.objects.filter(username="gleb").update(last_login=timezone.now())
+        Comment.objects.create(
+            book=Book.objects.create(title="Book"),
+            user=User.objects.get(username="vera"),
+            text="Text",
+        )
+        out = StringIO()
+        call_command(
+            "purge_sessions", once=True, chunk_size=1, stdout=out)
+        self.assertEqual(
+            set(User.objects.values_list("username", flat=True)),
+            {"vera", "gleb", "reader"},
+        )
+        self.assertIn("посетителей: 2.", out.getvalue())
+
+
+class BookCommentsWebTest(TestCase):
+    """Тесты постраничной загрузки комментариев на странице книги."""
+
+    def setUp(self):
+        cache.clear()
+        self.book = Book.objects.create(title="Book")
+        other = Book.objects.create(title="Other")
+        users = [
+            User.objects.create_user(username=f"reader{i}", password="pass")
+            for i in range(3)
+        ]
+        self.comments = [
+            Comment.objects.create(
+                book=self.book, user=users[i % 3], text=f"Comment {i}")
+            for i in range(25)
+        ]
+        Comment.objects.create(book=other, user=users[0], text="Elsewhere")
+
+    def test_detail_renders_first_page(self):
+        url = reverse("book_detail", args=[self.book.pk])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(len(queries), 4)
+        shown = response.context["comments"]
+        self.assertEqual(
+            [comment.pk for comment in shown],
+            [comment.pk for comment in reversed(self.comments)][:20],
+        )
+        self.assertContains(response, 'id="comments-more"')
+
+        response = self.client.get(response.context["comments_next"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [comment["id"] for comment in response.data["results"]],
+            [comment.pk for comment in reversed(self.comments)][20:],
+        )
+        self.assertIsNone(response.data["next"])
+
+    def test_async_detail_renders_first_page(self):
+        response = self.client.get(
+            reverse("async_book_detail", args=[self.book.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["comments"]), 20)
+        self.assertTrue(response.context["comments_next"])
+
+    def test_api_filters_by_book(self):
+        response = self.client.get(
+            reverse("comment-list"), {"book": self.book.pk, "page_size": 100})
+        self.assertEqual(len(response.data["results"]), 25)
+        self.assertNotIn(
+            "Elsewhere",
+            [comment["text"] for comment in response.data["results"]],
+        )
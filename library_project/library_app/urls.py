@@ -4,12 +4,15 @@ from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import (TokenObtainPairView,
                                             TokenRefreshView)
 
+from . import async_views
 from .views import (AuthorViewSet, BookIssueViewSet, BookViewSet,
-                    CommentViewSet, RatingViewSet, RegisterPageView,
-                    RegisterView, UserViewSet, add_comment, author_create,
-                    author_delete, author_detail, author_edit, author_list,
-                    book_create, book_delete, book_detail, book_edit,
-                    book_issue_create, book_list, profile, visitor_login)
+                    CacheStatsView, CatalogExportView, CommentViewSet,
+                    DatabaseStatsView, RatingViewSet, RegisterPageView,
+                    RegisterView, TokenRevokeView, UserViewSet, add_comment,
+                    author_create, author_delete, author_detail, author_edit,
+                    author_list, book_create, book_delete, book_detail,
+                    book_edit, book_issue_create, book_list, profile,
+                    visitor_login)
 
 router = DefaultRouter()
 router.register("authors", AuthorViewSet)
@@ -50,5 +53,37 @@ urlpatterns = [
     path("books/<int:book_id>/add-comment/", add_comment, name="add_comment"),
     path("token/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
     path("token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
+    path("token/revoke/", TokenRevokeView.as_view(), name="token_revoke"),
+    path("cache-stats/", CacheStatsView.as_view(), name="cache_stats"),
+    path("db-stats/", DatabaseStatsView.as_view(), name="db_stats"),
+    path(
+        "export/<slug:resource>.<slug:export_format>",
+        CatalogExportView.as_view(),
+        name="catalog_export",
+    ),
+    # Асинхронные варианты страниц и API чтения (для запуска под ASGI).
+    path("async/books-list/", async_views.book_list, name="async_book_list"),
+    path(
+        "async/authors-list/", async_views.author_list,
+        name="async_author_list"),
+    path(
+        "async/books-list/<int:pk>/", async_views.book_detail,
+        name="async_book_detail"),
+    path(
+        "async/authors-list/<int:pk>/", async_views.author_detail,
+        name="async_author_detail"),
+    path("async/profile/", async_views.profile, name="async_profile"),
+    path(
+        "async/books/", async_views.api_list, {"viewset": BookViewSet},
+        name="async_api_book_list"),
+    path(
+        "async/books/<int:pk>/", async_views.api_detail,
+        {"viewset": BookViewSet}, name="async_api_book_detail"),
+    path(
+        "async/authors/", async_views.api_list, {"viewset": AuthorViewSet},
+        name="async_api_author_list"),
+    path(
+        "async/authors/<int:pk>/", async_views.api_detail,
+        {"viewset": AuthorViewSet}, name="async_api_author_detail"),
     path("", include(router.urls)),
 ]
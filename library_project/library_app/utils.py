@@ -1,12 +1,42 @@
-from django.core.mail import send_mail
+from .outbox import queue_email
 
 
-def send_rental_confirmation_email(user, book, due_date):
-    """Отправляет пользователю подтверждение аренды книги на электронную почту."""
+def queue_rental_confirmation_email(user, book, due_date):
+    """
+    Ставит в очередь подтверждение аренды книги на электронную почту.
+
+    Письмо отправляет фоновый обработчик ``manage.py send_outbox``.
+    """
+    if not user.email:
+        return None
     subject = "Подтверждение аренды книги"
     message = (
         f"Здравствуйте, {user.username}!\n\n"
         f'Вы взяли в аренду книгу "{book.title}". '
         f"Пожалуйста, верните её до {due_date}."
     )
-    send_mail(subject, message, None, [user.email])
+    return queue_email(subject, message, [user.email])
+
+
+def queue_reminder_email(user, overdue, due_soon):
+    """
+    Ставит в очередь одно письмо со всеми напоминаниями пользователя.
+
+    ``overdue`` и ``due_soon`` — выдачи с истёкшим и подходящим сроком
+    возврата.
+    """
+    if not user.email:
+        return None
+    lines = [f"Здравствуйте, {user.username}!"]
+    for title, issues in (
+        ("Срок возврата истёк:", overdue),
+        ("Скоро нужно вернуть:", due_soon),
+    ):
+        if issues:
+            lines.append("")
+            lines.append(title)
+            lines.extend(
+                f'- "{issue.book.title}" — до {issue.due_date}' for issue in issues)
+    subject = (
+        "Просрочен возврат книг" if overdue else "Скоро срок возврата книг")
+    return queue_email(subject, "\n".join(lines), [user.email])
@@ -1,24 +1,47 @@
+from datetime import datetime, time
+
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import get_user_model, login
 from django.contrib.auth.decorators import login_required, user_passes_test
-from django.contrib.auth.models import Group
-from django.db.models import Q
+from django.db import IntegrityError, transaction
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from django.views.decorators.http import require_POST
+from django.views.static import serve
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import filters, generics, permissions, status, viewsets
+from rest_framework import generics, permissions, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied, ValidationError
 from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
-
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from . import db_metrics
+from .authentication import LibraryRefreshToken, revoke_token
+from .bulk import BulkCreateMixin
+from .caching import CachedListMixin, cache_anonymous_page, get_stats
+from .conditional import ConditionalGetMixin, conditional_page
+from .eager_loading import EagerLoadingMixin
+from .exports import EXPORTS, FORMATS, stream_export
+from .filters import RankedSearchFilter
 from .forms import AuthorForm, BookForm
-from .models import Author, Book, BookIssue, Comment, Rating
+from .inventory import checkout, hold_position, new_issue, return_issue
+from .models import Author, AuthorStats, Book, BookIssue, Comment, Rating
+from .pagination import KeysetPagination
 from .permissions import IsAdminOrReadOnly, IsOwnerOrAdmin, IsOwnerOrReadOnly
+from .ratings import upsert_rating
+from .roles import VISITORS, group_id, is_admin, is_author
+from .search import search_authors, search_books
 from .serializers import (AuthorSerializer, BookIssueSerializer,
                           BookSerializer, CommentSerializer, RatingSerializer,
                           RegisterSerializer, UserSerializer)
-from .utils import send_rental_confirmation_email
+from .storage import is_hashed
 
 User = get_user_model()
 
@@ -36,8 +59,7 @@ def visitor_login(request):
 
         user, created = User.objects.get_or_create(username=username)
         if created:
-            visitors_group, _ = Group.objects.get_or_create(name="Visitors")
-            user.groups.add(visitors_group)
+            user.groups.add(group_id(VISITORS))
             user.set_unusable_password()
             user.save()
 
@@ -73,88 +95,193 @@ class RegisterPageView(APIView):
         )
 
 
-class UserViewSet(viewsets.ReadOnlyModelViewSet):
+class UserViewSet(EagerLoadingMixin, viewsets.ReadOnlyModelViewSet):
     """Вьюсет для просмотра пользователей."""
 
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [IsAdminUser]
+    ordering_fields = ["username", "id"]
+    ordering = "id"
 
 
-class AuthorViewSet(viewsets.ModelViewSet):
+class AuthorViewSet(ConditionalGetMixin, CachedListMixin, EagerLoadingMixin,
+                    viewsets.ModelViewSet):
     """Вьюсет для CRUD операций с авторами."""
 
     queryset = Author.objects.all()
     serializer_class = AuthorSerializer
     permission_classes = [IsAdminOrReadOnly]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
+    filter_backends = [DjangoFilterBackend, RankedSearchFilter]
     filterset_fields = ["first_name", "last_name", "birth_date"]
-    search_fields = ["first_name", "last_name"]
+    search_function = staticmethod(search_authors)
+    cache_section = "api_authors"
+    cache_namespaces = ["authors"]
+    version_dependencies = [AuthorStats.objects.all()]
+    ordering_fields = ["last_name", "first_name", "id"]
+    ordering = "last_name"
 
 
-class BookViewSet(viewsets.ModelViewSet):
+class BookViewSet(BulkCreateMixin, ConditionalGetMixin, CachedListMixin,
+                  EagerLoadingMixin, viewsets.ModelViewSet):
     """Вьюсет для CRUD операций с книгами."""
 
-    queryset = Book.objects.all().prefetch_related("authors")
+    queryset = Book.objects.all()
     serializer_class = BookSerializer
     permission_classes = [IsAdminOrReadOnly]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
+    filter_backends = [DjangoFilterBackend, RankedSearchFilter]
     filterset_fields = [
         "genre",
         "published_date",
         "authors__first_name",
         "authors__last_name",
     ]
-    search_fields = ["title", "genre",
-                     "authors__first_name", "authors__last_name"]
+    search_function = staticmethod(search_books)
+    cache_section = "api_books"
+    cache_namespaces = ["books"]
+    version_dependencies = [AuthorStats.objects.all()]
+    ordering_fields = ["title", "id"]
+    ordering = "title"
 
 
-class BookIssueViewSet(viewsets.ModelViewSet):
+class BookIssueViewSet(BulkCreateMixin, ConditionalGetMixin,
+                       EagerLoadingMixin, viewsets.ModelViewSet):
     """Вьюсет для управления выдачами книг."""
 
+    queryset = BookIssue.objects.all()
     serializer_class = BookIssueSerializer
     permission_classes = [IsAuthenticated, IsOwnerOrAdmin]
+    version_dependencies = [Book.objects.all(), AuthorStats.objects.all()]
+    ordering_fields = ["issue_date", "due_date", "id"]
+    ordering = "-issue_date"
 
     def get_queryset(self):
+        queryset = super().get_queryset()
         user = self.request.user
-        if user.is_staff:
-            return BookIssue.objects.all()
-        return BookIssue.objects.filter(user=user)
+        if is_admin(user):
+            return queryset
+        return queryset.filter(user_id=user.pk)
+
+    def create(self, request, *args, **kwargs):
+        """
+        Выдаёт книгу, если есть свободный экземпляр; иначе ставит
+        пользователя в очередь и отвечает 202 с его местом в ней.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        issue = BookIssue(**{**serializer.validated_data, "user": request.user})
+        hold = checkout(issue)
+        if hold is not None:
+            return Response(
+                {
+                    "detail": "Все экземпляры книги выданы, вы в очереди.",
+                    "hold_id": hold.pk,
+                    "position": hold_position(hold),
+                },
+                status=status.HTTP_202_ACCEPTED,
+            )
+        serializer.instance = issue
+        return Response(
+            serializer.data,
+            status=status.HTTP_201_CREATED,
+            headers=self.get_success_headers(serializer.data),
+        )
 
-    def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+    def perform_update(self, serializer):
+        """
+        Книгу и дату возврата выдачи изменить нельзя: иначе экземпляр
+        занимался бы или освобождался мимо проверки наличия. Другая книга
+        выдаётся через POST /api/issues/, возврат — через action ``return``.
+        """
+        issue = serializer.instance
+        errors = {
+            field: "Нельзя изменить у существующей выдачи."
+            for name, field in (("book", "book_id"),
+                                ("return_date", "return_date"))
+            if name in serializer.validated_data
+            and serializer.validated_data[name] != getattr(issue, name)
+        }
+        if errors:
+            raise ValidationError(errors)
+        serializer.save()
+
+    @action(detail=True, methods=["post"], url_path="return")
+    def return_book(self, request, pk=None):
+        """Возврат книги; экземпляр сразу получает первый в очереди."""
+        issue = self.get_object()
+        if not return_issue(issue):
+            raise ValidationError({"detail": "Книга уже возвращена."})
+        issue.refresh_from_db()
+        return Response(self.get_serializer(issue).data)
+
+    def perform_bulk_create(self, model, validated):
+        """
+        Каждый элемент проходит обычную выдачу (``inventory.checkout``) с
+        проверкой свободного экземпляра и письмом о выдаче; без свободного
+        экземпляра пользователь встаёт в очередь (см. ``get_bulk_extra``).
+        """
+        issues = []
+        self.bulk_holds = []
+        for position, attrs in enumerate(validated):
+            issue = BookIssue(**{**attrs, "user": self.request.user})
+            hold = checkout(issue)
+            if hold is None:
+                issues.append(issue)
+            else:
+                self.bulk_holds.append((position, hold))
+        return issues
+
+    def get_bulk_extra(self, indexes):
+        return {
+            "held": [
+                {
+                    "index": indexes[position],
+                    "hold_id": hold.pk,
+                    "position": hold_position(hold),
+                }
+                for position, hold in self.bulk_holds
+            ]
+        }
+
+
+def book_list_sources(request):
+    books = Book.objects.all()
+    query = request.GET.get("search", "").strip()
+    if query:
+        books = search_books(books, query)
+    return books, [Author.objects.all()]
 
 
+@conditional_page(book_list_sources, lambda: ["books"])
+@cache_anonymous_page("book_list", lambda: ["books"])
 def book_list(request):
     """Веб-вью для отображения списка книг с поддержкой поиска."""
-    query = request.GET.get("search", "")
+    query = request.GET.get("search", "").strip()
+    books = Book.objects.prefetch_related("authors")
     if query:
-        books = (
-            Book.objects.filter(
-                Q(title__icontains=query)
-                | Q(authors__first_name__icontains=query)
-                | Q(authors__last_name__icontains=query)
-            )
-            .distinct()
-            .prefetch_related("authors")
-        )
-    else:
-        books = Book.objects.all().prefetch_related("authors")
+        books = search_books(books, query)
     return render(
         request, "library_app/book_list.html", {
             "books": books, "search": query}
     )
 
 
+def author_list_sources(request):
+    authors = Author.objects.all()
+    query = request.GET.get("search", "").strip()
+    if query:
+        authors = search_authors(authors, query)
+    return authors, [AuthorStats.objects.all()]
+
+
+@conditional_page(author_list_sources, lambda: ["authors"])
+@cache_anonymous_page("author_list", lambda: ["authors"])
 def author_list(request):
     """Веб-вью для отображения списка авторов с поддержкой поиска."""
-    query = request.GET.get("search", "")
+    query = request.GET.get("search", "").strip()
+    authors = Author.objects.select_related("stats")
     if query:
-        authors = Author.objects.filter(
-            Q(first_name__icontains=query) | Q(last_name__icontains=query)
-        ).distinct()
-    else:
-        authors = Author.objects.all()
+        authors = search_authors(authors, query)
     return render(
         request, "library_app/author_list.html", {
             "authors": authors, "search": query}
@@ -166,30 +293,67 @@ def index(request):
     return render(request, "library_app/index.html")
 
 
+def book_detail_sources(request, pk):
+    return Book.objects.filter(pk=pk), [Comment.objects.filter(book=pk)]
+
+
+# Комментариев на странице книги; следующие загружаются из API.
+COMMENT_PAGE_SIZE = 20
+
+
+def comment_page(book_id):
+    """
+    Пагинатор и queryset первой страницы комментариев книги, новые сверху.
+    Продолжение — ``paginator.get_next_link()``, адрес
+    /api/comments/?book=<id> с курсором (см. CommentViewSet).
+    """
+    paginator = KeysetPagination()
+    url = "{}?book={}&page_size={}".format(
+        reverse("comment-list"), book_id, COMMENT_PAGE_SIZE)
+    queryset = paginator.first_page_queryset(
+        Comment.objects.filter(book_id=book_id).select_related("user"),
+        url,
+        CommentViewSet,
+        COMMENT_PAGE_SIZE,
+    )
+    return paginator, queryset
+
+
+@conditional_page(book_detail_sources)
+@cache_anonymous_page("book_detail", lambda pk: [f"book:{pk}"])
 def book_detail(request, pk):
     """Веб-вью для отображения деталей книги, среднего рейтинга и комментариев."""
     book = get_object_or_404(Book, pk=pk)
-    average_rating = book.average_rating if hasattr(
-        book, "average_rating") else None
-    comments = book.comments.all()
+    average_rating = book.average_rating if book.rating_count else None
+    paginator, comments = comment_page(book.pk)
+    comments = paginator.set_page(list(comments))
     return render(
         request,
         "library_app/book_detail.html",
-        {"book": book, "average_rating": average_rating, "comments": comments},
+        {
+            "book": book,
+            "average_rating": average_rating,
+            "comments": comments,
+            "comments_next": paginator.get_next_link(),
+        },
+    )
+
+
+def author_detail_sources(request, pk):
+    return (
+        Author.objects.filter(pk=pk),
+        [AuthorStats.objects.filter(author=pk), Book.objects.filter(authors=pk)],
     )
 
 
+@conditional_page(author_detail_sources)
+@cache_anonymous_page("author_detail", lambda pk: [f"author:{pk}"])
 def author_detail(request, pk):
     """Веб-вью для отображения деталей автора."""
-    author = get_object_or_404(Author, pk=pk)
+    author = get_object_or_404(Author.objects.select_related("stats"), pk=pk)
     return render(request, "library_app/author_detail.html", {"author": author})
 
 
-def is_author(user):
-    """Проверяет, принадлежит ли пользователь группе 'Authors'."""
-    return user.groups.filter(name="Authors").exists()
-
-
 @login_required
 def book_create(request):
     """Веб-вью для создания новой книги."""
@@ -256,11 +420,6 @@ def author_edit(request, pk):
     return render(request, "library_app/author_form.html", {"form": form})
 
 
-def is_admin(user):
-    """Проверяет, является ли пользователь администратором."""
-    return user.is_staff
-
-
 @login_required
 @user_passes_test(is_admin)
 def book_delete(request, pk):
@@ -289,28 +448,162 @@ def author_delete(request, pk):
     return render(request, "library_app/author_confirm_delete.html", {"author": author})
 
 
-class CommentViewSet(viewsets.ModelViewSet):
+class CommentViewSet(ConditionalGetMixin, CachedListMixin, EagerLoadingMixin,
+                     viewsets.ModelViewSet):
     """API-вьюсет для комментариев."""
 
     queryset = Comment.objects.all()
     serializer_class = CommentSerializer
     permission_classes = [
         permissions.IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly]
+    filterset_fields = ["book"]
+    ordering_fields = ["created_at", "id"]
+    ordering = "-created_at"
+    cache_section = "api_comments"
+    cache_namespaces = ["comments"]
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
 
-class RatingViewSet(viewsets.ModelViewSet):
+class RatingViewSet(BulkCreateMixin, ConditionalGetMixin, CachedListMixin,
+                    EagerLoadingMixin, viewsets.ModelViewSet):
     """API-вьюсет для рейтингов."""
 
     queryset = Rating.objects.all()
     serializer_class = RatingSerializer
     permission_classes = [
         permissions.IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly]
+    ordering_fields = ["created_at", "id"]
+    ordering = "-created_at"
+    cache_section = "api_ratings"
+    cache_namespaces = ["ratings"]
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        try:
+            with transaction.atomic():
+                serializer.save(user=self.request.user)
+        except IntegrityError:
+            # Параллельный запрос успел оценить книгу после проверки.
+            raise ValidationError({"detail": "Вы уже оценили эту книгу."})
+
+    @action(detail=False, methods=["put"], url_path="upsert")
+    def upsert(self, request):
+        """
+        Создаёт оценку или заменяет прежнюю оценку книги пользователем;
+        ``created`` в ответе показывает, что произошло.
+        """
+        serializer = self.get_serializer(
+            data=request.data,
+            context={**self.get_serializer_context(), "upsert": True},
+        )
+        serializer.is_valid(raise_exception=True)
+        rating, created = upsert_rating(
+            request.user,
+            serializer.validated_data["book"],
+            serializer.validated_data["score"],
+            serializer.validated_data.get("review"),
+        )
+        return Response(
+            {**self.get_serializer(rating).data, "created": created},
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
+        )
+
+    def get_bulk_save_kwargs(self):
+        return {"user": self.request.user}
+
+    def get_bulk_context(self, items, preloaded):
+        rated = Rating.objects.filter(
+            user=self.request.user, book_id__in=preloaded["book"]
+        ).values_list("book_id", flat=True)
+        return {"rated_book_ids": set(rated)}
+
+
+class CacheStatsView(APIView):
+    """API-вью со счётчиками попаданий и промахов кэша каталога."""
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(get_stats())
+
+
+class DatabaseStatsView(APIView):
+    """API-вью с метриками соединений с БД и пула."""
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(db_metrics.get_stats())
+
+
+class TokenRevokeView(APIView):
+    """
+    Отзывает access-токен запроса и, если передан, refresh-токен: они
+    отклоняются до истечения срока.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        refresh = request.data.get("refresh")
+        if refresh:
+            try:
+                refresh = LibraryRefreshToken(refresh)
+            except TokenError as error:
+                raise ValidationError({"refresh": str(error)})
+            if refresh[jwt_settings.USER_ID_CLAIM] != str(request.user.pk):
+                raise PermissionDenied("Чужой токен.")
+            revoke_token(refresh)
+        if request.auth is not None:
+            revoke_token(request.auth)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class CatalogExportView(APIView):
+    """
+    Потоковая выгрузка каталога в CSV или NDJSON.
+
+    Строки отправляются по мере чтения из БД, параметр ``updated_since``
+    (дата или дата и время ISO 8601) оставляет только изменённые записи.
+    """
+
+    permission_classes = [AllowAny]
+    chunk_size = 2000
+
+    def get(self, request, resource, export_format):
+        export = EXPORTS.get(resource)
+        if export is None or export_format not in FORMATS:
+            raise Http404
+        if export.staff_only and not is_admin(request.user):
+            raise PermissionDenied
+        updated_since = self.get_updated_since(request)
+        response = StreamingHttpResponse(
+            stream_export(export, export_format, updated_since, self.chunk_size),
+            content_type=FORMATS[export_format][1],
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="{resource}.{export_format}"')
+        return response
+
+    @staticmethod
+    def get_updated_since(request):
+        value = request.query_params.get("updated_since")
+        if not value:
+            return None
+        try:
+            parsed = parse_datetime(value)
+            if parsed is None:
+                day = parse_date(value)
+                parsed = datetime.combine(day, time.min) if day else None
+        except ValueError:
+            parsed = None
+        if parsed is None:
+            raise ValidationError(
+                {"updated_since": "Ожидается дата или дата и время ISO 8601."})
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        return parsed
 
 
 @login_required
@@ -330,18 +623,37 @@ def book_issue_create(request, book_id):
     """Веб-вью для создания записи о выдаче книги (аренде)."""
     book = get_object_or_404(Book, id=book_id)
     rental_period = int(request.POST.get("rental_period", 14))
-    due_date = timezone.now().date() + timezone.timedelta(days=rental_period)
-    BookIssue.objects.create(
-        book=book, user=request.user, due_date=due_date, rental_period=rental_period
-    )
-    send_rental_confirmation_email(request.user, book, due_date)
+    issue = new_issue(book, request.user, rental_period)
+    hold = checkout(issue)
+    if hold is not None:
+        messages.info(
+            request,
+            f'Все экземпляры книги "{book.title}" выданы. Вы в очереди под '
+            f"номером {hold_position(hold)}: книга будет выдана вам, как "
+            "только её вернут.",
+        )
+        return redirect("book_detail", pk=book.pk)
     messages.success(
-        request, f'Вы арендовали книгу "{book.title}" до {due_date}.')
+        request, f'Вы арендовали книгу "{book.title}" до {issue.due_date}.')
     return redirect("profile")
 
 
 @login_required
 def profile(request):
     """Веб-вью для отображения личного кабинета пользователя с активными арендованными книгами."""
-    active_issues = request.user.issued_books.filter(return_date__isnull=True)
+    active_issues = request.user.issued_books.filter(
+        return_date__isnull=True).select_related("book")
     return render(request, "library_app/profile.html", {"active_issues": active_issues})
+
+
+def serve_media(request, path):
+    """
+    Отдаёт загруженные файлы при разработке.
+
+    Имя файла с адресацией по содержимому не меняет смысл, поэтому такие
+    файлы кэшируются браузером и прокси без срока.
+    """
+    response = serve(request, path, document_root=settings.MEDIA_ROOT)
+    if is_hashed(path):
+        response["Cache-Control"] = "public, max-age=31536000, immutable"
+    return response
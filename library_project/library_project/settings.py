@@ -1,3 +1,4 @@
+import copy
 import os
 from datetime import timedelta
 from pathlib import Path
@@ -15,6 +16,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "rest_framework",
     "rest_framework_simplejwt",
     "drf_yasg",
@@ -30,6 +32,7 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "library_app.replicas.ReplicaMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -64,6 +67,106 @@ DATABASES = {
     }
 }
 
+# Соединения с БД: DB_POOL_MODE = persistent | pool | pgbouncer | off.
+#   persistent — соединение процесса живёт DB_CONN_MAX_AGE секунд и
+#                проверяется перед повторным использованием;
+#   pool       — пул psycopg 3 (нужен пакет psycopg[pool]) размером от
+#                DB_POOL_MIN_SIZE до DB_POOL_MAX_SIZE, запрос ждёт свободное
+#                соединение не дольше DB_POOL_TIMEOUT секунд;
+#   pgbouncer  — для PgBouncer в режиме transaction: без серверных курсоров
+#                и подготовленных запросов, которые живут дольше транзакции;
+#   off        — новое соединение на каждый запрос.
+DB_POOL_MODE = os.getenv("DB_POOL_MODE", "persistent")
+DB_CONN_MAX_AGE = int(os.getenv("DB_CONN_MAX_AGE", "60"))
+if DB_POOL_MODE == "pool":
+    DATABASES["default"]["OPTIONS"] = {
+        "pool": {
+            "min_size": int(os.getenv("DB_POOL_MIN_SIZE", "2")),
+            "max_size": int(os.getenv("DB_POOL_MAX_SIZE", "10")),
+            "timeout": float(os.getenv("DB_POOL_TIMEOUT", "10")),
+        }
+    }
+elif DB_POOL_MODE in ("persistent", "pgbouncer"):
+    DATABASES["default"]["CONN_MAX_AGE"] = DB_CONN_MAX_AGE
+if DB_POOL_MODE != "off":
+    # Для пула — проверка соединения при выдаче из пула.
+    DATABASES["default"]["CONN_HEALTH_CHECKS"] = True
+if DB_POOL_MODE == "pgbouncer":
+    # Подготовленные запросы Django по умолчанию не использует.
+    DATABASES["default"]["DISABLE_SERVER_SIDE_CURSORS"] = True
+
+# Реплики только для чтения: DB_REPLICA_HOSTS=host1,host2:5433. Остальные
+# параметры соединения берутся у основной базы. После записи пользователь
+# DB_REPLICA_STICKY_SECONDS секунд читает с основной базы (см. replicas.py).
+DB_REPLICAS = []
+for index, replica in enumerate(
+        filter(None, os.getenv("DB_REPLICA_HOSTS", "").split(",")), 1):
+    host, _, port = replica.strip().partition(":")
+    alias = f"replica_{index}"
+    DATABASES[alias] = {
+        **copy.deepcopy(DATABASES["default"]),
+        "HOST": host,
+        "PORT": port or DATABASES["default"]["PORT"],
+        "TEST": {"MIRROR": "default"},
+    }
+    DB_REPLICAS.append(alias)
+DATABASE_ROUTERS = ["library_app.replicas.ReplicaRouter"]
+DB_REPLICA_STICKY_SECONDS = int(os.getenv("DB_REPLICA_STICKY_SECONDS", "10"))
+
+# Конфигурация текстового поиска PostgreSQL для поля Book.search_vector.
+# После смены значения нужно пересобрать индекс: manage.py rebuild_search_index
+SEARCH_CONFIG = os.getenv("SEARCH_CONFIG", "simple")
+
+# Кэш: CACHE_BACKEND = locmem | file | redis | memcached | dummy
+# или полный путь к классу бэкенда; для redis/memcached нужен CACHE_LOCATION.
+CACHE_BACKENDS = {
+    "locmem": "django.core.cache.backends.locmem.LocMemCache",
+    "file": "django.core.cache.backends.filebased.FileBasedCache",
+    "redis": "django.core.cache.backends.redis.RedisCache",
+    "memcached": "django.core.cache.backends.memcached.PyMemcacheCache",
+    "dummy": "django.core.cache.backends.dummy.DummyCache",
+}
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "locmem")
+CACHES = {
+    "default": {
+        "BACKEND": CACHE_BACKENDS.get(CACHE_BACKEND, CACHE_BACKEND),
+        "LOCATION": os.getenv(
+            "CACHE_LOCATION",
+            os.path.join(BASE_DIR, "cache") if CACHE_BACKEND == "file" else "",
+        ),
+        "TIMEOUT": int(os.getenv("CACHE_TIMEOUT", "300")),
+    }
+}
+# Общий для всех воркеров кэш: на нём держатся JWT_STATELESS_READS и отзыв
+# токенов без запроса к базе. redis и memcached общие всегда, для другого
+# общего бэкенда задайте CACHE_SHARED=True.
+CACHE_SHARED = os.getenv(
+    "CACHE_SHARED", str(CACHE_BACKEND in ("redis", "memcached"))) == "True"
+CATALOG_CACHE_ENABLED = os.getenv("CATALOG_CACHE_ENABLED", "True") == "True"
+CATALOG_CACHE_TIMEOUT = int(os.getenv("CATALOG_CACHE_TIMEOUT", "300"))
+
+# Сессии: SESSION_BACKEND = cached_db | db. В режиме cached_db сессия
+# читается из кэша и записывается в базу сквозной записью. По умолчанию он
+# включён только с общим кэшем (CACHE_SHARED), который и хранит сессии:
+# выход и сброс сессии сразу видны всем воркерам. Явный cached_db без
+# общего кэша читает сессии из кэша в памяти процесса
+# (library_app/sessions.py): запись в нём живёт не дольше
+# SESSION_CACHE_TIMEOUT секунд, столько другие воркеры могут видеть
+# сессию после выхода пользователя (manage.py check предупреждает).
+SESSION_BACKEND = os.getenv(
+    "SESSION_BACKEND", "cached_db" if CACHE_SHARED else "db")
+SESSION_ENGINE = f"django.contrib.sessions.backends.{SESSION_BACKEND}"
+SESSION_CACHE_ALIAS = "default" if CACHE_SHARED else "sessions"
+CACHES["sessions"] = {
+    "BACKEND": "library_app.sessions.SessionCache",
+    "LOCATION": "sessions",
+    "TIMEOUT": int(os.getenv("SESSION_CACHE_TIMEOUT", "60")),
+    "OPTIONS": {"MAX_ENTRIES": 10000},
+}
+# Посетители без выдач, оценок и комментариев, не входившие столько дней,
+# удаляются manage.py purge_sessions.
+VISITOR_MAX_IDLE_DAYS = int(os.getenv("VISITOR_MAX_IDLE_DAYS", "30"))
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator",
@@ -91,7 +194,7 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "library_app.authentication.TokenUserAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.IsAuthenticatedOrReadOnly",
@@ -101,22 +204,76 @@ REST_FRAMEWORK = {
         "rest_framework.filters.SearchFilter",
     ],
     "DEFAULT_SCHEMA_CLASS": "rest_framework.schemas.openapi.AutoSchema",
+    "DEFAULT_PAGINATION_CLASS": "library_app.pagination.KeysetPagination",
+    "PAGE_SIZE": 20,
 }
 
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=30),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
     "AUTH_HEADER_TYPES": ("Bearer",),
+    "TOKEN_OBTAIN_SERIALIZER": (
+        "library_app.authentication.LibraryTokenObtainPairSerializer"),
+    "TOKEN_REFRESH_SERIALIZER": (
+        "library_app.authentication.LibraryTokenRefreshSerializer"),
 }
 
+# Безопасные запросы к API доверяют имени и группам из access-токена до
+# истечения его срока и не читают пользователя из базы; изменяющие запросы
+# и токены персонала всегда загружают пользователя. Требует общего кэша
+# (CACHE_SHARED), по умолчанию включено только с ним.
+JWT_STATELESS_READS = os.getenv(
+    "JWT_STATELESS_READS", str(CACHE_SHARED)) == "True"
+
+# Отзыв access-токена проверяется по кэшу. Без общего кэша воркер помнит
+# ответ «не отозван» столько секунд: отзыв в другом воркере виден в этом
+# не позже, зато таблица RevokedToken читается не при каждом запросе.
+# 0 — читать таблицу при каждом запросе. С общим кэшем не используется.
+JWT_REVOCATION_CHECK_INTERVAL = int(
+    os.getenv("JWT_REVOCATION_CHECK_INTERVAL", "30"))
+
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 
+# Загрузки хранятся под именем из SHA-256 содержимого (library_app/storage.py).
+STORAGES = {
+    "default": {"BACKEND": "library_app.storage.ContentAddressedStorage"},
+    "staticfiles": {
+        "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage",
+    },
+}
+
 LOGIN_REDIRECT_URL = "index"
 LOGOUT_REDIRECT_URL = "/"
 
-if DEBUG:
-    EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
+EMAIL_BACKEND = os.getenv(
+    "EMAIL_BACKEND",
+    "django.core.mail.backends.console.EmailBackend"
+    if DEBUG
+    else "django.core.mail.backends.smtp.EmailBackend",
+)
+EMAIL_FILE_PATH = os.getenv("EMAIL_FILE_PATH", os.path.join(BASE_DIR, "sent_emails"))
+EMAIL_HOST = os.getenv("EMAIL_HOST", "localhost")
+EMAIL_PORT = int(os.getenv("EMAIL_PORT", "25"))
+EMAIL_HOST_USER = os.getenv("EMAIL_HOST_USER", "")
+EMAIL_HOST_PASSWORD = os.getenv("EMAIL_HOST_PASSWORD", "")
+EMAIL_USE_TLS = os.getenv("EMAIL_USE_TLS", "False") == "True"
+EMAIL_TIMEOUT = int(os.getenv("EMAIL_TIMEOUT", "30"))
+DEFAULT_FROM_EMAIL = os.getenv("DEFAULT_FROM_EMAIL", "webmaster@localhost")
+
+# Очередь писем (manage.py send_outbox)
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+OUTBOX_RETRY_BASE_SECONDS = int(os.getenv("OUTBOX_RETRY_BASE_SECONDS", "30"))
+OUTBOX_RETRY_MAX_SECONDS = int(os.getenv("OUTBOX_RETRY_MAX_SECONDS", "3600"))
+OUTBOX_LEASE_SECONDS = int(os.getenv("OUTBOX_LEASE_SECONDS", "300"))
+
+# Уменьшенные копии изображений (manage.py process_images)
+IMAGE_TASK_MAX_ATTEMPTS = int(os.getenv("IMAGE_TASK_MAX_ATTEMPTS", "3"))
+IMAGE_TASK_LEASE_SECONDS = int(os.getenv("IMAGE_TASK_LEASE_SECONDS", "300"))
+
+# Напоминания о возврате книг (manage.py send_reminders): за сколько дней
+# до срока напоминать.
+REMINDER_DUE_SOON_DAYS = int(os.getenv("REMINDER_DUE_SOON_DAYS", "2"))
 
 CORS_ALLOWED_ORIGINS = os.getenv("CORS_ALLOWED_ORIGINS", "http://localhost:3000").split(",")
 CORS_ALLOW_ALL_ORIGINS = DEBUG